@@ -0,0 +1,174 @@
+"""Score many job vacancies in one pass.
+
+Reads the feature matrix once, computes the baselines of every vacancy in a
+single grouped pass and writes one ranking file per vacancy. Vacancies that
+only differ in their weights share one scoring run and are re-weighted.
+
+    python batch_scoring.py vacancies.json --out rankings/ --format parquet
+
+The spec file is JSON (a list of objects), JSON Lines or CSV with the fields
+``role_name``, ``job_level``, ``benchmark_ids`` (list or comma-separated) and
+optionally ``job_vacancy_id`` and ``weights_config`` (object or JSON text).
+The database URL comes from ``--database-url`` or ``DB_CONNECTION_STRING``.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from matching_engine import MatchingEngine
+from parallel_scoring import ShardedScorer
+
+
+def parse_benchmark_ids(value) -> list:
+    """Benchmark IDs from a list or free text, deduplicated in order (as in the dashboard)."""
+    if isinstance(value, (list, tuple)):
+        tokens = [str(v).strip() for v in value]
+    else:
+        tokens = re.findall(r"[A-Za-z]+\d+|\d+", str(value or ""))
+    return list(dict.fromkeys(token for token in tokens if token))
+
+
+def normalize_spec(spec: dict, position: int) -> dict:
+    weights_config = spec.get("weights_config")
+    if isinstance(weights_config, str):
+        weights_config = json.loads(weights_config) if weights_config.strip() else None
+    elif not isinstance(weights_config, dict):
+        weights_config = None
+    job_vacancy_id = spec.get("job_vacancy_id")
+    if job_vacancy_id is None or pd.isna(job_vacancy_id):
+        job_vacancy_id = f"vacancy_{position + 1:03d}"
+    # Empty CSV cells arrive as NaN
+    job_level = spec.get("job_level")
+    if job_level is None or pd.isna(job_level):
+        job_level = ""
+    return {
+        "job_vacancy_id": str(job_vacancy_id),
+        "role_name": str(spec["role_name"]).strip(),
+        "job_level": str(job_level).strip(),
+        "benchmark_ids": parse_benchmark_ids(spec["benchmark_ids"]),
+        "weights_config": weights_config,
+    }
+
+
+def load_vacancy_specs(path: str) -> list:
+    """Vacancy specs from a JSON, JSON Lines or CSV file."""
+    if path.endswith(".csv"):
+        records = pd.read_csv(path, dtype=str).to_dict("records")
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+    specs = [normalize_spec(record, i) for i, record in enumerate(records)]
+    duplicates = pd.Series([spec["job_vacancy_id"] for spec in specs]).duplicated()
+    if duplicates.any():
+        raise ValueError(f"Duplicate job_vacancy_id in {path}")
+    return specs
+
+
+def score_vacancies(matching_engine: MatchingEngine, specs: list) -> dict:
+    """MatchResult per job_vacancy_id.
+
+    Baselines of all benchmark sets are computed together, and vacancies with
+    the same role and benchmark set are scored once and re-weighted.
+    """
+    benchmark_keys = list(dict.fromkeys(tuple(sorted(spec["benchmark_ids"])) for spec in specs))
+    baselines = dict(zip(benchmark_keys, matching_engine.compute_baselines_many(benchmark_keys)))
+
+    scored = {}
+    results = {}
+    for spec in specs:
+        benchmark_key = tuple(sorted(spec["benchmark_ids"]))
+        run_key = (spec["role_name"].lower(), benchmark_key)
+        if run_key in scored:
+            result = scored[run_key].reweight(spec["weights_config"])
+        else:
+            result = matching_engine.match(
+                spec["role_name"], spec["benchmark_ids"], spec["weights_config"], baselines=baselines[benchmark_key]
+            )
+            scored[run_key] = result
+        results[spec["job_vacancy_id"]] = result
+    return results
+
+
+def ranking_frame(result, spec: dict) -> pd.DataFrame:
+    """Ranking with the vacancy inputs and the per-TGV match rates alongside."""
+    ranking = result.ranking().join(result.tgv_table(), on="employee_id")
+    ranking.insert(0, "job_vacancy_id", spec["job_vacancy_id"])
+    ranking.insert(1, "job_level", spec["job_level"])
+    ranking["is_benchmark"] = ranking["employee_id"].isin(spec["benchmark_ids"])
+    for column in ("directorate", "grade", "education"):
+        if column in ranking:
+            ranking[column] = ranking[column].astype(object)
+    return ranking
+
+
+def write_rankings(results: dict, specs: list, out_dir: str, file_format: str = "csv") -> list:
+    """One ranking file per vacancy; returns the written paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for spec in specs:
+        ranking = ranking_frame(results[spec["job_vacancy_id"]], spec)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", spec["job_vacancy_id"])
+        path = os.path.join(out_dir, f"{name}.{file_format}")
+        if file_format == "parquet":
+            ranking.to_parquet(path, index=False)
+        else:
+            ranking.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of job vacancies in one pass.")
+    parser.add_argument("specs", help="vacancy specs (.json, .jsonl or .csv)")
+    parser.add_argument("--out", default="rankings", help="output directory (default: rankings)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--top-k", type=int, help="keep only the best K candidates per vacancy")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="score employee shards across this many processes (default: 1, in-process)")
+    parser.add_argument("--database-url", default=os.environ.get("DB_CONNECTION_STRING"))
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url or DB_CONNECTION_STRING is required")
+
+    start = time.perf_counter()
+    specs = load_vacancy_specs(args.specs)
+    engine = create_engine(args.database_url)
+    try:
+        matching_engine = MatchingEngine.from_database(engine)
+    finally:
+        engine.dispose()
+    loaded = time.perf_counter()
+    if args.workers > 1:
+        with ShardedScorer(matching_engine, workers=args.workers) as scorer:
+            results = scorer.score_vacancies(specs, top_k=args.top_k)
+    else:
+        results = score_vacancies(matching_engine, specs)
+        results = {vacancy: result.top(args.top_k) for vacancy, result in results.items()}
+    scored = time.perf_counter()
+    paths = write_rankings(results, specs, args.out, args.format)
+
+    summary = {
+        "vacancies": len(specs),
+        "load_seconds": round(loaded - start, 3),
+        "score_seconds": round(scored - loaded, 3),
+        "write_seconds": round(time.perf_counter() - scored, 3),
+        "rankings": {spec["job_vacancy_id"]: len(results[spec["job_vacancy_id"]].employees) for spec in specs},
+    }
+    empty = [vacancy for vacancy, count in summary["rankings"].items() if count == 0]
+    if empty:
+        print(f"No candidates for: {', '.join(empty)}", file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+    return paths
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""Benchmark harness for the matching pipeline on synthetic HR data.
+
+Generates the raw HR tables (employees, competencies_yearly, papi_scores,
+profiles_psych, performance_yearly and the dim_* tables) at a given size,
+loads them into a database, builds ``employee_features`` and times every
+stage from the load up to the dashboard's pandas post-processing. Timings are
+written as JSON so runs can be compared before deploying.
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench.json
+    python benchmark.py --sizes 10000 --database-url postgresql://localhost/talent_bench
+
+Without ``--database-url`` every size runs against a fresh SQLite file, which
+covers the load, the feature table build and the in-process engine. Against
+Postgres the parameterized matching query is timed as well, one CTE stage at
+a time. Only point it at a scratch database: the HR tables are replaced.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from feature_snapshot import read_feature_snapshot, read_snapshot_engine, write_feature_snapshot
+from matching_engine import MATCHING_QUERY, ORDINAL_RANKS, TALENT_STRUCTURE, MatchResult, MatchingEngine, load_feature_matrix
+from pool_views import PoolViews
+from result_export import export_file, result_chunks
+from session_store import read_result_file, write_result_file
+from similarity_search import SimilarityIndex
+
+VERSION_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_version.sql")
+FEATURES_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "employee_features.sql")
+STRUCTURE_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "talent_structure.sql")
+
+PILLAR_CODES = {
+    "IDS": "Insight & Decision Sharpness",
+    "QDD": "Quality Delivery Discipline",
+    "FTC": "Forward Thinking & Clarity",
+    "STO": "Synergy & Team Orientation",
+    "CSI": "Commercial Savvy & Impact",
+    "VCU": "Value Creation for Users",
+    "GDR": "Growth Drive & Resilience",
+    "CEX": "Curiosity & Experimentation",
+    "LIE": "Lead, Inspire & Empower",
+    "SEA": "Social Empathy & Awareness",
+}
+PAPI_SCALES = [f"Papi_{c}" for c in "ABCDEFGIKLNOPRSTVWXZ"]
+DISC_TYPES = ["DI", "DC", "DS", "ID", "IS", "IC", "SD", "SI", "SC", "CD", "CI", "CS"]
+MBTI_TYPES = [a + b + c + d for a in "EI" for b in "SN" for c in "TF" for d in "JP"]
+DIRECTORATES = ["Commercial", "HR & Corp Affairs", "Technology", "Operations", "Finance"]
+POSITIONS = ["Data Analyst", "Brand Executive", "Sales Supervisor", "HRBP", "Finance Officer",
+             "Supply Planner", "Software Engineer", "Operations Lead"]
+GRADES = ["III", "IV", "V"]
+EDUCATION = ["SMA", "D3", "S1", "S2"]
+MAJORS = ["Business", "Engineering", "Design", "Psychology", "Economics", "Computer Science"]
+
+# Dashboard slider defaults, and a second set for the slider-change (reweight) stage
+WEIGHTS_CONFIG = {"tgv_weights": {
+    "Execution Excellence": 0.3, "Strategic Impact": 0.2, "Growth & Innovation": 0.1, "People Leadership": 0.1,
+    "Motivation & Drive": 0.1, "Cognitive Complexity": 0.1, "Demographics": 0.1,
+}}
+REWEIGHTED_CONFIG = {"tgv_weights": dict(WEIGHTS_CONFIG["tgv_weights"], **{"People Leadership": 0.4})}
+
+
+def _with_nulls(rng, values, rate: float):
+    """Nullable Int16 column with roughly ``rate`` missing values."""
+    column = pd.array(values, dtype="Int16")
+    column[rng.random(len(values)) < rate] = pd.NA
+    return column
+
+
+def generate_hr_data(n_employees: int, seed: int = 0, years=(2024, 2025), null_rate: float = 0.08) -> dict:
+    """Raw HR tables with the same layout as the production schema."""
+    rng = np.random.default_rng(seed)
+    n = n_employees
+    employee_ids = np.char.add("EMP", (100000 + np.arange(n)).astype(str))
+
+    tables = {
+        "dim_directorates": pd.DataFrame({"directorate_id": range(1, len(DIRECTORATES) + 1), "name": DIRECTORATES}),
+        "dim_positions": pd.DataFrame({"position_id": range(1, len(POSITIONS) + 1), "name": POSITIONS}),
+        "dim_grades": pd.DataFrame({"grade_id": range(1, len(GRADES) + 1), "name": GRADES}),
+        "dim_education": pd.DataFrame({"education_id": range(1, len(EDUCATION) + 1), "name": EDUCATION}),
+        "dim_majors": pd.DataFrame({"major_id": range(1, len(MAJORS) + 1), "name": MAJORS}),
+        "dim_competency_pillars": pd.DataFrame({
+            "pillar_code": list(PILLAR_CODES), "pillar_label": list(PILLAR_CODES.values()),
+        }),
+    }
+
+    tables["employees"] = pd.DataFrame({
+        "employee_id": employee_ids,
+        "fullname": np.char.add("Employee ", np.arange(n).astype(str)),
+        "directorate_id": rng.integers(1, len(DIRECTORATES) + 1, n),
+        "position_id": rng.integers(1, len(POSITIONS) + 1, n),
+        "grade_id": rng.integers(1, len(GRADES) + 1, n),
+        "education_id": rng.choice(np.arange(1, len(EDUCATION) + 1), n, p=[0.1, 0.2, 0.5, 0.2]),
+        "major_id": rng.integers(1, len(MAJORS) + 1, n),
+        "years_of_service_months": rng.integers(1, 240, n),
+    })
+
+    n_pillars = len(PILLAR_CODES)
+    competency_rows = n * n_pillars * len(years)
+    tables["competencies_yearly"] = pd.DataFrame({
+        "employee_id": np.tile(np.repeat(employee_ids, n_pillars), len(years)),
+        "pillar_code": np.tile(list(PILLAR_CODES), n * len(years)),
+        "year": np.repeat(np.array(years, dtype=np.int16), n * n_pillars),
+        "score": _with_nulls(rng, rng.integers(1, 6, competency_rows), null_rate),
+    })
+
+    tables["papi_scores"] = pd.DataFrame({
+        "employee_id": np.repeat(employee_ids, len(PAPI_SCALES)),
+        "scale_code": np.tile(PAPI_SCALES, n),
+        "score": _with_nulls(rng, rng.integers(1, 10, n * len(PAPI_SCALES)), null_rate),
+    })
+
+    disc = rng.choice(DISC_TYPES, n).astype(object)
+    disc[rng.random(n) < null_rate] = None
+    tables["profiles_psych"] = pd.DataFrame({
+        "employee_id": employee_ids,
+        "disc": disc,
+        "disc_word": "-",
+        "mbti": rng.choice(MBTI_TYPES, n),
+        "pauli": _with_nulls(rng, rng.integers(20, 101, n), null_rate),
+        "iq": _with_nulls(rng, rng.integers(80, 141, n), null_rate),
+        "gtq": _with_nulls(rng, rng.integers(9, 47, n), null_rate),
+        "tiki": _with_nulls(rng, rng.integers(1, 11, n), null_rate),
+    })
+
+    tables["performance_yearly"] = pd.DataFrame({
+        "employee_id": np.tile(employee_ids, len(years)),
+        "year": np.repeat(np.array(years, dtype=np.int16), n),
+        "rating": rng.choice(np.arange(1, 6), n * len(years), p=[0.05, 0.15, 0.4, 0.3, 0.1]),
+    })
+    return tables
+
+
+def _copy_frame(engine, name: str, frame: pd.DataFrame):
+    """Bulk load into Postgres with COPY instead of row-by-row INSERTs."""
+    frame.head(0).to_sql(name, engine, if_exists="replace", index=False)
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.copy_expert(f"COPY {name} FROM STDIN WITH (FORMAT csv)", buffer)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def load_tables(engine, tables: dict):
+    """Replace the HR tables (and the feature table built on them) in the database."""
+    postgres = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
+        if postgres:
+            conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS employee_scores"))
+            conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS employee_features"))
+        else:
+            conn.execute(text("DROP TABLE IF EXISTS employee_features"))
+    for name, frame in tables.items():
+        if postgres:
+            _copy_frame(engine, name, frame)
+        else:
+            frame.to_sql(name, engine, if_exists="replace", index=False, chunksize=50_000)
+
+
+# Separators of split_statements: dollar quotes ($$, $body$), quotes, comments, semicolons
+_SQL_TOKEN = re.compile(r"\$(?:[A-Za-z_]\w*)?\$|'|--|;")
+
+
+def split_statements(script: str) -> list:
+    """Statements of a SQL script, split on semicolons outside quoted text.
+
+    Single-quoted strings and dollar-quoted bodies (functions, DO blocks)
+    are kept verbatim, semicolons included; ``--`` comments outside them
+    are dropped.
+    """
+    statements, current, position = [], [], 0
+    while True:
+        match = _SQL_TOKEN.search(script, position)
+        if match is None:
+            current.append(script[position:])
+            break
+        current.append(script[position:match.start()])
+        token = match.group()
+        if token == ";":
+            statements.append("".join(current))
+            current = []
+            position = match.end()
+        elif token == "--":
+            end = script.find("\n", match.end())
+            position = len(script) if end < 0 else end
+        else:
+            # Runs to the matching quote or dollar tag
+            end = script.find(token, match.end())
+            if end < 0:
+                raise ValueError(f"Unterminated {token} quote in SQL script")
+            position = end + len(token)
+            current.append(script[match.start():position])
+    statements.append("".join(current))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def feature_statements(dialect: str):
+    """employee_features.sql (and talent_structure.sql) split into (build, refresh) statements.
+
+    SQLite has no materialized views or JSONB, so there employee_features
+    becomes a plain table, the refresh is dropped and the data version log,
+    the registry and its long employee_scores view are skipped (the engine
+    carries its own copy). On Postgres, data_version.sql comes first.
+    """
+    scripts = [FEATURES_SQL, STRUCTURE_SQL] if dialect == "postgresql" else [FEATURES_SQL]
+    build, refresh = [], []
+    if dialect == "postgresql":
+        with open(VERSION_SQL, encoding="utf-8") as f:
+            build.extend(split_statements(f.read()))
+    for path in scripts:
+        with open(path, encoding="utf-8") as f:
+            script = f.read()
+        for statement in split_statements(script):
+            if statement.upper().startswith(("REFRESH", "INSERT INTO DATA_REFRESHES")):
+                refresh.append(statement)
+                continue
+            if dialect != "postgresql":
+                statement = statement.replace("CREATE MATERIALIZED VIEW IF NOT EXISTS", "CREATE TABLE")
+            build.append(statement)
+    return build, (refresh if dialect == "postgresql" else [])
+
+
+def cte_stage_queries(query: str = MATCHING_QUERY) -> dict:
+    """One query per CTE of the matching query, counting that CTE's rows.
+
+    Each CTE builds on the previous ones, so the timings are cumulative.
+    """
+    head = query[:query.rindex("\n)\nSELECT") + 2]
+    names = re.findall(r"^(?:WITH )?(\w+) AS \($", head, flags=re.MULTILINE)
+    stages = {name: f"{head}\nSELECT COUNT(*) FROM {name}" for name in names}
+    stages["full_query"] = query
+    return stages
+
+
+def dashboard_views(result: MatchResult, benchmark_ids) -> PoolViews:
+    """The pool aggregates and figures the dashboard builds once per result."""
+    return PoolViews(result, benchmark_ids)
+
+
+def candidate_views(result: MatchResult, views: PoolViews, employee_id):
+    """What the dashboard recomputes when only the selected candidate changes."""
+    return (
+        result.tv_detail(employee_id), views.candidate_tgv(employee_id), views.final_by_employee[employee_id],
+        views.rank_by_employee[employee_id], views.percentile(employee_id),
+    )
+
+
+class StageTimer:
+    """Collects wall-clock timings per named stage."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def repeat(self, name: str, repeats: int, func):
+        """Run ``func`` ``repeats`` times under ``name`` and return the last result."""
+        result = None
+        for _ in range(repeats):
+            with self.stage(name):
+                result = func()
+        return result
+
+    def summary(self) -> dict:
+        return {
+            name: {
+                "median_s": round(statistics.median(samples), 6),
+                "min_s": round(min(samples), 6),
+                "max_s": round(max(samples), 6),
+                "runs": len(samples),
+            }
+            for name, samples in self.samples.items()
+        }
+
+
+def pick_vacancy(tables: dict, n_benchmark: int, seed: int = 0):
+    """Role, level and benchmark IDs: top-rated employees of the largest position."""
+    employees = tables["employees"]
+    position_id = employees["position_id"].value_counts().idxmax()
+    role_name = tables["dim_positions"].set_index("position_id").loc[position_id, "name"]
+    grade_id = employees.loc[employees["position_id"] == position_id, "grade_id"].mode().iloc[0]
+    job_level = tables["dim_grades"].set_index("grade_id").loc[grade_id, "name"]
+
+    performance = tables["performance_yearly"]
+    latest = performance[performance["year"] == performance["year"].max()]
+    top_rated = latest.loc[latest["rating"] == 5, "employee_id"]
+    pool = employees.loc[employees["employee_id"].isin(top_rated), "employee_id"]
+    benchmark_ids = pool.sample(min(n_benchmark, len(pool)), random_state=seed).tolist()
+    return role_name, job_level, benchmark_ids
+
+
+def run_benchmark(engine, n_employees: int, seed: int = 0, repeats: int = 3, n_benchmark: int = 5) -> dict:
+    """Time one full pipeline run at ``n_employees`` and return the JSON record."""
+    timer = StageTimer()
+    dialect = engine.dialect.name
+
+    with timer.stage("generate"):
+        tables = generate_hr_data(n_employees, seed=seed)
+    with timer.stage("load_tables"):
+        load_tables(engine, tables)
+
+    build, refresh = feature_statements(dialect)
+    with timer.stage("build_features"):
+        with engine.begin() as conn:
+            for statement in build:
+                conn.exec_driver_sql(statement)
+            conn.exec_driver_sql("ANALYZE")
+    for statement in refresh:
+        with timer.stage("refresh_features"), engine.begin() as conn:
+            conn.exec_driver_sql(statement)
+
+    role_name, job_level, benchmark_ids = pick_vacancy(tables, n_benchmark, seed)
+    del tables
+
+    features = timer.repeat("load_feature_matrix", repeats, lambda: load_feature_matrix(engine))
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        path = timer.repeat("snapshot_write", repeats, lambda: write_feature_snapshot(
+            features, TALENT_STRUCTURE, ORDINAL_RANKS, "benchmark", snapshot_dir
+        ))
+        timer.repeat("snapshot_read", repeats, lambda: read_feature_snapshot(path))
+        timer.repeat("snapshot_engine", repeats, lambda: read_snapshot_engine(path))
+    matching_engine = timer.repeat("engine_init", repeats, lambda: MatchingEngine(features))
+    timer.repeat("eligible_rows", repeats, lambda: matching_engine.eligible_rows(role_name))
+    timer.repeat("compute_baselines", repeats, lambda: matching_engine.compute_baselines(benchmark_ids))
+    result = timer.repeat("match", repeats, lambda: matching_engine.match(role_name, benchmark_ids, WEIGHTS_CONFIG))
+    # A stored benchmark cohort: same baselines, read instead of computed
+    stored = matching_engine.stored_baselines(matching_engine.compute_baselines(benchmark_ids))
+    timer.repeat("match_stored_baselines", repeats,
+                 lambda: matching_engine.match(role_name, benchmark_ids, WEIGHTS_CONFIG, stored))
+    timer.repeat("reweight", repeats, lambda: result.reweight(REWEIGHTED_CONFIG))
+    timer.repeat("to_frame", repeats, result.to_frame)
+    with tempfile.TemporaryDirectory() as export_dir:
+        export_path = os.path.join(export_dir, "ranking.parquet")
+        timer.repeat("export_parquet", repeats, lambda: export_file(result_chunks(result), export_path))
+        spill_path = os.path.join(export_dir, "session.arrow")
+        timer.repeat("session_spill", repeats, lambda: write_result_file(result, spill_path))
+        timer.repeat("session_reload", repeats, lambda: read_result_file(spill_path))
+    views = timer.repeat("dashboard_views", repeats, lambda: dashboard_views(result, benchmark_ids))
+    if views.candidate_ids:
+        candidate = views.candidate_ids[len(views.candidate_ids) // 2]
+        timer.repeat("candidate_views", repeats, lambda: candidate_views(result, views, candidate))
+    similarity_index = timer.repeat("similarity_index", repeats, lambda: SimilarityIndex(matching_engine))
+    timer.repeat("similarity_search", repeats, lambda: similarity_index.search(benchmark_ids, k=50))
+
+    if dialect == "postgresql":
+        params = {
+            "job_vacancy_id": "benchmark",
+            "role_name": role_name,
+            "job_level": job_level,
+            "benchmark_ids": benchmark_ids,
+            "weights_config": json.dumps(WEIGHTS_CONFIG),
+            "directorates": None,
+            "grades": None,
+        }
+        for name, query in cte_stage_queries().items():
+            def run_query(query=query):
+                with engine.connect() as conn:
+                    return conn.exec_driver_sql(query, params).fetchall()
+            timer.repeat(f"sql_{name}", repeats, run_query)
+        frame = timer.repeat("sql_read_frame", repeats, lambda: pd.read_sql(MATCHING_QUERY, engine, params=params))
+        timer.repeat("from_frame", repeats, lambda: MatchResult.from_frame(frame, WEIGHTS_CONFIG))
+
+    return {
+        "n_employees": n_employees,
+        "seed": seed,
+        "role_name": role_name,
+        "benchmark_size": len(benchmark_ids),
+        "candidates": len(result.employees),
+        "tv_count": len(result.tvs),
+        "result_bytes": result.nbytes,
+        "stages": timer.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the matching pipeline on synthetic HR data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="employee counts to generate (default: 1000 10000 100000)")
+    parser.add_argument("--database-url", help="scratch database to load into (default: a temporary SQLite file per size)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per timed query/compute stage")
+    parser.add_argument("--benchmark-size", type=int, default=5, help="number of benchmark employees")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = args.database_url or f"sqlite:///{os.path.join(tmp, 'benchmark.sqlite3')}"
+            engine = create_engine(url)
+            try:
+                runs.append(run_benchmark(engine, size, args.seed, args.repeats, args.benchmark_size))
+            finally:
+                engine.dispose()
+        print(f"{size} employees done", file=sys.stderr)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "backend": create_engine(args.database_url).dialect.name if args.database_url else "sqlite",
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "runs": runs,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Named benchmark cohorts whose baselines are precomputed in Postgres.
+
+A cohort is a standard benchmark set, e.g. every rating 5 employee of the
+latest year in one position (``benchmark_cohorts`` table, see
+benchmark_cohorts.sql). Its members and per-TV baselines are materialized
+views, so a run against a cohort skips the baseline aggregation:
+
+- SQL: ``cohort_query(MATCHING_QUERY)`` reads ``benchmark_cohort_baselines``
+  in place of the ``baseline_scores`` aggregation; extra parameter
+  ``cohort_name``, with ``benchmark_ids`` still the members
+- engine: ``match(..., baselines=matching_engine.stored_baselines(cohort.baselines))``
+
+The views are refreshed after data loads and cohort edits:
+
+    python benchmark_cohorts.py refresh --if-stale
+    python benchmark_cohorts.py list
+
+A cohort is ``stale`` when its source tables changed since the last refresh
+(per the ``data_refreshes`` log, data_version.sql) or it was never refreshed;
+callers then compute the baselines from its members as usual.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from matching_engine import BASELINE_SCORES
+
+COHORTS_QUERY = """
+SELECT c.cohort_name, c.position_name, c.rating, c.year, c.description,
+    COUNT(m.employee_id) AS member_count
+FROM benchmark_cohorts c
+LEFT JOIN benchmark_cohort_members m ON m.cohort_name = c.cohort_name
+GROUP BY c.cohort_name, c.position_name, c.rating, c.year, c.description
+ORDER BY c.cohort_name
+"""
+
+MEMBERS_QUERY = """
+SELECT employee_id FROM benchmark_cohort_members WHERE cohort_name = %(cohort_name)s ORDER BY employee_id
+"""
+
+BASELINES_QUERY = """
+SELECT tv_id, tgv_name, tv_name, data_type, scoring_direction, baseline_score
+FROM benchmark_cohort_baselines
+WHERE cohort_name = %(cohort_name)s
+ORDER BY tv_id
+"""
+
+STALE_QUERY = """
+SELECT (SELECT source_version FROM benchmark_cohort_sources) IS DISTINCT FROM (
+    SELECT MAX(source_version) FROM benchmark_cohort_refreshes
+)
+"""
+
+REFRESH_STATEMENTS = [
+    "REFRESH MATERIALIZED VIEW CONCURRENTLY benchmark_cohort_members",
+    "REFRESH MATERIALIZED VIEW CONCURRENTLY benchmark_cohort_baselines",
+    "INSERT INTO benchmark_cohort_refreshes (source_version) SELECT source_version FROM benchmark_cohort_sources",
+]
+
+# Same columns as matching_engine.BASELINE_SCORES, read from the stored cohort
+COHORT_BASELINE_SCORES = """
+baseline_scores AS (
+    -- Precomputed baselines of the benchmark cohort (benchmark_cohorts.sql)
+    SELECT tb.job_vacancy_id, tb.role_name, tb.job_level, tb.weights_config,
+        cb.tv_id, cb.tgv_name, cb.tv_name, cb.data_type, cb.scoring_direction, cb.baseline_score
+    FROM tb
+    INNER JOIN benchmark_cohort_baselines cb ON cb.cohort_name = %(cohort_name)s::TEXT
+)
+""".strip()
+
+
+def cohort_query(query: str) -> str:
+    """A matching query (MATCHING_QUERY, TOP_K_QUERY, DETAIL_QUERY) on a cohort's stored baselines."""
+    if BASELINE_SCORES not in query:
+        raise ValueError("query has no baseline_scores CTE to replace")
+    return query.replace(BASELINE_SCORES, COHORT_BASELINE_SCORES)
+
+
+class BenchmarkCohort:
+    """Members and stored per-TV baselines of one cohort."""
+
+    def __init__(self, name: str, member_ids: list, baselines: pd.DataFrame, stale: bool = False):
+        self.name = name
+        self.member_ids = member_ids
+        self.baselines = baselines
+        self.stale = stale
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the members and baselines, for result cache keys."""
+        payload = json.dumps({
+            "name": self.name,
+            "members": self.member_ids,
+            "baselines": self.baselines[["tv_name", "baseline_score"]].astype(object).values.tolist(),
+        })
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def list_cohorts(engine) -> pd.DataFrame:
+    return pd.read_sql(COHORTS_QUERY, engine)
+
+
+def cohorts_stale(engine) -> bool:
+    with engine.connect() as conn:
+        return bool(conn.execute(text(STALE_QUERY)).scalar())
+
+
+def load_cohort(engine, cohort_name: str):
+    """The cohort's members and baselines, read in one snapshot; None if it has no members."""
+    params = {"cohort_name": cohort_name}
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        members = pd.read_sql(MEMBERS_QUERY, conn, params=params)
+        baselines = pd.read_sql(BASELINES_QUERY, conn, params=params)
+        stale = bool(conn.execute(text(STALE_QUERY)).scalar())
+    if members.empty:
+        return None
+    return BenchmarkCohort(cohort_name, members["employee_id"].astype(str).tolist(), baselines, stale)
+
+
+def refresh_cohorts(engine, if_stale: bool = False) -> bool:
+    """Rebuild cohort members and baselines; returns False when skipped as up to date.
+
+    Both views are refreshed in one transaction, so readers never see new
+    members with old baselines.
+    """
+    if if_stale and not cohorts_stale(engine):
+        return False
+    with engine.begin() as conn:
+        for statement in REFRESH_STATEMENTS:
+            conn.exec_driver_sql(statement)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or refresh the stored benchmark cohorts.")
+    parser.add_argument("command", choices=["list", "refresh"])
+    parser.add_argument("--if-stale", action="store_true", help="refresh only when the source tables changed")
+    parser.add_argument("--database-url", default=os.environ.get("DB_CONNECTION_STRING"))
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url or DB_CONNECTION_STRING is required")
+
+    engine = create_engine(args.database_url)
+    try:
+        if args.command == "list":
+            print(list_cohorts(engine).to_string(index=False))
+            return
+        start = time.perf_counter()
+        refreshed = refresh_cohorts(engine, if_stale=args.if_stale)
+        print(json.dumps({"refreshed": refreshed, "seconds": round(time.perf_counter() - start, 3)}, indent=2))
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
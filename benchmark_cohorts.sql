@@ -0,0 +1,102 @@
+-- Named benchmark cohorts with precomputed baselines. A cohort is a standard
+-- benchmark set such as "all rating 5 employees of 2025 in this position";
+-- runs against a cohort read its per-TV baselines from
+-- benchmark_cohort_baselines instead of aggregating employee_scores again
+-- (benchmark_cohorts.py). Run after talent_structure.sql.
+--
+-- Adding a cohort: insert a row into benchmark_cohorts, then run the refreshes
+-- at the end of this file.
+CREATE TABLE IF NOT EXISTS benchmark_cohorts (
+  cohort_name TEXT PRIMARY KEY,
+  -- NULL: employees of every position
+  position_name TEXT,
+  rating SMALLINT NOT NULL,
+  -- NULL: the latest year in performance_yearly
+  year SMALLINT,
+  description TEXT
+);
+
+-- Loads into performance_yearly and cohort edits bump the data version
+-- (data_version.sql), like the registry tables in talent_structure.sql
+DROP TRIGGER IF EXISTS benchmark_cohorts_version ON benchmark_cohorts;
+CREATE TRIGGER benchmark_cohorts_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON benchmark_cohorts
+  FOR EACH STATEMENT EXECUTE FUNCTION log_data_change();
+DROP TRIGGER IF EXISTS performance_yearly_version ON performance_yearly;
+CREATE TRIGGER performance_yearly_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON performance_yearly
+  FOR EACH STATEMENT EXECUTE FUNCTION log_data_change();
+
+-- Data version of the tables cohorts are derived from (see
+-- result_cache.DATA_VERSION_QUERY); 0 before anything was logged
+CREATE OR REPLACE VIEW benchmark_cohort_sources AS
+SELECT
+  COALESCE(MAX(version), 0) AS source_version
+FROM
+  data_refreshes
+WHERE
+  source IN ('employee_features', 'employee_scores', 'talent_structure', 'talent_ordinal_ranks',
+    'benchmark_cohorts', 'performance_yearly');
+
+-- Source version at every cohort refresh; cohorts are stale once it differs
+-- from the current one
+CREATE TABLE IF NOT EXISTS benchmark_cohort_refreshes (
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  source_version BIGINT NOT NULL
+);
+
+-- Cohort membership, resolved against the current performance ratings and positions
+CREATE MATERIALIZED VIEW IF NOT EXISTS benchmark_cohort_members AS
+SELECT DISTINCT
+  c.cohort_name,
+  ef.employee_id
+FROM
+  benchmark_cohorts c
+INNER JOIN
+  performance_yearly py
+ON
+  py.rating = c.rating
+  AND py.year = COALESCE(c.year, (SELECT MAX(year) FROM performance_yearly))
+INNER JOIN
+  employee_features ef
+ON
+  ef.employee_id = py.employee_id
+WHERE
+  c.position_name IS NULL
+  OR ef.position_key = LOWER(TRIM(c.position_name));
+
+CREATE UNIQUE INDEX IF NOT EXISTS benchmark_cohort_members_idx ON benchmark_cohort_members (cohort_name, employee_id);
+
+-- Median (numeric) or mode (categorical) per registry TV over each cohort,
+-- computed as in the baseline_scores CTE of the matching queries
+CREATE MATERIALIZED VIEW IF NOT EXISTS benchmark_cohort_baselines AS
+SELECT
+  m.cohort_name,
+  ts.tv_id,
+  ts.tgv_name,
+  ts.tv_name,
+  ts.data_type,
+  ts.scoring_direction,
+  CASE
+    WHEN ts.data_type = 'categorical' THEN MODE() WITHIN GROUP (ORDER BY es.score_text)
+    ELSE (PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY es.score_numeric))::TEXT
+  END AS baseline_score
+FROM
+  benchmark_cohort_members m
+INNER JOIN
+  employee_scores es
+ON
+  es.employee_id = m.employee_id
+INNER JOIN
+  talent_structure ts
+ON
+  ts.tv_id = es.tv_id
+GROUP BY
+  m.cohort_name, ts.tv_id, ts.tgv_name, ts.tv_name, ts.data_type, ts.scoring_direction;
+
+CREATE UNIQUE INDEX IF NOT EXISTS benchmark_cohort_baselines_idx ON benchmark_cohort_baselines (cohort_name, tv_id);
+
+-- Run after the employee_scores refresh, after every load into
+-- performance_yearly and after editing benchmark_cohorts, in this order
+-- (python benchmark_cohorts.py refresh does the same)
+REFRESH MATERIALIZED VIEW CONCURRENTLY benchmark_cohort_members;
+REFRESH MATERIALIZED VIEW CONCURRENTLY benchmark_cohort_baselines;
+INSERT INTO benchmark_cohort_refreshes (source_version) SELECT source_version FROM benchmark_cohort_sources;
@@ -0,0 +1,20 @@
+-- Explicit version of the data the matching queries read. Every refresh of
+-- employee_features / employee_scores and every write to the registry tables
+-- appends a row; the highest version over a set of sources is their data
+-- version (result_cache.DATA_VERSION_QUERY, benchmark_cohorts.sql).
+-- Run once, before employee_features.sql.
+CREATE TABLE IF NOT EXISTS data_refreshes (
+  version BIGSERIAL PRIMARY KEY,
+  source TEXT NOT NULL,
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS data_refreshes_source_idx ON data_refreshes (source, version);
+
+-- Statement-level trigger function for plain tables: one row per write statement
+CREATE OR REPLACE FUNCTION log_data_change() RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO data_refreshes (source) VALUES (TG_TABLE_NAME);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
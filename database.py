@@ -0,0 +1,107 @@
+"""Pooled database engine shared by every Streamlit session in the process.
+
+``create_pooled_engine`` sets the pool explicitly (size, overflow, pre-ping,
+recycle) and a server-side statement timeout, and attaches ``PoolMetrics`` so
+the dashboard can show how the pool is being used.
+"""
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+
+
+class PoolMetrics:
+    """Counters fed by SQLAlchemy pool events."""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.last_connect_at = None
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "soft_invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+            self.last_connect_at = time.time()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "last_connect_at": self.last_connect_at,
+            }
+
+
+def create_pooled_engine(url: str, pool_size: int = 5, max_overflow: int = 10, pool_timeout: float = 30,
+                         pool_recycle: int = 1800, statement_timeout_ms: int = 60_000):
+    """Engine with explicit pool settings and a per-connection statement timeout.
+
+    Connections are pinged before use (hosted Postgres drops idle ones) and
+    recycled after ``pool_recycle`` seconds. ``engine.pool_metrics`` holds
+    the usage counters.
+    """
+    connect_args = {}
+    if url.startswith("postgresql") and statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+    engine = create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+    engine.pool_metrics = PoolMetrics()
+    engine.pool_metrics.attach(engine)
+    return engine
+
+
+def pool_status(engine) -> dict:
+    """Current pool occupancy plus the lifetime counters."""
+    pool = engine.pool
+    status = {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    metrics = getattr(engine, "pool_metrics", None)
+    if metrics is not None:
+        status.update(metrics.snapshot())
+    return status
+
+
+def check_health(engine) -> dict:
+    """Round-trip a ``SELECT 1`` and report its latency."""
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+    except Exception as ex:
+        return {"ok": False, "latency_ms": round((time.perf_counter() - start) * 1000, 2), "error": str(ex)}
@@ -0,0 +1,148 @@
+"""Per-run instrumentation for the dashboard.
+
+A ``RunTrace`` records wall time, row counts and bytes for every phase of one
+Streamlit script run (cache lookup, SQL transfer, scoring, each page section,
+the OpenRouter call). It renders into the diagnostics panel and is written as
+one JSON log line per run so timings can be aggregated across sessions. Set
+``DIAGNOSTICS_LOG`` to also append those lines to a file.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import text
+
+logger = logging.getLogger("talent_dashboard.diagnostics")
+if not logger.handlers:
+    _handler = logging.FileHandler(os.environ["DIAGNOSTICS_LOG"]) if os.environ.get("DIAGNOSTICS_LOG") else logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def frame_bytes(frame) -> int:
+    """Deep in-memory size of a DataFrame (0 for None)."""
+    if frame is None:
+        return 0
+    return int(frame.memory_usage(deep=True).sum())
+
+
+class RunTrace:
+    """Timings of one dashboard script run."""
+
+    def __init__(self, session_id: str = None, **context):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.context = context
+        self.started_at = datetime.now(timezone.utc)
+        self.phases = []
+        self.query_plan = None
+        self._start = time.perf_counter()
+        self._lap = self._start
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, seconds: float, rows=None, nbytes=None, **extra):
+        record = {"phase": name, "seconds": round(seconds, 6), "rows": rows, "bytes": nbytes}
+        record.update(extra)
+        with self._lock:
+            self.phases.append(record)
+        return record
+
+    @contextmanager
+    def phase(self, name: str, **extra):
+        """Time a block; set ``rows``/``bytes`` (or anything else) on the yielded dict."""
+        record = dict(extra)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            rows, nbytes = record.pop("rows", None), record.pop("bytes", None)
+            self._record(name, end - start, rows, nbytes, **record)
+            self._lap = end
+
+    def lap(self, name: str, rows=None, nbytes=None, **extra):
+        """Record the time since the previous phase or lap (for page sections)."""
+        now = time.perf_counter()
+        self._record(name, now - self._lap, rows, nbytes, **extra)
+        self._lap = now
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._start
+
+    def to_frame(self) -> pd.DataFrame:
+        with self._lock:
+            frame = pd.DataFrame(self.phases, columns=["phase", "seconds", "rows", "bytes"])
+        frame = frame.astype({"rows": "Int64", "bytes": "Int64"})
+        frame["share"] = frame["seconds"] / max(self.total_seconds, 1e-9)
+        return frame
+
+    def to_record(self) -> dict:
+        with self._lock:
+            phases = list(self.phases)
+        record = {
+            "event": "dashboard_run",
+            "run_id": self.run_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "total_seconds": round(self.total_seconds, 6),
+            "phases": phases,
+        }
+        record.update(self.context)
+        if self.query_plan is not None:
+            record["query_plan"] = self.query_plan.summary()
+        return record
+
+    def log(self):
+        logger.info(json.dumps(self.to_record(), default=str))
+
+
+class QueryPlan:
+    """Output of ``EXPLAIN (ANALYZE, BUFFERS)`` for one query."""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.text = "\n".join(self.lines)
+
+    def _timing(self, label: str):
+        match = re.search(rf"{label} Time: ([\d.]+) ms", self.text)
+        return float(match.group(1)) if match else None
+
+    @property
+    def planning_ms(self):
+        return self._timing("Planning")
+
+    @property
+    def execution_ms(self):
+        return self._timing("Execution")
+
+    def summary(self) -> dict:
+        # Buffer counts are cumulative per node, so the first line (the root) covers the whole query
+        buffers = re.search(r"Buffers: (.*)", self.text)
+        counts = dict(re.findall(r"(hit|read)=(\d+)", buffers.group(1).split(",")[0])) if buffers else {}
+        return {
+            "planning_ms": self.planning_ms,
+            "execution_ms": self.execution_ms,
+            "shared_hit_blocks": int(counts.get("hit", 0)),
+            "shared_read_blocks": int(counts.get("read", 0)),
+        }
+
+
+def explain_analyze(engine, query: str, params: dict = None) -> QueryPlan:
+    """Run the query under EXPLAIN (ANALYZE, BUFFERS); it executes in full."""
+    statement = "EXPLAIN (ANALYZE, BUFFERS) " + query.strip().rstrip(";")
+    with engine.connect() as conn:
+        if params is None:
+            rows = conn.execute(text(statement)).fetchall()
+        else:
+            rows = conn.exec_driver_sql(statement, params).fetchall()
+    return QueryPlan(row[0] for row in rows)
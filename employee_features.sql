@@ -0,0 +1,123 @@
+-- One row per employee with every Talent Variable pivoted into its own column.
+-- Competencies and PAPI scores are pivoted in separate per-employee subqueries,
+-- so building the table never produces the pillars x PAPI-scales cross product.
+-- The matching query (step_2.sql / dashboard.py) and the in-process engine read
+-- from here instead of re-joining the raw tables on every run.
+-- The view definition cannot be altered in place: after changing it, drop it
+-- (DROP MATERIALIZED VIEW employee_features CASCADE) and re-run this file and
+-- talent_structure.sql.
+CREATE MATERIALIZED VIEW IF NOT EXISTS employee_features AS
+WITH latest_competencies AS (
+  SELECT
+    employee_id,
+    MAX(score) FILTER (WHERE pillar_code = 'IDS') AS Insight_Decision,
+    MAX(score) FILTER (WHERE pillar_code = 'QDD') AS Quality_Delivery,
+    MAX(score) FILTER (WHERE pillar_code = 'FTC') AS Forward_Thinking,
+    MAX(score) FILTER (WHERE pillar_code = 'STO') AS Team_Orientation,
+    MAX(score) FILTER (WHERE pillar_code = 'CSI') AS Commercial_Savvy,
+    MAX(score) FILTER (WHERE pillar_code = 'VCU') AS Value_Creation,
+    MAX(score) FILTER (WHERE pillar_code = 'GDR') AS Growth_Drive,
+    MAX(score) FILTER (WHERE pillar_code = 'CEX') AS Curiosity,
+    MAX(score) FILTER (WHERE pillar_code = 'LIE') AS Lead_Inspire,
+    MAX(score) FILTER (WHERE pillar_code = 'SEA') AS Social_Empathy
+  FROM
+    competencies_yearly
+  WHERE
+    year = (SELECT MAX(year) FROM competencies_yearly)
+  GROUP BY
+    employee_id
+),
+papi_pivot AS (
+  SELECT
+    employee_id,
+    MAX(score) FILTER (WHERE scale_code = 'Papi_P') AS Papi_P,
+    MAX(score) FILTER (WHERE scale_code = 'Papi_W') AS Papi_W
+  FROM
+    papi_scores
+  WHERE
+    scale_code IN ('Papi_P', 'Papi_W')
+  GROUP BY
+    employee_id
+),
+psych AS (
+  SELECT
+    employee_id,
+    MAX(disc) AS disc,
+    MAX(pauli) AS Pauli_Score,
+    MAX(iq) AS IQ_Score,
+    MAX(gtq) AS GTQ_Score,
+    MAX(tiki) AS TIKI_Score
+  FROM
+    profiles_psych
+  GROUP BY
+    employee_id
+)
+SELECT
+  e.employee_id,
+  e.fullname,
+  pos.name AS position,
+  LOWER(TRIM(pos.name)) AS position_key,
+  dir.name AS directorate,
+  g.name AS grade,
+  edu.name AS education,
+  pp.disc,
+  lc.Insight_Decision,
+  lc.Quality_Delivery,
+  lc.Forward_Thinking,
+  lc.Team_Orientation,
+  lc.Commercial_Savvy,
+  lc.Value_Creation,
+  lc.Growth_Drive,
+  lc.Curiosity,
+  lc.Lead_Inspire,
+  lc.Social_Empathy,
+  pp.Pauli_Score,
+  pp.IQ_Score,
+  pp.GTQ_Score,
+  pp.TIKI_Score,
+  pa.Papi_P,
+  pa.Papi_W
+FROM
+  employees e
+LEFT JOIN
+  dim_directorates dir
+ON
+  e.directorate_id = dir.directorate_id
+LEFT JOIN
+  dim_grades g
+ON
+  e.grade_id = g.grade_id
+LEFT JOIN
+  dim_education edu
+ON
+  e.education_id = edu.education_id
+LEFT JOIN
+  dim_positions pos
+ON
+  e.position_id = pos.position_id
+LEFT JOIN
+  psych pp
+ON
+  pp.employee_id = e.employee_id
+LEFT JOIN
+  latest_competencies lc
+ON
+  lc.employee_id = e.employee_id
+LEFT JOIN
+  papi_pivot pa
+ON
+  pa.employee_id = e.employee_id;
+
+-- Unique index is required for REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS employee_features_employee_id_idx ON employee_features (employee_id);
+-- Candidate eligibility: the matching queries look the role up by its case-folded
+-- key and filter directorate/grade inside the same index
+CREATE INDEX IF NOT EXISTS employee_features_eligibility_idx
+  ON employee_features (position_key, directorate, grade);
+
+-- Run after every load into employees, competencies_yearly, papi_scores,
+-- profiles_psych or the dim_* tables, followed by the employee_scores refresh
+-- in talent_structure.sql. Readers are not blocked while it runs. The insert
+-- bumps the data version (data_version.sql), so cached results are dropped.
+REFRESH MATERIALIZED VIEW CONCURRENTLY employee_features;
+INSERT INTO data_refreshes (source) VALUES ('employee_features');
@@ -0,0 +1,131 @@
+-- Materialized, indexed copy of employee_report (step_1.sql) that is refreshed
+-- incrementally: triggers on the source tables log the employee_ids they
+-- touch, and refresh_employee_report_snapshot() rebuilds only those
+-- employees. Run after step_1.sql, then read employee_report_snapshot
+-- instead of the view.
+--
+--   SELECT refresh_employee_report_snapshot();      -- changed employees only
+--   SELECT refresh_employee_report_snapshot(TRUE);  -- rebuild everything
+--
+-- Edits to the dim_* tables are not tracked; run a full refresh after them.
+-- Replacing a source table (DROP + CREATE, e.g. pandas to_sql with
+-- if_exists='replace') drops its triggers: re-run this script and do a full
+-- refresh. TRUNCATE is tracked and makes the next refresh a full one.
+
+-- Change log; employee_id NULL means "everything" (after a TRUNCATE)
+CREATE TABLE IF NOT EXISTS employee_report_changes (
+  change_id BIGSERIAL PRIMARY KEY,
+  employee_id TEXT,
+  source_table TEXT NOT NULL,
+  changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION log_employee_report_change() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    INSERT INTO employee_report_changes (employee_id, source_table) VALUES (NULL, TG_TABLE_NAME);
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO employee_report_changes (employee_id, source_table)
+    SELECT DISTINCT employee_id::TEXT, TG_TABLE_NAME FROM new_rows;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO employee_report_changes (employee_id, source_table)
+    SELECT DISTINCT employee_id::TEXT, TG_TABLE_NAME FROM old_rows;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level triggers with transition tables: one log row per employee
+-- and statement, not per source row, so bulk loads stay cheap
+DO $$
+DECLARE
+  source_table TEXT;
+BEGIN
+  FOREACH source_table IN ARRAY ARRAY[
+    'employees', 'competencies_yearly', 'papi_scores', 'strengths', 'profiles_psych', 'performance_yearly'
+  ] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %1$s_report_insert ON %1$I', source_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %1$s_report_update ON %1$I', source_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %1$s_report_delete ON %1$I', source_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %1$s_report_truncate ON %1$I', source_table);
+    EXECUTE format(
+      'CREATE TRIGGER %1$s_report_insert AFTER INSERT ON %1$I '
+      'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION log_employee_report_change()',
+      source_table
+    );
+    EXECUTE format(
+      'CREATE TRIGGER %1$s_report_update AFTER UPDATE ON %1$I '
+      'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT '
+      'EXECUTE FUNCTION log_employee_report_change()',
+      source_table
+    );
+    EXECUTE format(
+      'CREATE TRIGGER %1$s_report_delete AFTER DELETE ON %1$I '
+      'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION log_employee_report_change()',
+      source_table
+    );
+    EXECUTE format(
+      'CREATE TRIGGER %1$s_report_truncate AFTER TRUNCATE ON %1$I '
+      'FOR EACH STATEMENT EXECUTE FUNCTION log_employee_report_change()',
+      source_table
+    );
+  END LOOP;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS employee_report_snapshot AS
+SELECT * FROM employee_report
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS employee_report_snapshot_employee_id_idx ON employee_report_snapshot (employee_id);
+CREATE INDEX IF NOT EXISTS employee_report_snapshot_year_idx ON employee_report_snapshot (year);
+
+-- Rebuild the snapshot rows of every employee in the change log (or all of
+-- them) and clear the log entries it consumed, in one transaction. Returns
+-- the number of employees rebuilt.
+CREATE OR REPLACE FUNCTION refresh_employee_report_snapshot(full_refresh BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+  changed_ids TEXT[];
+  truncated BOOLEAN;
+  rebuilt INTEGER;
+BEGIN
+  -- One refresh at a time; concurrent callers wait and then see an empty log
+  PERFORM pg_advisory_xact_lock(hashtext('employee_report_snapshot'));
+
+  -- Consume exactly the log rows visible now; changes committed later stay
+  -- in the log for the next refresh
+  WITH consumed AS (
+    DELETE FROM employee_report_changes RETURNING employee_id
+  )
+  SELECT
+    ARRAY_AGG(DISTINCT employee_id) FILTER (WHERE employee_id IS NOT NULL),
+    COALESCE(BOOL_OR(employee_id IS NULL), FALSE)
+  INTO changed_ids, truncated
+  FROM consumed;
+
+  IF full_refresh OR truncated THEN
+    DELETE FROM employee_report_snapshot;
+    INSERT INTO employee_report_snapshot SELECT * FROM employee_report;
+    SELECT COUNT(DISTINCT employee_id) INTO rebuilt FROM employee_report_snapshot;
+    ANALYZE employee_report_snapshot;
+    RETURN rebuilt;
+  END IF;
+
+  IF changed_ids IS NULL THEN
+    RETURN 0;
+  END IF;
+
+  -- Deleted employees only lose their rows; the employee_id filter reaches
+  -- every LATERAL aggregate of the view
+  DELETE FROM employee_report_snapshot WHERE employee_id::TEXT = ANY(changed_ids);
+  INSERT INTO employee_report_snapshot
+  SELECT * FROM employee_report WHERE employee_id::TEXT = ANY(changed_ids);
+  RETURN CARDINALITY(changed_ids);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_employee_report_snapshot(TRUE);
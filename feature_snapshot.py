@@ -0,0 +1,223 @@
+"""Versioned on-disk snapshot of the feature matrix.
+
+A snapshot is an uncompressed Arrow IPC file holding ``employee_features``
+plus the talent_structure registry, tagged with the data version it was read
+at. The numeric TVs are stored together as one row-major (employee x TV)
+float64 block. Loading a snapshot memory-maps the file and hands that block
+to ``MatchingEngine.from_arrays`` as is, instead of pulling the matrix from
+Postgres, so a cold process can score without a database round trip or a
+copy of the matrix, and the dashboard can run offline against the newest
+snapshot.
+
+    python feature_snapshot.py --out snapshots/
+
+The database URL comes from ``--database-url`` or ``DB_CONNECTION_STRING``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import create_engine
+
+from matching_engine import MatchingEngine, load_feature_matrix, load_talent_structure
+from result_cache import fetch_data_version
+
+NUMERIC_KINDS = {"decimal", "floating", "integer", "mixed-integer-float"}
+
+# Bump when the file layout changes, so older snapshots are not looked up
+SNAPSHOT_FORMAT = "2"
+
+# FixedSizeList column holding the numeric TV matrix
+NUMERIC_MATRIX = "numeric_tvs"
+
+
+def snapshot_path(directory: str, data_version: str) -> str:
+    digest = hashlib.sha1(f"{SNAPSHOT_FORMAT}:{data_version}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"features-{digest}.arrow")
+
+
+def _column_array(column: pd.Series) -> pa.Array:
+    # Postgres NUMERIC arrives as Decimal objects; store those as float64 with
+    # NaN (not null) for missing values so they map back without a copy
+    if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) in NUMERIC_KINDS:
+        column = pd.to_numeric(column, errors="coerce")
+    if column.dtype.kind == "f":
+        return pa.array(column.to_numpy(dtype=np.float64), from_pandas=False)
+    if column.dtype.kind in "iub":
+        return pa.array(column.to_numpy())
+    return pa.array(column.astype(object).where(column.notna(), None).to_numpy(dtype=object), type=pa.string())
+
+
+def _tv_columns(structure) -> tuple:
+    """(numeric, categorical) feature columns in the engine's TV order."""
+    rows = sorted(tuple(row) for row in structure)
+    numeric = [row[3].lower() for row in rows if row[4] == "numeric"]
+    categorical = [row[3].lower() for row in rows if row[4] != "numeric"]
+    return numeric, categorical
+
+
+def write_feature_snapshot(features: pd.DataFrame, structure, ordinal_ranks, data_version: str,
+                           directory: str) -> str:
+    """Write the snapshot for ``data_version``; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    metadata = {
+        "data_version": str(data_version),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "talent_structure": json.dumps([list(row) for row in structure]),
+        "ordinal_ranks": json.dumps({str(tv_id): ranks for tv_id, ranks in ordinal_ranks.items()}),
+    }
+    # The cleanup MatchingEngine.__init__ would do, done once here
+    features = features.rename(columns=str.lower).drop_duplicates("employee_id")
+    features = features.assign(employee_id=features["employee_id"].astype(str))
+    numeric, _ = _tv_columns(structure)
+    matrix = features[numeric].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    columns = {name: _column_array(column) for name, column in features.drop(columns=numeric).items()}
+    columns[NUMERIC_MATRIX] = pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel()), len(numeric))
+    table = pa.table(columns).replace_schema_metadata(metadata)
+
+    path = snapshot_path(directory, data_version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_feature_snapshot(engine, directory: str, keep: int = 2) -> str:
+    """Snapshot the database's current feature matrix and registry."""
+    data_version = fetch_data_version(engine)
+    structure, ordinal_ranks = load_talent_structure(engine)
+    path = write_feature_snapshot(load_feature_matrix(engine), structure, ordinal_ranks, data_version, directory)
+    prune_snapshots(directory, keep=keep)
+    return path
+
+
+def _open(path: str):
+    return pa.ipc.open_file(pa.memory_map(path, "r"))
+
+
+def snapshot_version(path: str) -> str:
+    """Data version of a snapshot, read from the file footer only."""
+    return _open(path).schema.metadata[b"data_version"].decode("utf-8")
+
+
+def _read(path: str):
+    """(table, structure, ordinal_ranks, metadata) of a memory-mapped snapshot."""
+    reader = _open(path)
+    table = reader.read_all()
+    metadata = {key.decode("utf-8"): value.decode("utf-8") for key, value in reader.schema.metadata.items()}
+    structure = [tuple(row) for row in json.loads(metadata["talent_structure"])]
+    ordinal_ranks = {int(tv_id): ranks for tv_id, ranks in json.loads(metadata["ordinal_ranks"]).items()}
+    return table, structure, ordinal_ranks, metadata
+
+
+def _numeric_matrix(table: pa.Table) -> np.ndarray:
+    """Read-only (employee x numeric TV) view on the mapped file."""
+    column = table.column(NUMERIC_MATRIX)
+    # One record batch per written table; more only if a writer split it
+    lists = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    values = lists.flatten().to_numpy(zero_copy_only=column.num_chunks == 1)
+    return values.reshape(len(lists), lists.type.list_size)
+
+
+def _strings(table: pa.Table, name: str) -> np.ndarray:
+    # Python objects with None for missing values, as the engine holds them
+    return table.column(name).cast(pa.string()).to_numpy(zero_copy_only=False)
+
+
+def read_feature_snapshot(path: str):
+    """(features, structure, ordinal_ranks, metadata) from a snapshot file.
+
+    The frame layout of ``load_feature_matrix``, for inspection; numeric TV
+    columns are unpacked from the matrix block and strings are materialized
+    as Python objects. ``read_snapshot_engine`` skips this frame.
+    """
+    table, structure, ordinal_ranks, metadata = _read(path)
+    matrix = _numeric_matrix(table)
+    features = table.drop_columns([NUMERIC_MATRIX]).to_pandas(split_blocks=True)
+    numeric, _ = _tv_columns(structure)
+    features = features.assign(**{name: matrix[:, k] for k, name in enumerate(numeric)})
+    return features, structure, ordinal_ranks, metadata
+
+
+def read_snapshot_engine(path: str) -> MatchingEngine:
+    """MatchingEngine over a snapshot, scoring on the mapped numeric matrix without copying it."""
+    table, structure, ordinal_ranks, _ = _read(path)
+    _, categorical = _tv_columns(structure)
+    position = pd.Series(_strings(table, "position"), dtype=object)
+    return MatchingEngine.from_arrays(
+        structure, ordinal_ranks, _numeric_matrix(table), {name: _strings(table, name) for name in categorical},
+        _strings(table, "employee_id"), _strings(table, "directorate"), _strings(table, "grade"),
+        _strings(table, "education"),
+        # Same key as employee_features.position_key
+        position.str.strip().str.lower().to_numpy(dtype=object),
+    )
+
+
+def latest_snapshot(directory: str):
+    """Path of the most recently written snapshot, or None."""
+    if not directory or not os.path.isdir(directory):
+        return None
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".arrow")]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def prune_snapshots(directory: str, keep: int = 2):
+    """Delete all but the ``keep`` newest snapshots."""
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".arrow")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        os.remove(path)
+
+
+def load_matching_engine(engine, directory: str, data_version: str):
+    """MatchingEngine for ``data_version``, from its snapshot when there is one.
+
+    Otherwise (no or stale snapshot) the matrix is read from Postgres and
+    written as the new snapshot. Returns (matching_engine, source).
+    """
+    path = snapshot_path(directory, data_version) if directory else None
+    if path and os.path.exists(path):
+        return read_snapshot_engine(path), "snapshot"
+
+    structure, ordinal_ranks = load_talent_structure(engine)
+    features = load_feature_matrix(engine)
+    if directory:
+        write_feature_snapshot(features, structure, ordinal_ranks, data_version, directory)
+        prune_snapshots(directory)
+    return MatchingEngine(features, structure, ordinal_ranks), "database"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a feature matrix snapshot for offline / fast cold-start use.")
+    parser.add_argument("--out", default="snapshots", help="snapshot directory (default: snapshots)")
+    parser.add_argument("--keep", type=int, default=2, help="snapshots to keep (default: 2)")
+    parser.add_argument("--database-url", default=os.environ.get("DB_CONNECTION_STRING"))
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("--database-url or DB_CONNECTION_STRING is required")
+
+    start = time.perf_counter()
+    engine = create_engine(args.database_url)
+    try:
+        path = export_feature_snapshot(engine, args.out, keep=args.keep)
+    finally:
+        engine.dispose()
+    summary = {
+        "path": path,
+        "data_version": snapshot_version(path),
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    print(json.dumps(summary, indent=2))
+    return path
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""AI-generated job profiles via OpenRouter, with a persistent local cache.
+
+Profiles only depend on (role, level, purpose), the model that wrote them and
+the prompt, so they are cached in a small SQLite file keyed on exactly that.
+Streamlit reruns (candidate selection, checkboxes) then redraw from disk
+instead of calling OpenRouter again, and the cache survives restarts.
+
+``submit_job_profile`` runs generation on a background thread pool over a
+pooled HTTP session, so the dashboard can render the ranking first and fill
+the profile in when it arrives. Set ``OPENROUTER_URL`` to point it at a
+local mock server.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OPENROUTER_URL = os.environ.get("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Bump whenever SYSTEM_PROMPT or the user block changes so stale profiles are not served
+PROMPT_VERSION = "1"
+
+# (model, allow reasoning fallback when content is blank), tried in order
+MODELS = [
+    ("tngtech/deepseek-r1t2-chimera:free", False),
+    ("minimax/minimax-m2:free", True),
+]
+
+SYSTEM_PROMPT = (
+    "You are an expert HR job architect. Write a concise, role-ready job profile with three sections: "
+    "Job Requirements (bullet list, 6-10 bullets), Job Description, and Key Competencies (bullet list, 5-8 bullets). "
+    "Be specific and actionable. Avoid placeholders. "
+    "Output the result ONLY, in the requested format, and DO NOT include any reasoning, process, or meta-commentary. Just output the job profile content as specified."
+)
+
+
+# Shared keep-alive connection pool for every OpenRouter call in the process
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="job-profile")
+_in_flight = {}
+_in_flight_lock = threading.RLock()
+
+
+def build_messages(role: str, level: str, purpose: str) -> list:
+    user_block = (
+        f"Role: {role}\nLevel: {level}\nPurpose: {purpose}\n"
+        "Output format EXACTLY:\n\n"
+        "Job Requirements:\n- ...\n\n"
+        "Job Description:\n<one short paragraph>\n\n"
+        "Key Competencies:\n- ...\n"
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_block}
+    ]
+
+
+def extract_content(data: dict, allow_reasoning: bool = False) -> str:
+    """Pull the profile text out of a chat completion response."""
+    message = data.get("choices", [{}])[0].get("message", {})
+    content = message.get("content") or ""
+    if not content and allow_reasoning:
+        # Some free models leave content blank and put the answer in reasoning
+        content = message.get("reasoning") or ""
+        if not content:
+            reasoning_details = message.get("reasoning_details", [])
+            if reasoning_details and isinstance(reasoning_details, list):
+                content = reasoning_details[0].get("text", "")
+    return content.strip()
+
+
+def request_profile(model: str, api_key: str, messages: list, allow_reasoning: bool = False,
+                    session=None, url: str = OPENROUTER_URL, timeout: float = 30):
+    """Single OpenRouter call. Returns (status_code, response_json, content)."""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://localhost",
+        "X-Title": "AI Talent Analytics Dashboard",
+    }
+    body = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.2,
+        "max_tokens": 500
+    }
+    resp = (session or http_session).post(url, headers=headers, json=body, timeout=timeout)
+    try:
+        data = resp.json()
+    except Exception:
+        data = {}
+    content = extract_content(data, allow_reasoning) if resp.status_code == 200 else ""
+    return resp.status_code, data, content
+
+
+def normalize_text(value: str) -> str:
+    return " ".join(str(value or "").split())
+
+
+class ProfileCache:
+    """Size-bounded SQLite cache with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, path: str = "job_profile_cache.sqlite3", max_entries: int = 500,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_profiles ("
+                " cache_key TEXT PRIMARY KEY,"
+                " profile TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS job_profiles_last_access ON job_profiles (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(role: str, level: str, purpose: str, model: str, prompt_version: str = PROMPT_VERSION) -> str:
+        payload = json.dumps([
+            normalize_text(role).lower(),
+            normalize_text(level).lower(),
+            normalize_text(purpose),
+            model,
+            prompt_version,
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT profile, created_at FROM job_profiles WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            profile, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM job_profiles WHERE cache_key = ?", (key,))
+                return None
+            conn.execute("UPDATE job_profiles SET last_access = ? WHERE cache_key = ?", (now, key))
+            return profile
+
+    def set(self, key: str, profile: str):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_profiles (cache_key, profile, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, profile, now, now)
+            )
+            conn.execute("DELETE FROM job_profiles WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM job_profiles WHERE cache_key NOT IN ("
+                " SELECT cache_key FROM job_profiles ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM job_profiles").fetchone()[0]
+
+
+def cached_profile(role: str, level: str, purpose: str, cache: ProfileCache):
+    """Cached profile from any model in the fallback chain, or None."""
+    for model, _ in MODELS:
+        profile = cache.get(ProfileCache.make_key(role, level, purpose, model))
+        if profile:
+            return profile
+    return None
+
+
+def _remember(cache, role: str, level: str, purpose: str, model: str, content: str):
+    if cache is not None:
+        cache.set(ProfileCache.make_key(role, level, purpose, model), content)
+
+
+def generate_job_profile(role: str, level: str, purpose: str, api_keys: list,
+                         cache: ProfileCache = None, session=None, url: str = OPENROUTER_URL) -> str:
+    """Job profile text, trying each model in MODELS in turn.
+
+    ``api_keys`` holds one OpenRouter key per entry of MODELS. Successful
+    profiles are stored in ``cache``; error messages never are.
+    """
+    if cache is not None:
+        profile = cached_profile(role, level, purpose, cache)
+        if profile:
+            return profile
+    try:
+        messages = build_messages(role, level, purpose)
+        attempts = []
+        for (model, allow_reasoning), api_key in zip(MODELS, api_keys):
+            status, data, content = request_profile(model, api_key, messages, allow_reasoning, session=session, url=url)
+            if status == 200 and content:
+                _remember(cache, role, level, purpose, model, content)
+                return content
+            attempts.append(f"({model}: {status} - {str(data)})")
+        # Semua model gagal, tampilkan detail tiap attempt (untuk helpdesk/diagnosis)
+        return f"AI error: {' '.join(attempts)}"
+    except Exception as ex:
+        return f"AI error: {ex}"
+
+
+def race_job_profile(role: str, level: str, purpose: str, api_keys: list,
+                     cache: ProfileCache = None, session=None, url: str = OPENROUTER_URL) -> str:
+    """Query every model in MODELS at once and return the first valid profile."""
+    if cache is not None:
+        profile = cached_profile(role, level, purpose, cache)
+        if profile:
+            return profile
+    messages = build_messages(role, level, purpose)
+    pool = ThreadPoolExecutor(max_workers=len(MODELS), thread_name_prefix="job-profile-race")
+    try:
+        futures = {
+            pool.submit(request_profile, model, api_key, messages, allow_reasoning, session, url): model
+            for (model, allow_reasoning), api_key in zip(MODELS, api_keys)
+        }
+        attempts = []
+        for future in as_completed(futures):
+            model = futures[future]
+            try:
+                status, data, content = future.result()
+            except Exception as ex:
+                attempts.append(f"({model}: {ex})")
+                continue
+            if status == 200 and content:
+                _remember(cache, role, level, purpose, model, content)
+                return content
+            attempts.append(f"({model}: {status} - {str(data)})")
+        return f"AI error: {' '.join(attempts)}"
+    finally:
+        # Do not wait for the slower model; its thread finishes (or times out) on its own
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_job_profile(role: str, level: str, purpose: str, api_keys: list,
+                       cache: ProfileCache = None, race: bool = False, url: str = OPENROUTER_URL) -> Future:
+    """Start profile generation in the background and return its Future.
+
+    Cache hits come back as an already-completed Future. Identical requests
+    that are still running share one Future instead of calling OpenRouter twice.
+    """
+    if cache is not None:
+        profile = cached_profile(role, level, purpose, cache)
+        if profile:
+            future = Future()
+            future.set_result(profile)
+            return future
+
+    key = ProfileCache.make_key(role, level, purpose, "race" if race else "chain")
+    generate = race_job_profile if race else generate_job_profile
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = _executor.submit(generate, role, level, purpose, api_keys, cache=cache, url=url)
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _forget(key))
+    return future
+
+
+def _forget(key: str):
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
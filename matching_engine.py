@@ -0,0 +1,863 @@
+"""In-process, vectorized version of the talent matching query.
+
+The dashboard query computes, per benchmark set, a baseline (median or mode)
+for every Talent Variable (TV), a capped candidate/baseline ratio per TV, the
+TGV averages and finally the weighted final match rate. ``MatchingEngine``
+loads the one-row-per-employee feature matrix once and reproduces that chain
+with NumPy/pandas array operations, so re-scoring a new benchmark set does
+not need a database round trip.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+# Offline copy of the talent_structure registry (talent_structure.sql), used when the
+# engine is built without a database. (tv_order = tv_id, tgv_name, tv_name,
+# column_name, data_type, scoring_direction)
+TALENT_STRUCTURE = [
+    (1, "Execution Excellence", "Quality Delivery", "Quality_Delivery", "numeric", "higher_is_better"),
+    (2, "Execution Excellence", "Forward Thinking", "Forward_Thinking", "numeric", "higher_is_better"),
+    (3, "Execution Excellence", "Team Orientation", "Team_Orientation", "numeric", "higher_is_better"),
+    (4, "Strategic Impact", "Commercial Savvy", "Commercial_Savvy", "numeric", "higher_is_better"),
+    (5, "Strategic Impact", "Value Creation", "Value_Creation", "numeric", "higher_is_better"),
+    (6, "Growth & Innovation", "Growth Drive", "Growth_Drive", "numeric", "higher_is_better"),
+    (7, "Growth & Innovation", "Curiosity", "Curiosity", "numeric", "higher_is_better"),
+    (8, "People Leadership", "Lead & Inspire", "Lead_Inspire", "numeric", "higher_is_better"),
+    (9, "People Leadership", "Social Empathy", "Social_Empathy", "numeric", "higher_is_better"),
+    (10, "Motivation & Drive", "Pauli Score", "Pauli_Score", "numeric", "higher_is_better"),
+    (11, "Cognitive Complexity", "IQ Score", "IQ_Score", "numeric", "higher_is_better"),
+    (12, "Cognitive Complexity", "GTQ Score", "GTQ_Score", "numeric", "higher_is_better"),
+    (13, "Cognitive Complexity", "TIKI Score", "TIKI_Score", "numeric", "higher_is_better"),
+    (14, "Demographics", "Education Level", "education", "categorical", "at_least"),
+    (15, "Demographics", "DISC Profile", "disc", "categorical", "exact_match"),
+    (16, "PAPI Alignment", "Papi_P", "Papi_P", "numeric", "higher_is_better"),
+    (17, "PAPI Alignment", "Papi_W", "Papi_W", "numeric", "higher_is_better"),
+]
+
+STRUCTURE_COLUMNS = ["tv_order", "tgv_name", "tv_name", "column_name", "data_type", "scoring_direction"]
+
+# Ordinal education ladder used by the 'Education Level' TV (D3 < S1 < S2)
+EDUCATION_RANK = {"D3": 3, "S1": 4, "S2": 5}
+
+# Ladders of the 'at_least' TVs by tv_id, as in talent_ordinal_ranks
+ORDINAL_RANKS = {14: EDUCATION_RANK}
+
+STRUCTURE_QUERY = """
+SELECT tv_id AS tv_order, tgv_name, tv_name, column_name, data_type, scoring_direction
+FROM talent_structure
+ORDER BY tv_id
+"""
+ORDINAL_RANKS_QUERY = "SELECT tv_id, value, rank FROM talent_ordinal_ranks"
+
+# Same columns and order as the dashboard query output
+RESULT_COLUMNS = [
+    "employee_id", "directorate", "role", "grade", "tgv_name", "tv_name",
+    "baseline_score", "user_score", "tv_match_rate", "tgv_match_rate", "final_match_rate",
+]
+
+# One row per employee, maintained by employee_features.sql
+FEATURE_QUERY = "SELECT * FROM employee_features"
+
+# Values of the grades pool filter
+GRADES_QUERY = "SELECT DISTINCT grade FROM employee_features WHERE grade IS NOT NULL ORDER BY grade"
+
+# Baselines of the benchmark_ids parameter. benchmark_cohorts.py swaps in the
+# stored baselines of a named cohort instead (see cohort_query).
+BASELINE_SCORES = """
+baseline_scores AS (
+    -- Median (numeric) or mode (categorical) per registry TV, one grouped pass
+    -- over the benchmark employees' rows of employee_scores
+    SELECT tb.job_vacancy_id, tb.role_name, tb.job_level, tb.weights_config,
+        ts.tv_id, ts.tgv_name, ts.tv_name, ts.data_type, ts.scoring_direction,
+        CASE 
+            WHEN ts.data_type = 'categorical' THEN MODE() WITHIN GROUP (ORDER BY es.score_text)
+            ELSE (PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY es.score_numeric))::TEXT
+        END AS baseline_score
+    FROM tb
+    CROSS JOIN UNNEST(tb.selected_talent_ids) AS benchmark_employee_id
+    INNER JOIN employee_scores es ON es.employee_id = benchmark_employee_id
+    INNER JOIN talent_structure ts ON ts.tv_id = es.tv_id
+    GROUP BY tb.job_vacancy_id, tb.role_name, tb.job_level, tb.weights_config,
+        ts.tv_id, ts.tgv_name, ts.tv_name, ts.data_type, ts.scoring_direction
+)
+""".strip()
+
+# CTE chain shared by the matching queries below. Parameters: job_vacancy_id,
+# role_name, job_level, benchmark_ids (list), weights_config (JSON text) and the
+# optional pool filters directorates and grades (list, or None for all).
+MATCHING_CTES = """
+WITH tb AS (
+    SELECT 
+        %(job_vacancy_id)s::TEXT AS job_vacancy_id,
+        %(role_name)s::TEXT AS role_name,
+        %(job_level)s::TEXT AS job_level,
+        %(weights_config)s::JSONB AS weights_config,
+        %(benchmark_ids)s::TEXT[] AS selected_talent_ids
+),
+eligible AS (
+    -- Candidate pool first, through the (position_key, directorate, grade)
+    -- index; the scoring CTEs below only see these employees
+    SELECT e.employee_id, e.directorate, e.grade, e.position, e.education
+    FROM employee_features e
+    WHERE e.position_key = LOWER(TRIM(%(role_name)s::TEXT))
+        AND (%(directorates)s::TEXT[] IS NULL OR e.directorate = ANY(%(directorates)s::TEXT[]))
+        AND (%(grades)s::TEXT[] IS NULL OR e.grade = ANY(%(grades)s::TEXT[])){employee_filter}
+),
+{baseline_scores},
+tv_match_rates AS (
+    SELECT e.employee_id, e.directorate, e.grade, e.position, e.education,
+        bs.job_vacancy_id, bs.job_level, bs.tgv_name, bs.tv_name, bs.baseline_score, bs.role_name, bs.weights_config,
+        es.score_text AS user_score,
+        CASE bs.scoring_direction
+            WHEN 'at_least' THEN
+                -- Missing or unlisted values rank 0
+                CASE WHEN COALESCE(ur.rank, 0) >= COALESCE(br.rank, 0) THEN 100.00 ELSE 0.00 END
+            WHEN 'exact_match' THEN
+                CASE 
+                    WHEN es.score_text IS NULL THEN NULL
+                    WHEN es.score_text = bs.baseline_score THEN 100.00 
+                    ELSE 0.00 
+                END
+            WHEN 'higher_is_better' THEN
+                CASE 
+                    WHEN bs.baseline_score::NUMERIC = 0 THEN NULL
+                    WHEN es.score_numeric IS NULL THEN NULL
+                    ELSE LEAST((es.score_numeric / bs.baseline_score::NUMERIC) * 100, 100.00)
+                END
+            WHEN 'lower_is_better' THEN
+                CASE 
+                    WHEN bs.baseline_score::NUMERIC = 0 THEN NULL
+                    WHEN es.score_numeric IS NULL THEN NULL
+                    ELSE LEAST(((2 * bs.baseline_score::NUMERIC - es.score_numeric) / bs.baseline_score::NUMERIC) * 100, 100.00)
+                END
+        END AS tv_match_rate
+    FROM eligible e 
+    CROSS JOIN baseline_scores bs 
+    LEFT JOIN employee_scores es 
+        ON es.employee_id = e.employee_id 
+        AND es.tv_id = bs.tv_id
+    LEFT JOIN talent_ordinal_ranks br 
+        ON br.tv_id = bs.tv_id 
+        AND br.value = bs.baseline_score
+    LEFT JOIN talent_ordinal_ranks ur 
+        ON ur.tv_id = bs.tv_id 
+        AND ur.value = es.score_text
+),
+tgv_match_rates AS (
+    SELECT employee_id, job_vacancy_id, tgv_name, weights_config,
+        ROUND(AVG(tv_match_rate), 2) AS tgv_match_rate
+    FROM tv_match_rates
+    WHERE tv_match_rate IS NOT NULL
+    GROUP BY employee_id, job_vacancy_id, tgv_name, weights_config
+),
+final_match_rates AS (
+    SELECT tgv.employee_id, tgv.job_vacancy_id,
+        ROUND(
+            CASE 
+                WHEN tgv.weights_config ? 'tgv_weights' THEN
+                    SUM(tgv.tgv_match_rate * COALESCE(
+                        (tgv.weights_config->'tgv_weights'->>tgv.tgv_name)::NUMERIC, 0
+                    )) / NULLIF(
+                        SUM(COALESCE((tgv.weights_config->'tgv_weights'->>tgv.tgv_name)::NUMERIC, 0)), 0
+                    )
+                ELSE 
+                    AVG(tgv.tgv_match_rate) 
+            END, 2
+        ) AS final_match_rate
+    FROM tgv_match_rates tgv
+    GROUP BY tgv.employee_id, tgv.job_vacancy_id, tgv.weights_config
+)
+""".replace("{baseline_scores}", BASELINE_SCORES)
+
+# Parameterized SQL version of MatchingEngine.score, run by the dashboard when the
+# in-process engine is switched off.
+MATCHING_QUERY = MATCHING_CTES.replace("{employee_filter}", "").rstrip() + """
+SELECT
+    tv.employee_id,
+    tv.directorate,
+    tv.role_name AS role,
+    tv.grade,
+    tv.tgv_name,
+    tv.tv_name,
+    tv.baseline_score,
+    tv.user_score,
+    ROUND(tv.tv_match_rate, 2) AS tv_match_rate,
+    tgv.tgv_match_rate,
+    fm.final_match_rate
+FROM tv_match_rates tv
+INNER JOIN tgv_match_rates tgv 
+    ON tv.employee_id = tgv.employee_id 
+    AND tv.job_vacancy_id = tgv.job_vacancy_id 
+    AND tv.tgv_name = tgv.tgv_name
+INNER JOIN final_match_rates fm 
+    ON tv.employee_id = fm.employee_id 
+    AND tv.job_vacancy_id = fm.job_vacancy_id
+WHERE tv.tv_match_rate IS NOT NULL
+ORDER BY fm.final_match_rate DESC NULLS LAST, tv.tgv_name, tv.tv_name;
+"""
+
+# Top-K mode: TV rows only for the top_k best candidates and the benchmark
+# employees, TGV rows for the rest of the pool, plus one baseline row per TV
+# (employee_id NULL). Pool rows have tv_name NULL. Extra parameter: top_k.
+TOP_K_QUERY = MATCHING_CTES.replace("{employee_filter}", "").rstrip() + """,
+ranked AS (
+    SELECT employee_id, job_vacancy_id,
+        ROW_NUMBER() OVER (ORDER BY final_match_rate DESC NULLS LAST, employee_id) AS final_rank
+    FROM final_match_rates
+),
+detail_employees AS (
+    SELECT r.employee_id, r.job_vacancy_id
+    FROM ranked r
+    CROSS JOIN tb
+    WHERE r.final_rank <= %(top_k)s
+        OR r.employee_id = ANY(tb.selected_talent_ids)
+)
+SELECT
+    tv.employee_id,
+    tv.directorate,
+    tv.role_name AS role,
+    tv.grade,
+    tv.education,
+    tv.tgv_name,
+    tv.tv_name,
+    tv.baseline_score,
+    tv.user_score,
+    ROUND(tv.tv_match_rate, 2) AS tv_match_rate,
+    tgv.tgv_match_rate,
+    fm.final_match_rate
+FROM tv_match_rates tv
+INNER JOIN detail_employees d 
+    ON d.employee_id = tv.employee_id 
+    AND d.job_vacancy_id = tv.job_vacancy_id
+INNER JOIN tgv_match_rates tgv 
+    ON tv.employee_id = tgv.employee_id 
+    AND tv.job_vacancy_id = tgv.job_vacancy_id 
+    AND tv.tgv_name = tgv.tgv_name
+INNER JOIN final_match_rates fm 
+    ON tv.employee_id = fm.employee_id 
+    AND tv.job_vacancy_id = fm.job_vacancy_id
+WHERE tv.tv_match_rate IS NOT NULL
+UNION ALL
+SELECT
+    tgv.employee_id,
+    e.directorate,
+    tb.role_name,
+    e.grade,
+    e.education,
+    tgv.tgv_name,
+    NULL,
+    NULL,
+    NULL,
+    NULL,
+    tgv.tgv_match_rate,
+    fm.final_match_rate
+FROM tgv_match_rates tgv
+CROSS JOIN tb
+INNER JOIN final_match_rates fm 
+    ON tgv.employee_id = fm.employee_id 
+    AND tgv.job_vacancy_id = fm.job_vacancy_id
+INNER JOIN eligible e 
+    ON e.employee_id = tgv.employee_id
+WHERE NOT EXISTS (SELECT 1 FROM detail_employees d WHERE d.employee_id = tgv.employee_id)
+UNION ALL
+SELECT NULL, NULL, bs.role_name, NULL, NULL, bs.tgv_name, bs.tv_name, bs.baseline_score, NULL, NULL, NULL, NULL
+FROM baseline_scores bs
+ORDER BY final_match_rate DESC NULLS LAST, tgv_name, tv_name;
+"""
+
+# TV rows of the given employees only, for loading candidate detail on demand
+# after a top-K run. Extra parameter: employee_ids (list).
+DETAIL_QUERY = MATCHING_CTES.replace(
+    "{employee_filter}", "\n        AND e.employee_id = ANY(%(employee_ids)s::TEXT[])"
+).rstrip() + """
+SELECT
+    tv.employee_id,
+    tv.tgv_name,
+    tv.tv_name,
+    tv.baseline_score,
+    tv.user_score,
+    ROUND(tv.tv_match_rate, 2) AS tv_match_rate
+FROM tv_match_rates tv
+WHERE tv.tv_match_rate IS NOT NULL
+ORDER BY tv.employee_id, tv.tgv_name, tv.tv_name;
+"""
+
+
+def load_feature_matrix(engine) -> pd.DataFrame:
+    """Read the one-row-per-employee feature matrix from the database."""
+    return pd.read_sql(FEATURE_QUERY, engine)
+
+
+def load_grades(engine) -> list:
+    """Distinct employee grades (e.g. III, IV, V), the values ``grades`` filters on."""
+    return pd.read_sql(GRADES_QUERY, engine)["grade"].astype(str).tolist()
+
+
+def load_talent_structure(engine):
+    """Registry rows and ordinal ladders from the talent_structure tables."""
+    structure = list(pd.read_sql(STRUCTURE_QUERY, engine).itertuples(index=False, name=None))
+    ordinal_ranks = {}
+    for tv_id, value, rank in pd.read_sql(ORDINAL_RANKS_QUERY, engine).itertuples(index=False, name=None):
+        ordinal_ranks.setdefault(tv_id, {})[value] = rank
+    return structure, ordinal_ranks
+
+
+def round_half_up(values, decimals: int = 2):
+    """ROUND() as Postgres does it on NUMERIC (half away from zero)."""
+    factor = 10 ** decimals
+    values = np.asarray(values, dtype=np.float64)
+    return np.sign(values) * np.floor(np.abs(values) * factor + 0.5 + 1e-9) / factor
+
+
+def format_score(values) -> np.ndarray:
+    """Render numeric scores the way ``::TEXT`` does (no trailing '.0')."""
+    values = np.asarray(values)
+    if values.dtype.kind != "f":
+        values = values.astype(np.float64)
+    # float32 inputs print with float32 precision, so 2.7 stays '2.7'
+    text = values.astype(str).astype(object)
+    integral = np.isfinite(values) & (values == np.floor(values))
+    text[integral] = values[integral].astype(np.int64).astype(str)
+    text[np.isnan(values)] = None
+    return text
+
+
+def mode_value(values: pd.Series):
+    """MODE() WITHIN GROUP: most frequent non-null value, smallest on ties."""
+    counts = values.dropna().value_counts()
+    if counts.empty:
+        return None
+    return sorted(counts.index[counts == counts.max()])[0]
+
+
+def parse_tgv_weights(weights_config):
+    """Return the ``tgv_weights`` mapping, or None when the config has none."""
+    if isinstance(weights_config, str):
+        weights_config = json.loads(weights_config)
+    if not weights_config or "tgv_weights" not in weights_config:
+        return None
+    return weights_config["tgv_weights"]
+
+
+class MatchingEngine:
+    """Scores employees against a benchmark set using the cached feature matrix."""
+
+    def __init__(self, features: pd.DataFrame, structure=TALENT_STRUCTURE, ordinal_ranks=ORDINAL_RANKS):
+        # Postgres folds unquoted aliases (Quality_Delivery -> quality_delivery)
+        features = features.rename(columns=str.lower).drop_duplicates("employee_id")
+        features = features.assign(employee_id=features["employee_id"].astype(str))
+        self.features = features.set_index("employee_id")
+        self._employee_index = self.features.index
+        self._set_structure(structure, ordinal_ranks)
+
+        self._numeric_values = (
+            self.features[self._numeric_tvs["feature"]]
+            .apply(pd.to_numeric, errors="coerce")
+            .to_numpy(dtype=np.float64)
+        )
+        # Attribute arrays are built once per load, not per run
+        self._categorical_values = {
+            feature: self.features[feature].to_numpy(dtype=object) for feature in self._categorical_tvs["feature"]
+        }
+        self._employee_ids = self.features.index.to_numpy(dtype=object)
+        self._directorate = self.features["directorate"].to_numpy(dtype=object)
+        self._grade = self.features["grade"].to_numpy(dtype=object)
+        self._education = self.features["education"].to_numpy(dtype=object)
+        # Same key as employee_features.position_key
+        self._position_key = self.features["position"].str.strip().str.lower().to_numpy()
+        self._index_positions()
+
+    def _index_positions(self):
+        """Rows per position key, so a run only touches its role's employees."""
+        self._rows_by_position = pd.Series(np.arange(len(self._position_key))).groupby(self._position_key).indices
+
+    def _set_structure(self, structure, ordinal_ranks):
+        self.structure = pd.DataFrame(list(structure), columns=STRUCTURE_COLUMNS).sort_values("tv_order")
+        self.structure = self.structure.reset_index(drop=True)
+        self.structure["feature"] = self.structure["column_name"].str.lower()
+        self.ordinal_ranks = ordinal_ranks
+
+        numeric = self.structure["data_type"] == "numeric"
+        self._numeric_tvs = self.structure[numeric]
+        self._categorical_tvs = self.structure[~numeric]
+
+    @classmethod
+    def from_database(cls, engine):
+        structure, ordinal_ranks = load_talent_structure(engine)
+        return cls(load_feature_matrix(engine), structure, ordinal_ranks)
+
+    @classmethod
+    def from_arrays(cls, structure, ordinal_ranks, numeric_values, categorical_values, employee_ids, directorate,
+                    grade, education, position_key):
+        """Engine over prebuilt per-employee arrays instead of a feature frame.
+
+        Used for one shard of a shared-memory pool (see parallel_scoring.py)
+        and for feature snapshots (see feature_snapshot.py); the arrays are
+        kept as given, not copied. It has no ``features`` frame;
+        ``numeric_values`` columns follow the numeric TVs.
+        """
+        matching_engine = cls.__new__(cls)
+        matching_engine.features = None
+        matching_engine._employee_index = pd.Index(employee_ids)
+        matching_engine._set_structure(structure, ordinal_ranks)
+        matching_engine._numeric_values = numeric_values
+        matching_engine._categorical_values = categorical_values
+        matching_engine._employee_ids = employee_ids
+        matching_engine._directorate = directorate
+        matching_engine._grade = grade
+        matching_engine._education = education
+        matching_engine._position_key = position_key
+        matching_engine._index_positions()
+        return matching_engine
+
+    def compute_baselines(self, benchmark_ids) -> pd.DataFrame:
+        """Median (numeric) or mode (categorical) per TV over the benchmark employees.
+
+        TVs without a baseline are dropped, like the ``HAVING ... IS NOT NULL``
+        clause of ``baseline_scores``.
+        """
+        return self.compute_baselines_many([benchmark_ids])[0]
+
+    def compute_baselines_many(self, benchmark_sets) -> list:
+        """``compute_baselines`` for several benchmark sets in one grouped pass."""
+        rows, set_ids = [], []
+        for k, benchmark_ids in enumerate(benchmark_sets):
+            # Hash lookups, not a scan of the whole index; same rows as isin()
+            found = self._employee_index.get_indexer([str(i) for i in benchmark_ids])
+            found = np.unique(found[found >= 0])
+            rows.append(found)
+            set_ids.append(np.full(len(found), k))
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        set_ids = np.concatenate(set_ids) if set_ids else np.empty(0, dtype=np.int64)
+        n_sets = len(benchmark_sets)
+
+        medians = pd.DataFrame(self._numeric_values[rows]).groupby(set_ids).median()
+        medians = medians.reindex(range(n_sets)).to_numpy()
+
+        # MODE(): most frequent value per set, smallest on ties
+        modes = {}
+        for feature in self._categorical_tvs["feature"]:
+            counts = (
+                pd.DataFrame({"set": set_ids, "value": self._categorical_values[feature][rows]})
+                .dropna().value_counts().rename("n").reset_index()
+                .sort_values(["set", "n", "value"], ascending=[True, False, True], kind="mergesort")
+                .drop_duplicates("set")
+            )
+            modes[feature] = dict(zip(counts["set"], counts["value"]))
+
+        results = []
+        for k in range(n_sets):
+            numeric = self._numeric_tvs.copy()
+            numeric["baseline_value"] = medians[k] if len(self._numeric_tvs) else []
+            numeric["baseline_score"] = format_score(numeric["baseline_value"])
+
+            categorical = self._categorical_tvs.copy()
+            categorical["baseline_value"] = np.nan
+            categorical["baseline_score"] = [modes[feature].get(k) for feature in categorical["feature"]]
+
+            baselines = pd.concat([numeric, categorical]).sort_values("tv_order")
+            results.append(baselines[baselines["baseline_score"].notna()].reset_index(drop=True))
+        return results
+
+    def stored_baselines(self, scores: pd.DataFrame) -> pd.DataFrame:
+        """``compute_baselines`` layout from stored (tv_name, baseline_score) rows.
+
+        For baselines computed ahead of time, e.g. a benchmark cohort's
+        (benchmark_cohorts.py); TVs not in the registry are dropped.
+        """
+        baselines = self.structure.merge(scores[["tv_name", "baseline_score"]], on="tv_name")
+        numeric = (baselines["data_type"] == "numeric").to_numpy()
+        values = pd.to_numeric(baselines["baseline_score"].where(numeric), errors="coerce").to_numpy(np.float64)
+        baselines["baseline_value"] = values
+        baselines["baseline_score"] = np.where(numeric, format_score(values), baselines["baseline_score"])
+        baselines = baselines.sort_values("tv_order")
+        return baselines[baselines["baseline_score"].notna()].reset_index(drop=True)
+
+    def _tv_match_matrix(self, rows: np.ndarray, baselines: pd.DataFrame):
+        """TV match rates (unrounded) and user scores for the given employee rows."""
+        n_rows, n_tvs = len(rows), len(baselines)
+        rates = np.full((n_rows, n_tvs), np.nan)
+        user_scores = {}
+
+        numeric_position = {feature: i for i, feature in enumerate(self._numeric_tvs["feature"])}
+        for j, tv in enumerate(baselines.itertuples(index=False)):
+            if tv.data_type == "numeric":
+                values = self._numeric_values[rows, numeric_position[tv.feature]]
+                baseline = tv.baseline_value
+                user_scores[tv.tv_name] = values.astype(np.float32)
+                if np.isnan(baseline) or baseline == 0:
+                    continue
+                if tv.scoring_direction == "higher_is_better":
+                    rates[:, j] = np.minimum(values / baseline * 100, 100.0)
+                elif tv.scoring_direction == "lower_is_better":
+                    rates[:, j] = np.minimum((2 * baseline - values) / baseline * 100, 100.0)
+            else:
+                values = self._categorical_values[tv.feature][rows]
+                user_scores[tv.tv_name] = pd.Categorical(values)
+                missing = pd.isna(values)
+                if tv.scoring_direction == "at_least":
+                    # Missing or unlisted values rank 0
+                    ranks = self.ordinal_ranks.get(tv.tv_order, {})
+                    user_rank = np.array([ranks.get(v, 0) for v in values])
+                    rates[:, j] = np.where(user_rank >= ranks.get(tv.baseline_score, 0), 100.0, 0.0)
+                else:
+                    rates[:, j] = np.where(values == tv.baseline_score, 100.0, 0.0)
+                    rates[missing, j] = np.nan
+        return rates, pd.DataFrame(user_scores)
+
+    def grades(self) -> list:
+        """Distinct grades of the feature matrix, as ``load_grades``."""
+        return sorted({str(grade) for grade in self._grade if not pd.isna(grade)})
+
+    def eligible_rows(self, role_name: str, directorates=None, grades=None) -> np.ndarray:
+        """Rows of the role's employees, optionally limited to some directorates/grades.
+
+        Mirrors the ``eligible`` CTE: a lookup on the position key, then the
+        filters on that pool only.
+        """
+        rows = self._rows_by_position.get(str(role_name).strip().lower(), np.empty(0, dtype=np.int64))
+        if directorates is not None:
+            rows = rows[np.isin(self._directorate[rows], list(directorates))]
+        if grades is not None:
+            rows = rows[np.isin(self._grade[rows], list(grades))]
+        return rows
+
+    def match(self, role_name: str, benchmark_ids, weights_config=None, baselines=None, directorates=None,
+              grades=None) -> "MatchResult":
+        """Score the role's employee pool into a compact, re-weightable result.
+
+        ``baselines`` skips the baseline step when they were computed already
+        (see ``compute_baselines_many``). ``directorates`` and ``grades``
+        (None: all) narrow the pool before scoring; benchmarks are unaffected.
+        """
+        rows = self.eligible_rows(role_name, directorates, grades)
+        if len(rows) == 0:
+            return MatchResult.no_candidates(role_name, weights_config)
+        if baselines is None:
+            baselines = self.compute_baselines(benchmark_ids)
+        return self.match_rows(role_name, rows, baselines, weights_config)
+
+    def match_rows(self, role_name: str, rows: np.ndarray, baselines: pd.DataFrame,
+                   weights_config=None) -> "MatchResult":
+        """Score the employees at engine ``rows`` against ``baselines``, whatever their position.
+
+        ``match`` after the pool lookup; also re-ranks shortlists (see similarity_search.py).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if baselines.empty or len(rows) == 0:
+            return MatchResult.no_candidates(role_name, weights_config)
+
+        tv_rates, user_scores = self._tv_match_matrix(rows, baselines)
+
+        # Employees without a single TV match rate drop out, as with the SQL inner joins
+        present = ~np.isnan(tv_rates)
+        scored = present.any(axis=1)
+        rows, tv_rates, present = rows[scored], tv_rates[scored], present[scored]
+        user_scores = user_scores[scored].reset_index(drop=True)
+
+        # TV -> TGV membership matrix turns the per-TGV AVG into two matmuls
+        tgv_names = list(dict.fromkeys(baselines["tgv_name"]))
+        membership = (baselines["tgv_name"].to_numpy()[:, None] == np.array(tgv_names)[None, :]).astype(np.float64)
+        counts = present @ membership
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tgv_rates = round_half_up((np.where(present, tv_rates, 0.0) @ membership) / counts)
+        tgv_rates[counts == 0] = np.nan
+
+        employees = pd.DataFrame({
+            "employee_id": self._employee_ids[rows],
+            "directorate": pd.Categorical(self._directorate[rows]),
+            "grade": pd.Categorical(self._grade[rows]),
+            "education": pd.Categorical(self._education[rows]),
+        })
+        tvs = baselines[["tgv_name", "tv_name", "baseline_score"]].reset_index(drop=True)
+        return MatchResult(
+            role_name, employees, tvs, round_half_up(tv_rates).astype(np.float32), user_scores,
+            tgv_names, tgv_rates, weights_config,
+        )
+
+    def score(self, role_name: str, benchmark_ids, weights_config=None) -> pd.DataFrame:
+        """Long (employee, TV) result frame, identical in shape to the SQL output."""
+        return self.match(role_name, benchmark_ids, weights_config).to_frame()
+
+
+class MatchResult:
+    """Compact outcome of one matching run.
+
+    Instead of one row per (employee, TV) with the employee attributes and
+    TGV/final rates repeated as strings, a run is held as:
+
+    - ``employees``: one row per employee (categorical directorate/grade) with
+      its ``final_match_rate``; row i of every matrix below is employee i
+    - ``tvs``: one row per TV (tgv_name, tv_name, baseline_score); column j of
+      ``tv_rates`` and ``user_scores`` is TV j
+    - ``tv_rates``: float32 (employee x TV) match rates, NaN where there is none
+    - ``user_scores``: (employee x TV) raw scores, float32 or categorical
+    - ``tgv_rates``: (employee x TGV) match rates for ``tgv_names``
+    - ``detail``: per employee, whether its TV rows are loaded; a top-K SQL
+      run only loads them for the best candidates (see ``with_detail``)
+
+    Weights only enter the final rate, so ``reweight`` is one matrix-vector
+    product over ``tgv_rates``. ``to_frame`` rebuilds the SQL-shaped long frame.
+    """
+
+    def __init__(self, role_name, employees, tvs, tv_rates, user_scores, tgv_names, tgv_rates, weights_config=None,
+                 detail=None):
+        self.role_name = role_name
+        self.tvs = tvs
+        self.tv_rates = tv_rates
+        self.user_scores = user_scores
+        self.tgv_names = list(tgv_names)
+        self.tgv_rates = tgv_rates
+        self.weights_config = weights_config
+        present = ~np.isnan(tgv_rates)
+        self._tgv_filled = np.where(present, tgv_rates, 0.0)
+        self._tgv_present = present.astype(np.float64)
+        self.employees = employees.assign(final_match_rate=self.final_rates(weights_config))
+        self._position = pd.Index(self.employees["employee_id"])
+        self.detail = np.ones(len(employees), dtype=bool) if detail is None else np.asarray(detail, dtype=bool)
+
+    @classmethod
+    def no_candidates(cls, role_name=None, weights_config=None):
+        """Result of a run without scored employees (``empty`` is True)."""
+        employees = pd.DataFrame({"employee_id": pd.Series(dtype=object), "directorate": pd.Categorical([]),
+                                  "grade": pd.Categorical([])})
+        tvs = pd.DataFrame(columns=["tgv_name", "tv_name", "baseline_score"])
+        return cls(role_name, employees, tvs, np.empty((0, 0), dtype=np.float32), pd.DataFrame(), [],
+                   np.empty((0, 0)), weights_config)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, weights_config=None):
+        """Compact a long result frame, e.g. the SQL query output.
+
+        Also takes the top-K layout (TOP_K_QUERY): baseline rows without an
+        employee_id and TGV-only rows without a tv_name.
+        """
+        if frame["employee_id"].isna().all():
+            return cls.no_candidates(frame["role"].iloc[0] if len(frame) else None, weights_config)
+        baseline_rows = frame[frame["employee_id"].isna()]
+        frame = frame[frame["employee_id"].notna()]
+        tv_frame = frame[frame["tv_name"].notna()]
+
+        employee_codes, employee_ids = pd.factorize(frame["employee_id"])
+        tgv_codes, tgv_names = pd.factorize(frame["tgv_name"])
+        first_rows = frame.drop_duplicates("employee_id")
+        employees = pd.DataFrame({
+            "employee_id": np.asarray(employee_ids, dtype=object),
+            "directorate": pd.Categorical(first_rows["directorate"].to_numpy(dtype=object)),
+            "grade": pd.Categorical(first_rows["grade"].to_numpy(dtype=object)),
+        })
+        if "education" in frame:
+            employees["education"] = pd.Categorical(first_rows["education"].to_numpy(dtype=object))
+        tvs = (
+            pd.concat([tv_frame, baseline_rows]).drop_duplicates("tv_name")[["tgv_name", "tv_name", "baseline_score"]]
+            .sort_values(["tgv_name", "tv_name"], kind="mergesort").reset_index(drop=True)
+        )
+        tv_position = pd.Index(tvs["tv_name"])
+
+        tgv_rates = np.full((len(employee_ids), len(tgv_names)), np.nan)
+        tgv_rates[employee_codes, tgv_codes] = pd.to_numeric(frame["tgv_match_rate"]).to_numpy(dtype=np.float64)
+        detail = np.zeros(len(employee_ids), dtype=bool)
+        detail[pd.Index(employee_ids).get_indexer(tv_frame["employee_id"])] = True
+
+        result = cls(
+            frame["role"].iloc[0], employees, tvs, np.full((len(employee_ids), len(tvs)), np.nan, dtype=np.float32),
+            pd.DataFrame(index=range(len(employee_ids))), tgv_names, tgv_rates, weights_config, detail,
+        )
+        result._fill_detail(tv_frame)
+        if "education" not in employees and "Education Level" in result.user_scores:
+            result.employees["education"] = result.user_scores["Education Level"].to_numpy()
+        return result
+
+    def _fill_detail(self, tv_frame: pd.DataFrame):
+        """Write long TV rows (employee_id, tv_name, user_score, tv_match_rate) into the matrices."""
+        rows = self._position.get_indexer(tv_frame["employee_id"])
+        columns = pd.Index(self.tvs["tv_name"]).get_indexer(tv_frame["tv_name"])
+        known = (rows >= 0) & (columns >= 0)
+        rows, columns, tv_frame = rows[known], columns[known], tv_frame[known]
+        self.tv_rates[rows, columns] = pd.to_numeric(tv_frame["tv_match_rate"]).to_numpy(dtype=np.float32)
+
+        values = tv_frame["user_score"].to_numpy(dtype=object)
+        user_scores = {}
+        for j, tv_name in enumerate(self.tvs["tv_name"]):
+            on_tv = columns == j
+            if tv_name in self.user_scores:
+                column = self.user_scores[tv_name]
+                raw = column.astype(object).where(column.notna(), None).to_numpy(dtype=object, copy=True)
+            else:
+                raw = np.full(len(self.employees), None, dtype=object)
+            raw[rows[on_tv]] = values[on_tv]
+            numeric = pd.to_numeric(pd.Series(raw), errors="coerce")
+            if numeric.notna().sum() == pd.notna(raw).sum():
+                user_scores[tv_name] = numeric.to_numpy(dtype=np.float32)
+            else:
+                user_scores[tv_name] = pd.Categorical(raw)
+        self.user_scores = pd.DataFrame(user_scores, index=range(len(self.employees)))
+
+    def has_detail(self, employee_id) -> bool:
+        return bool(self.detail[self._position.get_loc(employee_id)])
+
+    def with_detail(self, tv_frame: pd.DataFrame) -> "MatchResult":
+        """Copy with the TV rows of more employees loaded (DETAIL_QUERY output)."""
+        detail = self.detail.copy()
+        loaded = self._position.get_indexer(tv_frame["employee_id"].drop_duplicates())
+        detail[loaded[loaded >= 0]] = True
+        result = MatchResult(
+            self.role_name, self.employees.drop(columns="final_match_rate"), self.tvs, self.tv_rates.copy(),
+            self.user_scores, self.tgv_names, self.tgv_rates, self.weights_config, detail,
+        )
+        result._fill_detail(tv_frame)
+        return result
+
+    @property
+    def empty(self) -> bool:
+        return len(self.employees) == 0
+
+    @property
+    def nbytes(self) -> int:
+        """In-memory size of the result, including the per-employee strings."""
+        return int(
+            self.employees.memory_usage(deep=True).sum() + self.user_scores.memory_usage(deep=True).sum()
+            + self.tv_rates.nbytes + self.tgv_rates.nbytes
+        )
+
+    def final_rates(self, weights_config) -> np.ndarray:
+        """final_match_rate per employee for the given weights config."""
+        tgv_weights = parse_tgv_weights(weights_config)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if tgv_weights is not None:
+                weights = np.array([float(tgv_weights.get(name) or 0) for name in self.tgv_names])
+                numerator = self._tgv_filled @ weights
+                denominator = self._tgv_present @ weights
+                final_rates = np.where(denominator != 0, numerator / denominator, np.nan)
+            else:
+                final_rates = self._tgv_filled.sum(axis=1) / self._tgv_present.sum(axis=1)
+        return round_half_up(final_rates)
+
+    def reweight(self, weights_config) -> "MatchResult":
+        """Same run under new TGV weights; only final_match_rate changes."""
+        return MatchResult(
+            self.role_name, self.employees.drop(columns="final_match_rate"), self.tvs, self.tv_rates,
+            self.user_scores, self.tgv_names, self.tgv_rates, weights_config, self.detail,
+        )
+
+    def take(self, positions) -> "MatchResult":
+        """Result restricted to the employees at ``positions``, in that order."""
+        positions = np.asarray(positions, dtype=np.int64)
+        return MatchResult(
+            self.role_name, self.employees.drop(columns="final_match_rate").iloc[positions].reset_index(drop=True),
+            self.tvs, self.tv_rates[positions], self.user_scores.iloc[positions].reset_index(drop=True),
+            self.tgv_names, self.tgv_rates[positions], self.weights_config, self.detail[positions],
+        )
+
+    def top(self, k: int) -> "MatchResult":
+        """The ``k`` best-ranked employees, kept in their original order.
+
+        ``ranking()`` of the result is ``ranking().head(k)`` of this one.
+        """
+        if k is None or k >= len(self.employees):
+            return self
+        return self.take(np.sort(self.ranking().index.to_numpy()[:k]))
+
+    @classmethod
+    def concat(cls, results) -> "MatchResult":
+        """Stack results of one run over disjoint employee sets (e.g. shards), in order.
+
+        All parts must share the same baselines (``tvs`` and ``tgv_names``);
+        empty parts are skipped.
+        """
+        results = list(results)
+        parts = [result for result in results if not result.empty]
+        if not parts:
+            return cls.no_candidates(results[0].role_name if results else None,
+                                     results[0].weights_config if results else None)
+        first = parts[0]
+        if len(parts) == 1:
+            return first
+
+        def stack(columns):
+            # Categoricals of different parts have different categories
+            if any(isinstance(column.dtype, pd.CategoricalDtype) for column in columns):
+                return pd.Categorical(np.concatenate([column.to_numpy(dtype=object) for column in columns]))
+            return np.concatenate([column.to_numpy() for column in columns])
+
+        employees = pd.DataFrame({
+            column: stack([part.employees[column] for part in parts])
+            for column in first.employees.columns if column != "final_match_rate"
+        })
+        user_scores = pd.DataFrame({
+            tv_name: stack([part.user_scores[tv_name] for part in parts]) for tv_name in first.user_scores.columns
+        })
+        return cls(
+            first.role_name, employees, first.tvs, np.concatenate([part.tv_rates for part in parts]), user_scores,
+            first.tgv_names, np.concatenate([part.tgv_rates for part in parts]), first.weights_config,
+            np.concatenate([part.detail for part in parts]),
+        )
+
+    def ranking(self) -> pd.DataFrame:
+        """Employees by final_match_rate (highest first) with a 1-based rank."""
+        ranking = self.employees.sort_values("final_match_rate", ascending=False, kind="mergesort")
+        return ranking.assign(role=self.role_name, rank=np.arange(1, len(ranking) + 1))
+
+    def tgv_table(self) -> pd.DataFrame:
+        """(employee x TGV) match rates indexed by employee_id."""
+        return pd.DataFrame(self.tgv_rates, index=self._position, columns=self.tgv_names)
+
+    def tv_detail(self, employee_id) -> pd.DataFrame:
+        """TV-level rows of one employee, like filtering the long frame on employee_id."""
+        i = self._position.get_loc(employee_id)
+        tgv_position = {name: k for k, name in enumerate(self.tgv_names)}
+        detail = self.tvs.assign(
+            user_score=[self._user_score_text(i, j) for j in range(len(self.tvs))],
+            tv_match_rate=np.round(self.tv_rates[i].astype(np.float64), 2),
+            tgv_match_rate=[self.tgv_rates[i, tgv_position[name]] for name in self.tvs["tgv_name"]],
+            final_match_rate=self.employees["final_match_rate"].iat[i],
+        )
+        return detail[detail["tv_match_rate"].notna()].reset_index(drop=True)
+
+    def _user_score_text(self, i: int, j: int):
+        column = self.user_scores.iloc[:, j]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            value = column.iat[i]
+            return None if pd.isna(value) else value
+        return format_score(column.to_numpy()[i:i + 1])[0]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long (employee, TV) frame in the SQL output layout and order."""
+        if self.empty:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        row_idx, tv_idx = np.nonzero(~np.isnan(self.tv_rates))
+        tgv_position = {name: k for k, name in enumerate(self.tgv_names)}
+        tv_tgv = np.array([tgv_position[name] for name in self.tvs["tgv_name"]], dtype=np.int64)
+
+        user_scores = np.empty(len(row_idx), dtype=object)
+        for j in range(len(self.tvs)):
+            on_tv = tv_idx == j
+            column = self.user_scores.iloc[:, j]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                user_scores[on_tv] = column.to_numpy(dtype=object)[row_idx[on_tv]]
+            else:
+                user_scores[on_tv] = format_score(column.to_numpy()[row_idx[on_tv]])
+        user_scores[pd.isna(user_scores)] = None
+
+        frame = pd.DataFrame({
+            "employee_id": self.employees["employee_id"].to_numpy(dtype=object)[row_idx],
+            "directorate": self.employees["directorate"].to_numpy(dtype=object)[row_idx],
+            "role": self.role_name,
+            "grade": self.employees["grade"].to_numpy(dtype=object)[row_idx],
+            "tgv_name": self.tvs["tgv_name"].to_numpy(dtype=object)[tv_idx],
+            "tv_name": self.tvs["tv_name"].to_numpy(dtype=object)[tv_idx],
+            "baseline_score": self.tvs["baseline_score"].to_numpy(dtype=object)[tv_idx],
+            "user_score": user_scores,
+            "tv_match_rate": np.round(self.tv_rates[row_idx, tv_idx].astype(np.float64), 2),
+            "tgv_match_rate": self.tgv_rates[row_idx, tv_tgv[tv_idx]],
+            "final_match_rate": self.employees["final_match_rate"].to_numpy()[row_idx],
+        })
+        # ORDER BY final_match_rate DESC NULLS LAST, tgv_name, tv_name, as ranking()
+        frame = frame.sort_values(
+            ["final_match_rate", "tgv_name", "tv_name"],
+            ascending=[False, True, True],
+            na_position="last",
+            kind="mergesort",
+        )
+        return frame.reset_index(drop=True)
@@ -0,0 +1,203 @@
+"""Score very large employee pools across a process pool.
+
+The employee pool is split into contiguous shards. The feature arrays of a
+``MatchingEngine`` are copied once into shared memory: the numeric TV matrix
+as float64, and every categorical column (categorical TVs, position,
+directorate, grade, education) as int32 codes, with only the small category
+lists sent to the workers. A worker maps its shard's rows without copying,
+scores every vacancy on them with the engine's own ``match`` and returns its
+top-K; the parent merges the shard lists into the global top-K.
+
+Every employee is scored independently, shards keep the row order, and the
+merge ranks with the same stable sort as ``MatchResult.ranking``, so the
+result equals single-process scoring (``match(...).top(k)``) exactly.
+
+    with ShardedScorer(matching_engine, workers=8) as scorer:
+        results = scorer.score_vacancies(specs, top_k=100)
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from matching_engine import STRUCTURE_COLUMNS, MatchingEngine, MatchResult
+
+DEFAULT_SHARD_SIZE = 50_000
+
+# Per-employee engine attributes sent as codes next to the categorical TVs
+ATTRIBUTE_COLUMNS = ["_position_key", "_directorate", "_grade", "_education"]
+
+# Shared blocks and shard engines of the current worker process
+_worker = {}
+
+
+def _shared_array(array: np.ndarray):
+    """(block, view) with ``array`` copied into a new shared memory block."""
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, view
+
+
+def _init_worker(layout: dict):
+    # Pool workers share the parent's resource tracker, so attaching does not
+    # hand ownership of the blocks to them; the parent unlinks in close()
+    blocks = {name: SharedMemory(name=layout[name]["block"]) for name in ["numeric", "codes"]}
+    _worker.clear()
+    _worker.update(
+        layout=layout,
+        blocks=blocks,
+        numeric=np.ndarray(layout["numeric"]["shape"], dtype=np.float64, buffer=blocks["numeric"].buf),
+        codes=np.ndarray(layout["codes"]["shape"], dtype=np.int32, buffer=blocks["codes"].buf),
+        engines={},
+    )
+
+
+def _decode(column: int, start: int, stop: int) -> np.ndarray:
+    # Code -1 (missing) picks the trailing None
+    return _worker["layout"]["categories"][column][_worker["codes"][start:stop, column]]
+
+
+def _shard_engine(start: int, stop: int) -> MatchingEngine:
+    """MatchingEngine over rows [start, stop) of the shared arrays, built once per worker."""
+    engines = _worker["engines"]
+    if (start, stop) not in engines:
+        layout = _worker["layout"]
+        columns = layout["code_columns"]
+        categorical_values = {
+            feature: _decode(k, start, stop) for k, feature in enumerate(columns) if feature not in ATTRIBUTE_COLUMNS
+        }
+        attributes = {name: _decode(columns.index(name), start, stop) for name in ATTRIBUTE_COLUMNS}
+        engines[start, stop] = MatchingEngine.from_arrays(
+            layout["structure"], layout["ordinal_ranks"], _worker["numeric"][start:stop], categorical_values,
+            # Global row numbers; the parent swaps in the employee_ids
+            np.arange(start, stop), attributes["_directorate"], attributes["_grade"], attributes["_education"],
+            attributes["_position_key"],
+        )
+    return engines[start, stop]
+
+
+def _score_shard(start: int, stop: int, runs: list, top_k: int, directorates=None, grades=None) -> list:
+    """Top-K MatchResult of every (role_name, baselines, weights_config) run on one shard."""
+    shard_engine = _shard_engine(start, stop)
+    return [
+        shard_engine.match(role_name, [], weights_config, baselines=baselines, directorates=directorates,
+                           grades=grades).top(top_k)
+        for role_name, baselines, weights_config in runs
+    ]
+
+
+class ShardedScorer:
+    """Process pool scoring the employees of a MatchingEngine in shards.
+
+    Holds the shared memory blocks and the pool until ``close`` (or the end
+    of a ``with`` block), so repeated calls reuse both.
+    """
+
+    def __init__(self, matching_engine: MatchingEngine, workers: int = None, shard_size: int = DEFAULT_SHARD_SIZE):
+        self.matching_engine = matching_engine
+        self.workers = workers or os.cpu_count() or 1
+        n_employees = len(matching_engine._employee_ids)
+        # At least one shard per worker, so small pools still spread out
+        shard_size = max(1, min(shard_size, -(-n_employees // self.workers)))
+        self.shards = [(start, min(start + shard_size, n_employees)) for start in range(0, n_employees, shard_size)]
+
+        columns = {feature: matching_engine._categorical_values[feature]
+                   for feature in matching_engine._categorical_tvs["feature"]}
+        columns.update({name: getattr(matching_engine, name) for name in ATTRIBUTE_COLUMNS})
+        codes = np.empty((n_employees, len(columns)), dtype=np.int32)
+        categories = []
+        for k, values in enumerate(columns.values()):
+            codes[:, k], uniques = pd.factorize(pd.Series(values, dtype=object))
+            categories.append(np.append(np.asarray(uniques, dtype=object), None))
+
+        self._blocks = []
+        numeric_block, _ = self._share(np.ascontiguousarray(matching_engine._numeric_values, dtype=np.float64))
+        codes_block, _ = self._share(codes)
+        layout = {
+            "numeric": {"block": numeric_block.name, "shape": matching_engine._numeric_values.shape},
+            "codes": {"block": codes_block.name, "shape": codes.shape},
+            "code_columns": list(columns),
+            "categories": categories,
+            "structure": list(matching_engine.structure[STRUCTURE_COLUMNS].itertuples(index=False, name=None)),
+            "ordinal_ranks": matching_engine.ordinal_ranks,
+        }
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(layout,))
+
+    def _share(self, array: np.ndarray):
+        block, view = _shared_array(array)
+        self._blocks.append(block)
+        return block, view
+
+    def close(self):
+        self._pool.shutdown()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _merge(self, parts) -> MatchResult:
+        result = MatchResult.concat(parts)
+        employees = result.employees.drop(columns="final_match_rate")
+        rows = employees["employee_id"].to_numpy(dtype=np.int64)
+        employees["employee_id"] = self.matching_engine._employee_ids[rows]
+        return MatchResult(
+            result.role_name, employees, result.tvs, result.tv_rates, result.user_scores,
+            result.tgv_names, result.tgv_rates, result.weights_config, result.detail,
+        )
+
+    def match_many(self, runs, top_k: int = None, directorates=None, grades=None) -> list:
+        """MatchResult per (role_name, benchmark_ids, weights_config) run.
+
+        Baselines are computed once in this process; each shard then scores
+        every run, and ``top_k`` (None: everyone) bounds what a shard returns.
+        ``directorates`` and ``grades`` narrow every run's pool, as in ``MatchingEngine.match``.
+        """
+        runs = list(runs)
+        baselines = self.matching_engine.compute_baselines_many([benchmark_ids for _, benchmark_ids, _ in runs])
+        shard_runs = [(role_name, run_baselines, weights_config)
+                      for (role_name, _, weights_config), run_baselines in zip(runs, baselines)]
+        futures = [self._pool.submit(_score_shard, start, stop, shard_runs, top_k, directorates, grades)
+                   for start, stop in self.shards]
+        # Shards come back in row order, so ties rank as in a single process
+        per_shard = [future.result() for future in futures]
+        return [self._merge([shard[i] for shard in per_shard]).top(top_k) for i in range(len(runs))]
+
+    def match(self, role_name: str, benchmark_ids, weights_config=None, top_k: int = None, directorates=None,
+              grades=None) -> MatchResult:
+        return self.match_many([(role_name, benchmark_ids, weights_config)], top_k, directorates, grades)[0]
+
+    def score_vacancies(self, specs: list, top_k: int = None) -> dict:
+        """MatchResult per job_vacancy_id, for batch_scoring.py specs.
+
+        Vacancies with the same role and benchmark set are scored once and
+        re-weighted, as in ``batch_scoring.score_vacancies``. With ``top_k``
+        the weights decide who is in the top K, so they are part of the key.
+        """
+        def run_key(spec):
+            key = (spec["role_name"].lower(), tuple(sorted(spec["benchmark_ids"])))
+            return key if top_k is None else key + (json.dumps(spec["weights_config"], sort_keys=True),)
+
+        run_keys = {}
+        for spec in specs:
+            run_keys.setdefault(run_key(spec), spec)
+        scored = dict(zip(run_keys, self.match_many(
+            [(spec["role_name"], spec["benchmark_ids"], spec["weights_config"]) for spec in run_keys.values()], top_k,
+        )))
+
+        results = {}
+        for spec in specs:
+            result = scored[run_key(spec)]
+            if run_keys[run_key(spec)] is not spec:
+                result = result.reweight(spec["weights_config"])
+            results[spec["job_vacancy_id"]] = result
+        return results
@@ -0,0 +1,175 @@
+"""Pool-level aggregates and figures of the dashboard, built once per result.
+
+Everything here depends on the analysis result (including its weights) and
+the benchmark set, not on the selected candidate. The dashboard memoizes a
+``PoolViews`` by ``result_fingerprint``, so reruns that only change the
+candidate look values up instead of re-aggregating the pool.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from matching_engine import MatchResult
+
+
+def result_fingerprint(result_key: str, weights_config, benchmark_ids) -> str:
+    """Identity of the views of a result: its run key plus the weights it is ranked by."""
+    payload = json.dumps({
+        "result_key": result_key,
+        "weights_config": weights_config,
+        "benchmark_ids": sorted(str(i) for i in benchmark_ids),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PoolViews:
+    """Aggregates, tables and figures of Sections 2-5, 8 and 9 for one result."""
+
+    def __init__(self, match_result: MatchResult, benchmark_ids):
+        self.tgv_table = match_result.tgv_table()
+        ranking = match_result.ranking()
+        ranking["is_benchmark"] = ranking["employee_id"].isin(benchmark_ids)
+        self.ranking = ranking
+
+        # Candidate lookups: rate, rank and selector label per employee
+        employee_ids = self.ranking["employee_id"].to_numpy(dtype=object)
+        final_rates = self.ranking["final_match_rate"].to_numpy(dtype=np.float64)
+        self.candidate_ids = employee_ids.tolist()
+        self.final_by_employee = dict(zip(self.candidate_ids, final_rates.tolist()))
+        self.rank_by_employee = dict(zip(self.candidate_ids, self.ranking["rank"].tolist()))
+        self.candidate_labels = {
+            employee_id: f"Employee {employee_id} - {rate:.1f}% match"
+            for employee_id, rate in self.final_by_employee.items()
+        }
+
+        # Section 2 metrics
+        self.total_candidates = len(self.ranking)
+        self.avg_match = np.nanmean(final_rates) if len(final_rates) else np.nan
+        self.top_match = np.nanmax(final_rates) if len(final_rates) else np.nan
+        self.qualified = int((final_rates >= 70).sum())
+        self.high_performers = int((final_rates >= 80).sum())
+        self.moderate_performers = int(((final_rates >= 60) & (final_rates < 80)).sum())
+        self.development_needed = int((final_rates < 60).sum())
+
+        # Section 3
+        self.top_ranking = self.ranking.head(20)[['rank', 'employee_id', 'directorate', 'final_match_rate',
+                                                  'is_benchmark']]
+        self.top_insights = self._top_insights(3)
+
+        # Sections 4, 5
+        self.fig_hist = self._histogram()
+        self.fig_box = px.box(
+            self.ranking,
+            x='directorate',
+            y='final_match_rate',
+            title='Match Rate by Directorate',
+            labels={'final_match_rate': 'Match Rate (%)', 'directorate': 'Directorate'},
+            color='directorate'
+        )
+        avg_tgv = self.tgv_table.mean().rename_axis('tgv_name').reset_index(name='tgv_match_rate')
+        self.avg_tgv = avg_tgv.sort_values('tgv_match_rate', ascending=True)
+        self.fig_tgv = px.bar(
+            self.avg_tgv,
+            x='tgv_match_rate',
+            y='tgv_name',
+            orientation='h',
+            title='Average Match Rate by Competency Group',
+            labels={'tgv_match_rate': 'Average Match Rate (%)', 'tgv_name': 'Competency Group'},
+            color='tgv_match_rate',
+            color_continuous_scale='RdYlGn'
+        )
+        self.fig_tgv.update_layout(showlegend=False)
+
+        # Section 8; the benchmark average also feeds the candidate radar
+        is_benchmark = self.tgv_table.index.isin(benchmark_ids)
+        self.benchmark_tgv = self.tgv_table[is_benchmark].mean()
+        other_scores = self.tgv_table[~is_benchmark].mean()
+        comparison_df = pd.DataFrame({
+            'Competency': self.benchmark_tgv.index,
+            'Benchmark Average': self.benchmark_tgv.values,
+            'Candidate Pool Average': other_scores.values
+        }).sort_values('Competency')
+        comparison_df['Gap'] = comparison_df['Benchmark Average'] - comparison_df['Candidate Pool Average']
+        self.comparison_df = comparison_df
+        self.fig_comparison = self._comparison_figure()
+
+        # Section 9
+        directorate_dist = self.ranking['directorate'].value_counts()
+        self.fig_dir = px.pie(
+            values=directorate_dist.values,
+            names=directorate_dist.index,
+            title='Distribution by Directorate',
+            hole=0.4
+        )
+        self.fig_edu = None
+        # Per employee, so it also covers top-K runs
+        if 'education' in match_result.employees:
+            edu_dist = match_result.employees['education'].value_counts()
+            edu_dist = edu_dist[edu_dist > 0]
+            self.fig_edu = px.pie(
+                values=edu_dist.values,
+                names=edu_dist.index,
+                title='Distribution by Education Level',
+                hole=0.4
+            )
+
+    def _top_insights(self, top_n: int) -> list:
+        """'Employee X: overall N% driven by ...' for the best ``top_n`` employees."""
+        insights_blocks = []
+        for emp_id, overall in self.ranking.head(top_n)[['employee_id', 'final_match_rate']].itertuples(index=False):
+            emp_tgv = self.tgv_table.loc[emp_id].dropna().sort_index().sort_values(ascending=False)
+            top_tgvs = emp_tgv.head(2)
+            reasons = ", ".join([f"{name} ({score:.0f}%)" for name, score in top_tgvs.items()]) or "—"
+            insights_blocks.append(f"Employee {emp_id}: overall {overall:.0f}% driven by {reasons}")
+        return insights_blocks
+
+    def _histogram(self):
+        fig_hist = px.histogram(
+            self.ranking,
+            x='final_match_rate',
+            nbins=20,
+            title='Distribution of Final Match Rates',
+            labels={'final_match_rate': 'Match Rate (%)', 'count': 'Number of Candidates'},
+            color_discrete_sequence=['#667eea']
+        )
+        fig_hist.add_vline(x=self.avg_match, line_dash="dash", line_color="red",
+                           annotation_text=f"Avg: {self.avg_match:.1f}%")
+        fig_hist.update_layout(showlegend=False)
+        return fig_hist
+
+    def _comparison_figure(self):
+        fig_comparison = go.Figure()
+        fig_comparison.add_trace(go.Bar(
+            name='Benchmark Employees',
+            x=self.comparison_df['Competency'],
+            y=self.comparison_df['Benchmark Average'],
+            marker_color='#667eea'
+        ))
+        fig_comparison.add_trace(go.Bar(
+            name='Candidate Pool',
+            x=self.comparison_df['Competency'],
+            y=self.comparison_df['Candidate Pool Average'],
+            marker_color='#f093fb'
+        ))
+        fig_comparison.update_layout(
+            title='Benchmark vs Candidate Pool Comparison',
+            xaxis_title='Competency Group',
+            yaxis_title='Average Match Rate (%)',
+            barmode='group',
+            height=500
+        )
+        return fig_comparison
+
+    def candidate_tgv(self, employee_id) -> pd.DataFrame:
+        """(tgv_name, tgv_match_rate) of one employee, for the radar and TGV list."""
+        return (
+            self.tgv_table.loc[employee_id].dropna().sort_index()
+            .rename_axis('tgv_name').reset_index(name='tgv_match_rate')
+        )
+
+    def percentile(self, employee_id) -> float:
+        return (1 - (self.rank_by_employee[employee_id] / self.total_candidates)) * 100
@@ -0,0 +1,288 @@
+"""Vectorized expansion of the JSON columns of ``employee_report``.
+
+``competencies`` and ``papi_data`` hold lists of ``{key, score}`` records and
+``employee_strengths`` either a list of ``{strengh, rank}`` records or plain
+comma-separated text. The notebook used to parse them row by row; here each
+block of rows is joined into one string, scanned with the C JSON decoder at
+known row offsets, and pivoted with one array assignment.
+
+Values may be JSON text, Python-repr text (a CSV dump of decoded lists, e.g.
+``[{'pillar': 'Curiosity', 'score': 4}]``), already-decoded lists, or
+missing. Rows that cannot be decoded are reported, not silently emptied:
+``errors="raise"`` raises, ``errors="coerce"`` (default) leaves them empty
+and lists their index labels in ``frame.attrs["malformed"]``.
+
+    report = pd.read_csv("employees_performance_2025.csv")
+    competencies = expand_competencies(report["competencies"], clean_names=True)
+
+For exports that do not fit in memory, ``expand_report_chunks`` expands
+chunked reads (``pd.read_csv(..., chunksize=...)``,
+``pd.read_sql(..., chunksize=...)``) with one fixed column set and
+``write_report_parquet`` streams them into a single Parquet file.
+"""
+import ast
+import json
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BLOCK_SIZE = 10_000
+REPORT_JSON_COLUMNS = {"competencies": ("pillar", "scale_code"), "papi_data": ("scale_code",)}
+_DECODER = json.JSONDecoder()
+
+
+def _decode_text(text: str):
+    """One value, JSON first and Python literal second; raises ValueError."""
+    try:
+        return json.loads(_as_json(text))
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError) as ex:
+        raise ValueError(str(ex)) from None
+
+
+def _as_json(text: str) -> str:
+    # A Python repr without any double quote only has single-quoted strings
+    # with no quote inside them, so swapping the quotes is exact. Anything
+    # else (None/True/nan, \x escapes) fails json.loads and goes row by row.
+    if '"' not in text and "'" in text:
+        return text.replace("'", '"')
+    return text
+
+
+def decode_json_column(values, errors: str = "coerce"):
+    """(decoded values, malformed mask) for a Series of JSON-ish values.
+
+    Missing and blank values decode to None. Text is decoded ``BLOCK_SIZE``
+    rows at a time: the block is joined into one string and scanned value by
+    value, and a value only counts when it ends exactly at its row's end, so
+    rows cannot borrow text from their neighbours. Rows that fail the check
+    are decoded on their own (JSON, then Python literal). Decoded values
+    other than lists/objects count as malformed.
+    """
+    if errors not in ("coerce", "raise"):
+        raise ValueError("errors must be 'coerce' or 'raise'")
+    values = pd.Series(values)
+    raw = values.to_list()
+    decoded = [value if isinstance(value, (list, dict)) else None for value in raw]
+    malformed = np.zeros(len(raw), dtype=bool)
+
+    positions = [i for i, value in enumerate(raw) if isinstance(value, str) and value.strip()]
+    for start in range(0, len(positions), BLOCK_SIZE):
+        block = positions[start:start + BLOCK_SIZE]
+        texts = [_as_json(raw[i].strip()) for i in block]
+        joined = ",".join(texts)
+        offset = 0
+        for i, text in zip(block, texts):
+            end = offset + len(text)
+            try:
+                value, value_end = _DECODER.raw_decode(joined, offset)
+            except ValueError:
+                value_end = None
+            if value_end != end:
+                try:
+                    value = _decode_text(raw[i])
+                except ValueError:
+                    value = None
+                    malformed[i] = True
+            offset = end + 1
+            if value is None or isinstance(value, (list, dict)):
+                decoded[i] = value
+            else:
+                malformed[i] = True
+
+    if errors == "raise" and malformed.any():
+        labels = values.index[malformed].tolist()
+        raise ValueError(f"{len(labels)} malformed row(s) in {values.name!r}, first at index {labels[0]!r}")
+    return (
+        pd.Series(decoded, index=values.index, name=values.name, dtype=object),
+        pd.Series(malformed, index=values.index, name=values.name),
+    )
+
+
+def _flatten(decoded: pd.Series):
+    """(row positions, record dicts) of every record of every decoded row."""
+    rows = [value if isinstance(value, list) else [value] for value in decoded.to_list()]
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    items = [item if isinstance(item, dict) else {} for item in chain.from_iterable(rows)]
+    return np.repeat(np.arange(len(rows)), lengths), items
+
+
+def json_records(values, errors: str = "coerce") -> pd.DataFrame:
+    """Long frame of every record of every row; ``row`` is the row's index label."""
+    values = pd.Series(values)
+    decoded, malformed = decode_json_column(values, errors)
+    positions, items = _flatten(decoded)
+    records = pd.DataFrame.from_records(items)
+    records.insert(0, "row", values.index.to_numpy()[positions])
+    records.attrs["malformed"] = list(values.index[malformed])
+    return records
+
+
+def clean_column_name(name) -> str:
+    """'Growth & Innovation, Drive' -> 'Growth_and_Innovation_Drive' (the notebook's column names)."""
+    return str(name).replace(" ", "_").replace("&", "and").replace(",", "")
+
+
+def _pivot(positions, records: pd.DataFrame, n_rows: int, key: str, value: str, columns, clean_names: bool):
+    """(matrix, columns, unknown keys) for records at the given row positions."""
+    if key in records:
+        has_key = records[key].notna().to_numpy()
+        # Names are cleaned once per distinct key, not per record
+        codes, uniques = pd.factorize(records[key][has_key])
+        names = [clean_column_name(name) if clean_names else str(name) for name in uniques]
+        keys = pd.Series(np.asarray(names, dtype=object)[codes], dtype=object)
+        scores = records[value][has_key] if value in records else pd.Series(np.nan, index=keys.index)
+        positions = positions[has_key]
+    else:
+        keys, scores, positions = pd.Series([], dtype=object), pd.Series([], dtype=float), positions[:0]
+    columns = pd.Index(pd.unique(keys.to_numpy()) if columns is None else list(columns))
+
+    cols = columns.get_indexer(keys)
+    scores = pd.to_numeric(scores, errors="coerce").to_numpy(dtype=np.float64)
+    matrix = np.full((n_rows, len(columns)), np.nan)
+    # First non-null score of a (row, key) pair wins, as pivot_table(aggfunc='first')
+    usable = (cols >= 0) & ~np.isnan(scores)
+    cells = positions[usable] * len(columns) + cols[usable]
+    cells, first = np.unique(cells, return_index=True)
+    matrix.flat[cells] = scores[usable][first]
+    return matrix, columns, sorted(set(keys.to_numpy()[cols < 0]))
+
+
+def expand_json_column(values, key, value: str = "score", errors: str = "coerce", columns=None,
+                       clean_names: bool = False) -> pd.DataFrame:
+    """JSON record column -> wide numeric frame aligned with ``values``.
+
+    ``key`` names the record field holding the column name (or a tuple of
+    candidates; the first one present is used). ``columns`` fixes the output
+    columns; keys outside it are listed in ``frame.attrs["unknown_keys"]``.
+    """
+    values = pd.Series(values)
+    decoded, malformed = decode_json_column(values, errors)
+    positions, items = _flatten(decoded)
+    records = pd.DataFrame.from_records(items)
+    candidates = (key,) if isinstance(key, str) else tuple(key)
+    key = next((candidate for candidate in candidates if candidate in records), candidates[0])
+
+    matrix, columns, unknown = _pivot(positions, records, len(values), key, value, columns, clean_names)
+    frame = pd.DataFrame(matrix, index=values.index, columns=columns)
+    frame.attrs.update(malformed=list(values.index[malformed]), unknown_keys=unknown)
+    return frame
+
+
+def expand_competencies(values, errors: str = "coerce", columns=None, clean_names: bool = False) -> pd.DataFrame:
+    """One column per competency pillar (``pillar`` or ``scale_code`` records)."""
+    return expand_json_column(values, REPORT_JSON_COLUMNS["competencies"], "score", errors, columns, clean_names)
+
+
+def expand_papi(values, errors: str = "coerce", columns=None) -> pd.DataFrame:
+    """One column per PAPI scale."""
+    return expand_json_column(values, REPORT_JSON_COLUMNS["papi_data"], "score", errors, columns)
+
+
+def strength_themes(values, errors: str = "coerce") -> pd.DataFrame:
+    """Long (row, theme, rank) frame of ``employee_strengths``.
+
+    Takes JSON ``{strengh, rank}`` lists as well as the comma-separated text
+    ``employee_report`` produces (rank is then the position in the text).
+    """
+    values = pd.Series(values)
+    text = values.where(values.map(lambda value: isinstance(value, str)))
+    plain = (text.notna() & ~text.str.lstrip().str[:1].isin(["[", "{"])).to_numpy(dtype=bool)
+
+    split = text[plain].str.split(",").explode().str.strip()
+    split = split[split.notna() & (split != "")]
+    themes = pd.DataFrame({
+        "row": split.index.to_numpy(),
+        "theme": split.to_numpy(dtype=object),
+        "rank": split.groupby(level=0).cumcount().to_numpy(dtype=np.float64) + 1,
+    })
+
+    records = json_records(values[~plain], errors)
+    malformed = records.attrs["malformed"]
+    theme_key = "strengh" if "strengh" in records else "theme"
+    if theme_key in records:
+        records = records.assign(theme=records[theme_key].where(records[theme_key].notna(), "").astype(str).str.strip())
+        records = records[records["theme"] != ""]
+        themes = pd.concat([themes, pd.DataFrame({
+            "row": records["row"].to_numpy(),
+            "theme": records["theme"].to_numpy(dtype=object),
+            "rank": pd.to_numeric(records["rank"], errors="coerce").to_numpy(dtype=np.float64)
+            if "rank" in records else np.nan,
+        })], ignore_index=True)
+    themes.attrs["malformed"] = malformed
+    return themes
+
+
+def expand_report(report: pd.DataFrame, errors: str = "coerce", competency_columns=None, papi_columns=None,
+                  clean_names: bool = True) -> pd.DataFrame:
+    """``employee_report`` with its competencies and PAPI records pivoted in place of the JSON columns.
+
+    ``frame.attrs`` holds, per JSON column, the ``malformed`` row labels, the
+    ``unknown_keys`` left out and the ``key_columns`` produced.
+    """
+    columns = {"competencies": competency_columns, "papi_data": papi_columns}
+    parts = [report.drop(columns=[column for column in REPORT_JSON_COLUMNS if column in report])]
+    attrs = {"malformed": {}, "unknown_keys": {}, "key_columns": {}}
+    for column, keys in REPORT_JSON_COLUMNS.items():
+        if column not in report:
+            continue
+        wide = expand_json_column(report[column], keys, "score", errors, columns[column],
+                                  clean_names and column == "competencies")
+        parts.append(wide)
+        attrs["malformed"][column] = wide.attrs["malformed"]
+        attrs["unknown_keys"][column] = wide.attrs["unknown_keys"]
+        attrs["key_columns"][column] = list(wide.columns)
+    frame = pd.concat(parts, axis=1)
+    frame.attrs.update(attrs)
+    return frame
+
+
+def expand_report_chunks(chunks, errors: str = "coerce", competency_columns=None, papi_columns=None,
+                         clean_names: bool = True):
+    """Yield ``expand_report`` of every chunk, all with the same columns.
+
+    Unless given, the pillar and PAPI columns are those of the first chunk.
+    A later chunk with keys outside them raises ValueError rather than
+    dropping scores; pass the full key lists for exports with sparse keys.
+    """
+    for chunk in chunks:
+        frame = expand_report(chunk, errors, competency_columns, papi_columns, clean_names)
+        unknown = {column: keys for column, keys in frame.attrs["unknown_keys"].items() if keys}
+        if unknown:
+            raise ValueError(f"Keys missing from the fixed columns: {unknown}. "
+                             "Pass competency_columns / papi_columns.")
+        competency_columns = frame.attrs["key_columns"].get("competencies", competency_columns)
+        papi_columns = frame.attrs["key_columns"].get("papi_data", papi_columns)
+        yield frame
+
+
+def write_report_parquet(chunks, path: str, **options) -> dict:
+    """Stream ``expand_report_chunks(chunks, **options)`` into one Parquet file.
+
+    Returns the row count and the malformed row labels per JSON column.
+    """
+    writer, schema = None, None
+    summary = {"rows": 0, "malformed": {}}
+    try:
+        for frame in expand_report_chunks(chunks, **options):
+            if writer is None:
+                schema = pa.Schema.from_pandas(frame, preserve_index=False)
+                # Columns that are all-null in the first chunk would be typed null
+                schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema
+                ])
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            summary["rows"] += len(frame)
+            for column, labels in frame.attrs["malformed"].items():
+                summary["malformed"].setdefault(column, []).extend(labels)
+    finally:
+        if writer is not None:
+            writer.close()
+    return summary
@@ -0,0 +1,150 @@
+"""Process-wide cache of matching results, shared by all Streamlit sessions.
+
+Results are keyed on a canonical hash of the vacancy inputs (role, level,
+benchmark set, weights) plus a data version read from the database: the
+latest entry of the ``data_refreshes`` log (data_version.sql) for the tables
+the matching query reads. Refreshing ``employee_features`` or
+``employee_scores`` and editing the registry bump it, so stale results are
+never served and are pruned on the next write. An optional on-disk tier
+keeps results across restarts.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+# Every source the matching queries read; each refresh or write logs one of them
+DATA_SOURCES = ("employee_features", "employee_scores", "talent_structure", "talent_ordinal_ranks")
+
+DATA_VERSION_QUERY = f"""
+SELECT MAX(version) FROM data_refreshes
+WHERE source IN ({", ".join(f"'{source}'" for source in DATA_SOURCES)})
+"""
+
+
+def fetch_data_version(engine) -> str:
+    with engine.connect() as conn:
+        version = conn.execute(text(DATA_VERSION_QUERY)).scalar()
+    return "unknown" if version is None else str(version)
+
+
+def make_result_key(role_name: str, job_level: str, benchmark_ids, weights_config, data_version: str,
+                    directorates=None, grades=None, cohort=None) -> str:
+    """Canonical hash: benchmark order/duplicates and JSON key order do not matter.
+
+    The pool filters and ``cohort`` (a BenchmarkCohort fingerprint, for runs on
+    stored cohort baselines) only enter the key when set, so other keys are unchanged.
+    """
+    if isinstance(weights_config, str):
+        weights_config = json.loads(weights_config)
+    key = {
+        "role_name": str(role_name).strip(),
+        "job_level": str(job_level).strip(),
+        "benchmark_ids": sorted({str(i).strip() for i in benchmark_ids}),
+        "weights_config": weights_config,
+        "data_version": str(data_version),
+    }
+    if directorates is not None:
+        key["directorates"] = sorted({str(d) for d in directorates})
+    if grades is not None:
+        key["grades"] = sorted({str(g) for g in grades})
+    if cohort is not None:
+        key["cohort"] = str(cohort)
+    payload = json.dumps(key, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _version_dir(data_version: str) -> str:
+    return hashlib.sha1(str(data_version).encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """In-memory LRU of matching results with an optional on-disk tier.
+
+    Cached results are shared between sessions and must be treated as
+    read-only by callers.
+    """
+
+    def __init__(self, max_entries: int = 32, disk_dir: str = None, max_disk_entries: int = 256):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.data_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key: str, data_version: str) -> str:
+        return os.path.join(self.disk_dir, _version_dir(data_version), f"{key}.pkl")
+
+    def _switch_version(self, data_version: str):
+        """Drop everything cached for another data version."""
+        if self.data_version == data_version:
+            return
+        self._entries.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            keep = _version_dir(data_version)
+            for name in os.listdir(self.disk_dir):
+                if name != keep:
+                    shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
+        self.data_version = data_version
+
+    def get(self, key: str, data_version: str):
+        with self._lock:
+            self._switch_version(data_version)
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            if self.disk_dir:
+                path = self._disk_path(key, data_version)
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        result = pickle.load(f)
+                    os.utime(path)
+                    self._store(key, result)
+                    self.hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    def set(self, key: str, result, data_version: str):
+        with self._lock:
+            self._switch_version(data_version)
+            self._store(key, result)
+            if self.disk_dir:
+                path = self._disk_path(key, data_version)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+                self._trim_disk(os.path.dirname(path))
+
+    def _store(self, key: str, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _trim_disk(self, directory: str):
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".pkl")]
+        if len(paths) <= self.max_disk_entries:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            os.remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.disk_dir:
+                shutil.rmtree(self.disk_dir, ignore_errors=True)
+            self.data_version = None
@@ -0,0 +1,183 @@
+"""Export a full ranking (one row per employee and TV) to CSV or Parquet in chunks.
+
+Nothing here holds the whole long result: SQL output is read through a
+server-side cursor ``chunk_size`` rows at a time (``stream_query``), and a
+MatchResult is expanded a block of employees at a time (``result_chunks``).
+Every chunk is written as it arrives, as CSV lines or one Parquet row group,
+so peak memory depends on the chunk size, not on the pool size.
+
+    export_file(stream_query(engine, MATCHING_QUERY, params), "ranking.parquet", "parquet")
+
+``iter_export`` yields the encoded bytes instead, for download streams.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from matching_engine import RESULT_COLUMNS, MatchResult
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+NUMERIC_COLUMNS = ["tv_match_rate", "tgv_match_rate", "final_match_rate"]
+
+# Fixed schema, so a chunk with an all-null column does not change the file's types
+EXPORT_SCHEMA = pa.schema([
+    pa.field(column, pa.float64() if column in NUMERIC_COLUMNS else pa.string()) for column in RESULT_COLUMNS
+])
+
+
+def stream_query(engine, query: str, params: dict, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield the rows of ``query`` as DataFrames of at most ``chunk_size`` rows.
+
+    ``stream_results`` makes psycopg2 use a named (server-side) cursor, so
+    rows stay in Postgres until fetched.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_size)
+        result = conn.exec_driver_sql(query, params)
+        columns = list(result.keys())
+        for rows in result.partitions(chunk_size):
+            yield pd.DataFrame(rows, columns=columns)
+
+
+def result_row_count(result: MatchResult) -> int:
+    """Rows of ``result.to_frame()``, without building it."""
+    return int((~np.isnan(result.tv_rates)).sum())
+
+
+def result_chunks(result: MatchResult, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield ``result.to_frame()`` in blocks of employees, best final rate first.
+
+    Blocks hold about ``chunk_size`` rows. Employees tied on final rate stay
+    in one block (their rows interleave by TGV and TV), so the blocks put
+    together equal ``to_frame()`` row for row. A tie group of more employees
+    than fit in a block, and the employees without a final rate, are split
+    at employee boundaries instead; their rows then interleave per block.
+    """
+    if result.empty:
+        return
+    rows_per_employee = max(int((~np.isnan(result.tv_rates)).sum(axis=1).max()), 1)
+    employees_per_chunk = max(chunk_size // rows_per_employee, 1)
+    ranked = result.employees["final_match_rate"].sort_values(ascending=False, na_position="last", kind="mergesort")
+    order = ranked.index.to_numpy()
+    # Tie groups in ``order``; NaN != NaN, so every unrated employee is a group of its own
+    rates = ranked.to_numpy()
+    new_group = np.ones(len(rates), dtype=bool)
+    new_group[1:] = rates[1:] != rates[:-1]
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], len(rates))
+    group = np.cumsum(new_group) - 1
+    # Index just past each employee's tie group, unless the group is too big for a block
+    splittable = (ends - starts > employees_per_chunk)[group]
+    group_ends = ends[group]
+    start = 0
+    while start < len(order):
+        end = min(start + employees_per_chunk, len(order))
+        stop = end if splittable[end - 1] else group_ends[end - 1]
+        frame = result.take(np.sort(order[start:stop])).to_frame()
+        start = stop
+        if len(frame):
+            yield frame
+
+
+def _normalize(chunk: pd.DataFrame) -> pd.DataFrame:
+    """RESULT_COLUMNS with floats for the rates and text (or None) for the rest."""
+    columns = {}
+    for column in RESULT_COLUMNS:
+        values = chunk[column] if column in chunk else pd.Series(None, index=chunk.index, dtype=object)
+        if column in NUMERIC_COLUMNS:
+            columns[column] = pd.to_numeric(values, errors="coerce").astype(np.float64)
+        elif pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+            columns[column] = values.astype(object).where(values.notna(), None)
+        else:
+            columns[column] = pd.Series(np.where(values.notna(), values.astype(str), None), index=chunk.index)
+    return pd.DataFrame(columns)
+
+
+class _Pipe(io.RawIOBase):
+    """Write-only file collecting bytes until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._pieces = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pieces.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._pieces)
+        self._pieces = []
+        return data
+
+
+def iter_export(chunks, file_format: str = "csv", progress=None):
+    """Yield the encoded export of ``chunks`` piece by piece.
+
+    ``progress(rows_written)`` is called after every chunk.
+    """
+    if file_format not in ("csv", "parquet"):
+        raise ValueError(f"Unknown export format: {file_format}")
+    pipe = _Pipe()
+    writer = pq.ParquetWriter(pipe, EXPORT_SCHEMA) if file_format == "parquet" else None
+    rows = 0
+    try:
+        for chunk in chunks:
+            frame = _normalize(chunk)
+            if writer is not None:
+                writer.write_table(pa.Table.from_pandas(frame, schema=EXPORT_SCHEMA, preserve_index=False))
+                data = pipe.drain()
+            else:
+                data = frame.to_csv(index=False, header=rows == 0).encode("utf-8")
+            rows += len(frame)
+            if progress is not None:
+                progress(rows)
+            if data:
+                yield data
+        if file_format == "csv" and rows == 0:
+            yield (",".join(RESULT_COLUMNS) + "\n").encode("utf-8")
+    finally:
+        if writer is not None:
+            writer.close()
+    tail = pipe.drain()
+    if tail:
+        yield tail
+
+
+def export_file(chunks, path: str, file_format: str = None, progress=None) -> int:
+    """Write the export of ``chunks`` to ``path``; returns the rows written.
+
+    The format follows the extension unless given. The file is written under
+    a temporary name and moved into place once complete.
+    """
+    file_format = file_format or ("parquet" if path.endswith(".parquet") else "csv")
+    written = 0
+
+    def track(rows: int):
+        nonlocal written
+        written = rows
+        if progress is not None:
+            progress(rows)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for data in iter_export(chunks, file_format, track):
+                f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
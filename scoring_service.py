@@ -0,0 +1,543 @@
+"""Headless scoring service: the matching engine behind a small HTTP API.
+
+A plain ASGI app (no web framework) so anything can get match rates without
+going through the dashboard, and scoring scales apart from the UI:
+
+    DB_CONNECTION_STRING=... uvicorn scoring_service:app_from_env --factory --port 8100
+
+Endpoints (POST, JSON body with ``role_name``, ``job_level``,
+``benchmark_ids`` and optionally ``weights_config``, as in batch_scoring.py,
+plus the optional pool filters ``directorates`` and ``grades``; ``cohort_name``
+scores on a stored benchmark cohort's members and baselines instead of
+``benchmark_ids``, see benchmark_cohorts.py):
+
+- ``/score_vacancy``: every candidate's TGV and final match rates
+- ``/top_k``: the best ``k`` candidates, with their TV rows if ``detail``
+- ``/candidate_detail``: TV rows of ``employee_ids``
+- ``/export``: the full ranking (one row per employee and TV) streamed as
+  CSV or Parquet (``format``), a chunk of employees at a time
+- ``/similar``: the ``k`` employees nearest to ``benchmark_ids`` in TV space,
+  re-ranked by match rate (``role_name`` optional; see similarity_search.py)
+- ``GET /health``: data version, cache and pool counters
+
+Weights only re-rank a run, so a run is keyed on role, level, benchmark set,
+pool filters and data version. Identical runs requested while one is in flight wait for
+that one instead of scoring again, and runs execute on a bounded thread
+pool; past ``max_pending`` distinct runs the service answers 503.
+``ScoringClient`` is the matching client the dashboard uses.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from batch_scoring import normalize_spec, parse_benchmark_ids
+from benchmark_cohorts import load_cohort
+from database import create_pooled_engine
+from feature_snapshot import latest_snapshot, load_matching_engine, snapshot_version
+from matching_engine import MatchResult
+from result_cache import ResultCache, fetch_data_version, make_result_key
+from result_export import iter_export, result_chunks
+from similarity_search import SimilarityIndex
+
+
+class ServiceBusy(Exception):
+    """Too many distinct runs in flight."""
+
+
+class UnknownCohort(Exception):
+    """The requested benchmark cohort has no members."""
+
+
+def _values(column) -> list:
+    """JSON-ready list of a column: NaN/None as null, numpy scalars as Python values."""
+    series = pd.Series(column)
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def result_payload(result: MatchResult, data_version: str) -> dict:
+    """Columnar JSON of a result's employees (best first) and TGV rates, without TV rows."""
+    ranking = result.ranking()
+    employees = ranking.drop(columns="role")
+    ranked_rates = result.tgv_rates[ranking.index.to_numpy()]
+    tgv_rates = np.where(np.isnan(ranked_rates), None, ranked_rates.astype(object))
+    return {
+        "role_name": result.role_name,
+        "data_version": data_version,
+        "weights_config": result.weights_config,
+        "tgv_names": result.tgv_names,
+        "tvs": {column: _values(result.tvs[column]) for column in ["tgv_name", "tv_name", "baseline_score"]},
+        "employees": {column: _values(employees[column]) for column in employees.columns},
+        "tgv_rates": tgv_rates.tolist(),
+    }
+
+
+def result_from_payload(payload: dict) -> MatchResult:
+    """MatchResult of a ``result_payload``; TV rows load later through ``with_detail``.
+
+    Employees come in ranking order, so ``ranking()`` (a stable sort) keeps ties as sent.
+    """
+    employees = payload["employees"]
+    n_employees = len(employees["employee_id"])
+    frame = pd.DataFrame({"employee_id": pd.Series(employees["employee_id"], dtype=object)})
+    for column in ["directorate", "grade", "education"]:
+        if column in employees:
+            frame[column] = pd.Categorical(employees[column])
+    tvs = pd.DataFrame(payload["tvs"], columns=["tgv_name", "tv_name", "baseline_score"])
+    tgv_rates = np.array(payload["tgv_rates"], dtype=np.float64).reshape(n_employees, len(payload["tgv_names"]))
+    return MatchResult(
+        payload["role_name"], frame, tvs, np.full((n_employees, len(tvs)), np.nan, dtype=np.float32),
+        pd.DataFrame(index=range(n_employees)), payload["tgv_names"], tgv_rates, payload["weights_config"],
+        np.zeros(n_employees, dtype=bool),
+    )
+
+
+def detail_records(result: MatchResult, employee_ids) -> list:
+    """Long TV rows (DETAIL_QUERY layout) of the given employees."""
+    frames = [result.tv_detail(employee_id).assign(employee_id=employee_id) for employee_id in employee_ids]
+    if not frames:
+        return []
+    frame = pd.concat(frames, ignore_index=True)
+    return [dict(zip(frame.columns, row)) for row in zip(*(_values(frame[c]) for c in frame.columns))]
+
+
+class ScoringService:
+    """Matching engine, result cache and a bounded pool of scoring threads.
+
+    ``run`` returns a ``concurrent.futures.Future`` of the (unweighted)
+    MatchResult; callers asking for a run that is already in flight get the
+    same future.
+    """
+
+    def __init__(self, engine, snapshot_dir: str = None, max_workers: int = 4, max_pending: int = 64,
+                 result_cache: ResultCache = None, version_ttl: float = 5.0):
+        self.engine = engine
+        self.snapshot_dir = snapshot_dir
+        self.max_pending = max_pending
+        self.version_ttl = version_ttl
+        self.result_cache = result_cache or ResultCache(max_entries=32)
+        self.coalesced = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._engine_lock = threading.Lock()
+        self._matching_engine = (None, None)
+        self._similarity_index = None
+        self._version = (None, 0.0)
+
+    def data_version(self) -> str:
+        """Data version, re-read at most every ``version_ttl`` seconds.
+
+        Without a database the newest feature snapshot is used, as in the dashboard.
+        """
+        version, read_at = self._version
+        if version is None or time.monotonic() - read_at > self.version_ttl:
+            try:
+                version = fetch_data_version(self.engine)
+            except Exception:
+                snapshot = latest_snapshot(self.snapshot_dir) if self.snapshot_dir else None
+                if snapshot is None:
+                    raise
+                version = snapshot_version(snapshot)
+            self._version = (version, time.monotonic())
+        return version
+
+    def matching_engine(self, data_version: str):
+        """MatchingEngine of ``data_version``, loaded once per version."""
+        with self._engine_lock:
+            loaded_version, matching_engine = self._matching_engine
+            if loaded_version != data_version:
+                matching_engine, _ = load_matching_engine(self.engine, self.snapshot_dir, data_version)
+                self._matching_engine = (data_version, matching_engine)
+            return matching_engine
+
+    def _score(self, role_name: str, job_level: str, benchmark_ids: list, directorates=None, grades=None,
+               cohort_name: str = None):
+        data_version = self.data_version()
+        cohort = None
+        if cohort_name is not None:
+            cohort = load_cohort(self.engine, cohort_name)
+            if cohort is None:
+                raise UnknownCohort(f"cohort {cohort_name} has no members")
+            benchmark_ids = cohort.member_ids
+            if cohort.stale:
+                # Baselines older than the latest data load; compute them from the members, as the dashboard does
+                cohort = None
+        key = make_result_key(role_name, job_level, benchmark_ids, None, data_version, directorates, grades,
+                              cohort.fingerprint if cohort is not None else None)
+        result = self.result_cache.get(key, data_version)
+        if result is None:
+            matching_engine = self.matching_engine(data_version)
+            baselines = matching_engine.stored_baselines(cohort.baselines) if cohort is not None else None
+            result = matching_engine.match(
+                role_name, benchmark_ids, baselines=baselines, directorates=directorates, grades=grades
+            )
+            if not result.empty:
+                self.result_cache.set(key, result, data_version)
+        return result, data_version
+
+    def run(self, role_name: str, job_level: str, benchmark_ids: list, directorates=None, grades=None,
+            cohort_name: str = None):
+        """Future of (MatchResult, data_version) for one run, shared with identical in-flight runs.
+
+        With ``cohort_name`` the cohort's members and stored baselines replace ``benchmark_ids``.
+        """
+        run_key = (role_name.lower(), job_level, tuple(sorted(benchmark_ids)),
+                   None if directorates is None else tuple(sorted(directorates)),
+                   None if grades is None else tuple(sorted(grades)), cohort_name)
+        return self._submit(run_key, self._score, role_name, job_level, benchmark_ids, directorates, grades,
+                            cohort_name)
+
+    def _submit(self, run_key, fn, *args):
+        with self._lock:
+            future = self._in_flight.get(run_key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            if len(self._in_flight) >= self.max_pending:
+                raise ServiceBusy(f"{len(self._in_flight)} runs in flight")
+            future = self._pool.submit(fn, *args)
+            self._in_flight[run_key] = future
+        future.add_done_callback(lambda _: self._release(run_key, future))
+        return future
+
+    def similarity_index(self, data_version: str) -> SimilarityIndex:
+        """Similarity index of ``data_version``'s engine, refreshed (not rebuilt) on a new version."""
+        matching_engine = self.matching_engine(data_version)
+        with self._engine_lock:
+            if self._similarity_index is None:
+                self._similarity_index = SimilarityIndex(matching_engine)
+            elif self._similarity_index.matching_engine is not matching_engine:
+                self._similarity_index.refresh(matching_engine)
+            return self._similarity_index
+
+    def _similar(self, benchmark_ids: list, k: int, role_name: str = None, weights_config=None):
+        data_version = self.data_version()
+        index = self.similarity_index(data_version)
+        return index.search(benchmark_ids, k, role_name, weights_config), data_version
+
+    def similar(self, benchmark_ids: list, k: int, role_name: str = None, weights_config=None):
+        """Future of (MatchResult, data_version) of the ``k`` employees most like the benchmark set.
+
+        The weights pick the ``k`` out of the shortlist, so they are part of the key.
+        """
+        run_key = ("similar", tuple(sorted(benchmark_ids)), k, role_name and role_name.lower(),
+                   json.dumps(weights_config, sort_keys=True))
+        return self._submit(run_key, self._similar, benchmark_ids, k, role_name, weights_config)
+
+    def _release(self, run_key, future):
+        with self._lock:
+            if self._in_flight.get(run_key) is future:
+                del self._in_flight[run_key]
+
+    def status(self) -> dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "data_version": self._version[0],
+            "in_flight": in_flight,
+            "coalesced": self.coalesced,
+            "cache_hits": self.result_cache.hits,
+            "cache_misses": self.result_cache.misses,
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_json(receive) -> dict:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "body is not valid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "body must be a JSON object")
+    return payload
+
+
+class StreamingBody:
+    """Handler result sent in pieces: ``chunks`` is a (blocking) iterator of bytes."""
+
+    def __init__(self, content_type: str, chunks, filename: str = None):
+        self.content_type = content_type
+        self.chunks = chunks
+        self.filename = filename
+
+
+async def _send_stream(send, body: StreamingBody):
+    headers = [(b"content-type", body.content_type.encode())]
+    if body.filename:
+        headers.append((b"content-disposition", f'attachment; filename="{body.filename}"'.encode()))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            # Producing a piece reads and encodes a chunk; keep it off the event loop
+            data = await loop.run_in_executor(None, next, body.chunks, None)
+            if data is None:
+                break
+            await send({"type": "http.response.body", "body": data, "more_body": True})
+    finally:
+        # Ends the response even when producing failed; the client gets a truncated body
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def _send_json(send, status: int, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _vacancy(payload: dict) -> dict:
+    cohort_name = payload.get("cohort_name")
+    if cohort_name is not None and not isinstance(cohort_name, str):
+        raise HTTPError(400, "cohort_name must be a string")
+    if cohort_name:
+        # The cohort's members are the benchmark
+        payload = dict(payload, benchmark_ids=payload.get("benchmark_ids") or [])
+    try:
+        spec = normalize_spec(payload, 0)
+    except KeyError as ex:
+        raise HTTPError(400, f"missing field {ex.args[0]}")
+    except ValueError:
+        raise HTTPError(400, "weights_config is not valid JSON")
+    if not spec["benchmark_ids"] and not cohort_name:
+        raise HTTPError(400, "benchmark_ids is empty")
+    spec["cohort_name"] = cohort_name or None
+    for name in ["directorates", "grades"]:
+        values = payload.get(name)
+        if values is not None and not isinstance(values, list):
+            raise HTTPError(400, f"{name} must be a list")
+        spec[name] = None if values is None else [str(v) for v in values]
+    return spec
+
+
+def create_app(service: ScoringService):
+    """ASGI app serving ``service``."""
+
+    async def scored(payload: dict):
+        spec = _vacancy(payload)
+        try:
+            future = service.run(spec["role_name"], spec["job_level"], spec["benchmark_ids"], spec["directorates"],
+                                 spec["grades"], spec["cohort_name"])
+        except ServiceBusy as ex:
+            raise HTTPError(503, str(ex))
+        try:
+            result, data_version = await asyncio.wrap_future(future)
+        except UnknownCohort as ex:
+            raise HTTPError(404, str(ex))
+        if result.empty:
+            raise HTTPError(404, "no candidates for this role and benchmark set")
+        return result.reweight(spec["weights_config"]), data_version
+
+    async def score_vacancy(payload: dict) -> dict:
+        result, data_version = await scored(payload)
+        return result_payload(result, data_version)
+
+    async def top_k(payload: dict) -> dict:
+        try:
+            k = int(payload.get("k", 100))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "k must be an integer")
+        result, data_version = await scored(payload)
+        top = result.top(k)
+        response = result_payload(top, data_version)
+        if payload.get("detail"):
+            response["detail"] = detail_records(top, response["employees"]["employee_id"])
+        return response
+
+    async def candidate_detail(payload: dict) -> dict:
+        employee_ids = payload.get("employee_ids") or []
+        if not isinstance(employee_ids, list):
+            raise HTTPError(400, "employee_ids must be a list")
+        result, data_version = await scored(payload)
+        known = pd.Index(result.employees["employee_id"])
+        missing = [employee_id for employee_id in employee_ids if employee_id not in known]
+        if missing:
+            raise HTTPError(404, f"unknown employee_ids: {', '.join(map(str, missing))}")
+        return {"data_version": data_version, "detail": detail_records(result, employee_ids)}
+
+    async def similar(payload: dict) -> dict:
+        benchmark_ids = parse_benchmark_ids(payload.get("benchmark_ids"))
+        if not benchmark_ids:
+            raise HTTPError(400, "benchmark_ids is empty")
+        try:
+            k = int(payload.get("k", 50))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "k must be an integer")
+        role_name = payload.get("role_name")
+        weights_config = payload.get("weights_config")
+        if not isinstance(weights_config, dict):
+            weights_config = None
+        try:
+            future = service.similar(benchmark_ids, k, role_name and str(role_name).strip(), weights_config)
+        except ServiceBusy as ex:
+            raise HTTPError(503, str(ex))
+        result, data_version = await asyncio.wrap_future(future)
+        return result_payload(result, data_version)
+
+    async def export(payload: dict) -> StreamingBody:
+        file_format = payload.get("format", "csv")
+        if file_format not in ("csv", "parquet"):
+            raise HTTPError(400, "format must be csv or parquet")
+        result, _ = await scored(payload)
+        content_type = "text/csv" if file_format == "csv" else "application/vnd.apache.parquet"
+        return StreamingBody(content_type, iter_export(result_chunks(result), file_format),
+                             f"ranking.{file_format}")
+
+    routes = {
+        ("POST", "/score_vacancy"): score_vacancy,
+        ("POST", "/top_k"): top_k,
+        ("POST", "/candidate_detail"): candidate_detail,
+        ("POST", "/similar"): similar,
+        ("POST", "/export"): export,
+    }
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    service.close()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        response = None
+        try:
+            if scope["method"] == "GET" and scope["path"] == "/health":
+                await _send_json(send, 200, service.status())
+                return
+            handler = routes.get((scope["method"], scope["path"]))
+            if handler is None:
+                raise HTTPError(404, f"no route {scope['method']} {scope['path']}")
+            response = await handler(await _read_json(receive))
+            if isinstance(response, StreamingBody):
+                await _send_stream(send, response)
+            else:
+                await _send_json(send, 200, response)
+        except HTTPError as ex:
+            await _send_json(send, ex.status, {"error": str(ex)})
+        except Exception as ex:
+            if isinstance(response, StreamingBody):
+                # The response has started; the server logs the error
+                raise
+            await _send_json(send, 500, {"error": str(ex)})
+
+    app.service = service
+    return app
+
+
+def app_from_env():
+    """App factory for ASGI servers, configured like batch_scoring.py and the dashboard."""
+    engine = create_pooled_engine(
+        os.environ["DB_CONNECTION_STRING"],
+        pool_size=int(os.environ.get("DB_POOL_SIZE", 5)),
+        statement_timeout_ms=int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 60000)),
+    )
+    service = ScoringService(
+        engine,
+        snapshot_dir=os.environ.get("FEATURE_SNAPSHOT_DIR"),
+        max_workers=int(os.environ.get("SCORING_WORKERS", 4)),
+        max_pending=int(os.environ.get("SCORING_MAX_PENDING", 64)),
+        result_cache=ResultCache(max_entries=32, disk_dir=os.environ.get("RESULT_CACHE_DIR")),
+    )
+    return create_app(service)
+
+
+class ScoringClient:
+    """Client of the scoring service, returning the dashboard's data structures."""
+
+    def __init__(self, base_url: str, timeout: float = 120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, path: str, payload: dict) -> dict:
+        response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            try:
+                message = response.json()["error"]
+            except (ValueError, KeyError):
+                message = response.text
+            raise RuntimeError(f"Scoring service {path} failed ({response.status_code}): {message}")
+        return response.json()
+
+    @staticmethod
+    def _vacancy(role_name, job_level, benchmark_ids, weights_config, directorates, grades, cohort_name) -> dict:
+        return {"role_name": role_name, "job_level": job_level, "benchmark_ids": list(benchmark_ids),
+                "weights_config": weights_config, "directorates": directorates, "grades": grades,
+                "cohort_name": cohort_name}
+
+    def score_vacancy(self, role_name, job_level, benchmark_ids, weights_config=None, directorates=None,
+                      grades=None, cohort_name=None):
+        """(MatchResult without TV rows, data_version)."""
+        payload = self._post("/score_vacancy", self._vacancy(role_name, job_level, benchmark_ids, weights_config,
+                                                             directorates, grades, cohort_name))
+        return result_from_payload(payload), payload["data_version"]
+
+    def export(self, role_name, job_level, benchmark_ids, weights_config, path: str, file_format: str = "csv",
+               directorates=None, grades=None, progress=None, cohort_name=None) -> int:
+        """Stream the full ranking into ``path``; returns the bytes written.
+
+        ``progress(bytes_written)`` is called per received piece.
+        """
+        payload = self._vacancy(role_name, job_level, benchmark_ids, weights_config, directorates, grades,
+                                cohort_name)
+        payload["format"] = file_format
+        url = f"{self.base_url}/export"
+        written = 0
+        with self.session.post(url, json=payload, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Scoring service /export failed ({response.status_code}): {response.text}")
+            with open(path, "wb") as f:
+                for data in response.iter_content(chunk_size=1 << 20):
+                    f.write(data)
+                    written += len(data)
+                    if progress is not None:
+                        progress(written)
+        return written
+
+    def candidate_detail(self, role_name, job_level, benchmark_ids, employee_ids, directorates=None,
+                         grades=None, cohort_name=None) -> pd.DataFrame:
+        """TV rows of ``employee_ids``, for ``MatchResult.with_detail``."""
+        payload = self._vacancy(role_name, job_level, benchmark_ids, None, directorates, grades, cohort_name)
+        payload["employee_ids"] = list(employee_ids)
+        return pd.DataFrame(self._post("/candidate_detail", payload)["detail"])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the matching engine over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args(argv)
+    uvicorn.run("scoring_service:app_from_env", factory=True, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
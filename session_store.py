@@ -0,0 +1,200 @@
+"""Process-wide store of the analysis results under one memory budget.
+
+The store is the only long-lived in-memory owner of MatchResults. Results are
+keyed by their run key (``result_cache.make_result_key``); sessions keep only
+that key in ``st.session_state``, and identical runs of different sessions
+share one entry. Results are held in memory in LRU order. Past
+``memory_budget`` bytes, the least recently used ones are spilled to a
+zstd-compressed Arrow file and dropped from memory. ``get`` reloads a spilled
+result transparently. Results not used for ``max_idle_seconds`` are
+discarded, on disk too.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from matching_engine import MatchResult
+
+# Bundled with the pyarrow wheels; builds without it spill uncompressed
+COMPRESSION = "zstd" if pa.Codec.is_available("zstd") else None
+
+
+def write_result_file(result: MatchResult, path: str):
+    """One row per employee: attributes, TV rates, user scores, TGV rates and the detail flag.
+
+    The TV and TGV layout, role and weights go in the schema metadata.
+    """
+    columns = {}
+    for name, column in result.employees.drop(columns="final_match_rate").items():
+        columns[f"employee.{name}"] = pa.array(column, from_pandas=True)
+    for j in range(result.tv_rates.shape[1]):
+        columns[f"tv_rate.{j}"] = pa.array(result.tv_rates[:, j])
+    for j, (name, column) in enumerate(result.user_scores.items()):
+        columns[f"user_score.{j}"] = pa.array(column, from_pandas=True)
+    for k in range(result.tgv_rates.shape[1]):
+        columns[f"tgv_rate.{k}"] = pa.array(result.tgv_rates[:, k])
+    columns["detail"] = pa.array(result.detail)
+    metadata = {
+        "role_name": json.dumps(result.role_name),
+        "weights_config": json.dumps(result.weights_config),
+        "tgv_names": json.dumps(result.tgv_names),
+        "user_score_names": json.dumps(list(result.user_scores.columns)),
+        "tvs": json.dumps(result.tvs.astype(object).where(result.tvs.notna(), None).to_dict(orient="split")),
+    }
+    table = pa.table(columns).replace_schema_metadata(metadata)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_result_file(path: str) -> MatchResult:
+    with pa.OSFile(path, "rb") as source:
+        reader = pa.ipc.open_file(source)
+        table = reader.read_all()
+        metadata = {key.decode("utf-8"): value.decode("utf-8") for key, value in reader.schema.metadata.items()}
+
+    def block(prefix: str) -> list:
+        return [name for name in table.column_names if name.startswith(prefix)]
+
+    n_employees = table.num_rows
+    employees = pd.DataFrame({
+        name.split(".", 1)[1]: table.column(name).to_pandas() for name in block("employee.")
+    })
+    tv_columns = block("tv_rate.")
+    tv_rates = np.empty((n_employees, len(tv_columns)), dtype=np.float32)
+    for j, name in enumerate(tv_columns):
+        tv_rates[:, j] = table.column(name).to_numpy()
+    tgv_columns = block("tgv_rate.")
+    tgv_rates = np.empty((n_employees, len(tgv_columns)), dtype=np.float64)
+    for k, name in enumerate(tgv_columns):
+        tgv_rates[:, k] = table.column(name).to_numpy()
+    user_score_names = json.loads(metadata["user_score_names"])
+    user_scores = pd.DataFrame(
+        {tv_name: table.column(name).to_pandas() for tv_name, name in zip(user_score_names, block("user_score."))},
+        index=range(n_employees),
+    )
+    tvs = json.loads(metadata["tvs"])
+    tvs = pd.DataFrame(tvs["data"], columns=tvs["columns"])
+    return MatchResult(
+        json.loads(metadata["role_name"]), employees, tvs, tv_rates, user_scores, json.loads(metadata["tgv_names"]),
+        tgv_rates, json.loads(metadata["weights_config"]), table.column("detail").to_numpy(zero_copy_only=False),
+    )
+
+
+class SessionStore:
+    """LRU of run key -> MatchResult with a global memory budget and a disk tier."""
+
+    def __init__(self, memory_budget: int = 512 * 2**20, spill_dir: str = None, max_idle_seconds: float = 24 * 3600):
+        self.memory_budget = memory_budget
+        self.max_idle_seconds = max_idle_seconds
+        # Spill files only make sense to this process; a fresh directory per store
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = tempfile.mkdtemp(prefix="sessions-", dir=spill_dir)
+        self.spills = 0
+        self.reloads = 0
+        self._memory = OrderedDict()  # key -> (result, nbytes)
+        self._spilled = {}  # key -> path
+        self._last_used = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def _spill_path(self, key: str) -> str:
+        digest = hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.spill_dir, f"{digest}.arrow")
+
+    def put(self, key: str, result: MatchResult):
+        """Store ``result`` under ``key``, replacing (not duplicating) any earlier one."""
+        with self._lock:
+            self._drop(key)
+            nbytes = result.nbytes
+            self._memory[key] = (result, nbytes)
+            self._memory_bytes += nbytes
+            self._last_used[key] = time.monotonic()
+            self._expire()
+            self._enforce_budget(keep=key)
+
+    def get(self, key: str):
+        """The stored result, reloaded from disk if it was spilled; None if unknown or expired."""
+        with self._lock:
+            self._expire()
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._last_used[key] = time.monotonic()
+                return self._memory[key][0]
+            path = self._spilled.pop(key, None)
+            if path is None:
+                return None
+            result = read_result_file(path)
+            os.remove(path)
+            self.reloads += 1
+            nbytes = result.nbytes
+            self._memory[key] = (result, nbytes)
+            self._memory_bytes += nbytes
+            self._last_used[key] = time.monotonic()
+            self._enforce_budget(keep=key)
+            return result
+
+    def discard(self, key: str):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        path = self._spilled.pop(key, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+        self._last_used.pop(key, None)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.max_idle_seconds
+        for key in [key for key, used in self._last_used.items() if used < cutoff]:
+            self._drop(key)
+
+    def _enforce_budget(self, keep):
+        """Spill least recently used results until the budget holds; ``keep`` stays in memory."""
+        for key in list(self._memory):
+            if self._memory_bytes <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            result, nbytes = self._memory.pop(key)
+            path = self._spill_path(key)
+            write_result_file(result, path)
+            self._spilled[key] = path
+            self._memory_bytes -= nbytes
+            self.spills += 1
+
+    def usage(self) -> dict:
+        with self._lock:
+            return {
+                "memory_bytes": self._memory_bytes,
+                "memory_budget": self.memory_budget,
+                "in_memory": len(self._memory),
+                "spilled": len(self._spilled),
+                "spill_bytes": sum(os.path.getsize(path) for path in self._spilled.values() if os.path.exists(path)),
+                "spills": self.spills,
+                "reloads": self.reloads,
+                "result_bytes": {key: nbytes for key, (_, nbytes) in self._memory.items()},
+            }
+
+    def close(self):
+        with self._lock:
+            self._memory.clear()
+            self._spilled.clear()
+            self._last_used.clear()
+            self._memory_bytes = 0
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
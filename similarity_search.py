@@ -0,0 +1,235 @@
+"""'Find employees similar to a benchmark set' over per-employee TV vectors.
+
+Every employee becomes one vector over the ``talent_structure`` TVs of a
+MatchingEngine: numeric TVs standardized (missing values at the mean),
+ordinal TVs by their rank, other categorical TVs one-hot. An IVF index
+clusters the vectors with k-means into about sqrt(N) lists; a search only
+scans the lists closest to the benchmark baseline, so its cost grows with
+sqrt(N) instead of N. The shortlist is then re-ranked exactly with the
+engine's TV match rates (``MatchingEngine.match_rows``).
+
+    index = SimilarityIndex(matching_engine)
+    result = index.search(benchmark_ids, k=50)   # MatchResult, with a distance column
+
+``refresh`` moves the index to a reloaded engine (a new data version) and
+only re-assigns the employees whose vectors changed.
+"""
+import numpy as np
+import pandas as pd
+
+from matching_engine import MatchingEngine, MatchResult
+
+# One-hot columns are scaled so a category mismatch is as far as one standard deviation
+ONE_HOT_SCALE = np.float32(1 / np.sqrt(2))
+
+# Past this share of new/changed employees the clusters are retrained
+RETRAIN_SHARE = 0.3
+
+
+def _squared_distances(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return (
+        (vectors ** 2).sum(axis=1)[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+    )
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65_536) -> np.ndarray:
+    """Nearest centroid per vector, in chunks so (rows x lists) stays small."""
+    nearest = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        nearest[start:start + chunk_size] = _squared_distances(vectors[start:start + chunk_size], centroids).argmin(1)
+    return nearest
+
+
+def kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, sample_size: int = 50_000,
+           seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on a sample of the vectors; empty lists keep their centroid."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        nearest = _nearest(vectors, centroids)
+        counts = np.bincount(nearest, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, nearest, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class TVEncoder:
+    """Maps TV values to vector columns, with the scaling fixed when fitted."""
+
+    def __init__(self, matching_engine: MatchingEngine):
+        structure = matching_engine.structure
+        self.numeric_features = list(matching_engine._numeric_tvs["feature"])
+        numeric = matching_engine._numeric_values
+        with np.errstate(invalid="ignore"):
+            self.mean = np.nan_to_num(np.nanmean(numeric, axis=0)) if len(numeric) else np.zeros(numeric.shape[1])
+            std = np.nan_to_num(np.nanstd(numeric, axis=0)) if len(numeric) else np.ones(numeric.shape[1])
+        self.std = np.where(std > 0, std, 1.0)
+
+        # Ordinal TVs: (feature, rank ladder, mean, std) of the ranks
+        self.ordinal = []
+        self.one_hot = []
+        for tv in structure[structure["data_type"] != "numeric"].itertuples(index=False):
+            values = matching_engine._categorical_values[tv.feature]
+            ranks = matching_engine.ordinal_ranks.get(tv.tv_order)
+            if ranks:
+                ranked = np.array([ranks.get(v, 0) for v in values], dtype=np.float64)
+                spread = ranked.std() if len(ranked) else 0
+                self.ordinal.append((tv.feature, ranks, ranked.mean() if len(ranked) else 0, spread or 1.0))
+            else:
+                categories = pd.Index(sorted({v for v in values if not pd.isna(v)}))
+                self.one_hot.append((tv.feature, categories))
+        self.dimensions = len(self.numeric_features) + len(self.ordinal) + sum(len(c) for _, c in self.one_hot)
+
+    def encode(self, numeric_values: np.ndarray, categorical_values: dict) -> np.ndarray:
+        """float32 (rows x dimensions) vectors; numeric columns follow ``numeric_features``."""
+        n_rows = len(numeric_values)
+        vectors = np.zeros((n_rows, self.dimensions), dtype=np.float32)
+        vectors[:, :len(self.numeric_features)] = np.nan_to_num((numeric_values - self.mean) / self.std)
+        column = len(self.numeric_features)
+        for feature, ranks, mean, std in self.ordinal:
+            ranked = np.array([ranks.get(v, 0) for v in categorical_values[feature]], dtype=np.float64)
+            vectors[:, column] = (ranked - mean) / std
+            column += 1
+        for feature, categories in self.one_hot:
+            codes = categories.get_indexer(pd.Index(categorical_values[feature], dtype=object))
+            known = codes >= 0
+            vectors[np.flatnonzero(known), column + codes[known]] = ONE_HOT_SCALE
+            column += len(categories)
+        return vectors
+
+    def encode_engine(self, matching_engine: MatchingEngine) -> np.ndarray:
+        numeric_position = list(matching_engine._numeric_tvs["feature"])
+        numeric = matching_engine._numeric_values[:, [numeric_position.index(f) for f in self.numeric_features]]
+        return self.encode(numeric, matching_engine._categorical_values)
+
+    def encode_baselines(self, baselines: pd.DataFrame) -> np.ndarray:
+        """One vector for a benchmark set: its medians and modes encoded like an employee."""
+        by_feature = baselines.set_index("feature")
+        numeric = np.array([[
+            by_feature.at[f, "baseline_value"] if f in by_feature.index else np.nan for f in self.numeric_features
+        ]], dtype=np.float64)
+        categorical = {
+            feature: np.array([by_feature.at[feature, "baseline_score"] if feature in by_feature.index else None],
+                              dtype=object)
+            for feature in [f for f, *_ in self.ordinal] + [f for f, _ in self.one_hot]
+        }
+        return self.encode(numeric, categorical)[0]
+
+
+class SimilarityIndex:
+    """IVF index over the TV vectors of a MatchingEngine's employees."""
+
+    def __init__(self, matching_engine: MatchingEngine, n_lists: int = None, seed: int = 0):
+        self.seed = seed
+        self._n_lists = n_lists
+        self._train(matching_engine)
+
+    def _train(self, matching_engine: MatchingEngine):
+        self.matching_engine = matching_engine
+        self.encoder = TVEncoder(matching_engine)
+        self.vectors = self.encoder.encode_engine(matching_engine)
+        n_employees = len(self.vectors)
+        n_lists = self._n_lists or int(np.sqrt(n_employees))
+        self.n_lists = max(1, min(n_lists, n_employees))
+        if n_employees:
+            self.centroids = kmeans(self.vectors, self.n_lists, seed=self.seed)
+        else:
+            self.centroids = np.zeros((1, self.encoder.dimensions), dtype=np.float32)
+        self._assign(_nearest(self.vectors, self.centroids))
+
+    def _assign(self, assignment: np.ndarray):
+        """Inverted lists: the engine rows of every list, in row order."""
+        self.assignment = assignment
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def refresh(self, matching_engine: MatchingEngine) -> dict:
+        """Move to a reloaded engine, re-assigning only new and changed employees.
+
+        Vectors keep the scaling of the last training, so unchanged employees
+        keep their vector and list. When more than ``RETRAIN_SHARE`` of the
+        employees are new or changed, the index is retrained instead.
+        """
+        old_position = pd.Index(self.matching_engine._employee_ids)
+        vectors = self.encoder.encode_engine(matching_engine)
+        old_rows = old_position.get_indexer(matching_engine._employee_ids)
+        kept = old_rows >= 0
+        unchanged = np.zeros(len(vectors), dtype=bool)
+        unchanged[kept] = (vectors[kept] == self.vectors[old_rows[kept]]).all(axis=1)
+        stats = {
+            "added": int((~kept).sum()),
+            "changed": int((kept & ~unchanged).sum()),
+            "removed": int(len(old_position) - kept.sum()),
+        }
+        if stats["added"] + stats["changed"] + stats["removed"] > RETRAIN_SHARE * max(len(vectors), 1):
+            self._train(matching_engine)
+            return dict(stats, retrained=True)
+
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        assignment[unchanged] = self.assignment[old_rows[unchanged]]
+        stale = np.flatnonzero(~unchanged)
+        if len(stale):
+            assignment[stale] = _nearest(vectors[stale], self.centroids)
+        self.matching_engine = matching_engine
+        self.vectors = vectors
+        self._assign(assignment)
+        return dict(stats, retrained=False)
+
+    def nearest(self, query: np.ndarray, shortlist: int, n_probe: int = 32, allowed: np.ndarray = None):
+        """(rows, distances) of up to ``shortlist`` approximate nearest employees.
+
+        Lists are scanned closest first: at least ``n_probe`` of them, and more
+        until the shortlist can be filled. ``allowed`` (bool per row) filters rows.
+        """
+        list_order = np.argsort(((self.centroids - query) ** 2).sum(axis=1), kind="stable")
+        probed, found = [], 0
+        for list_id in list_order:
+            rows = self.lists[list_id]
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            probed.append(rows)
+            found += len(rows)
+            if len(probed) >= n_probe and found >= shortlist:
+                break
+        rows = np.concatenate(probed) if probed else np.empty(0, dtype=np.int64)
+        distances = np.sqrt(((self.vectors[rows] - query) ** 2).sum(axis=1))
+        best = np.argsort(distances, kind="stable")[:shortlist]
+        return rows[best], distances[best]
+
+    def search(self, benchmark_ids, k: int = 50, role_name: str = None, weights_config=None, n_probe: int = 32,
+               rerank_factor: int = 4, exclude_benchmarks: bool = True) -> MatchResult:
+        """The ``k`` best matches among the employees nearest to the benchmark set.
+
+        A shortlist of ``rerank_factor * k`` approximate neighbours of the
+        benchmark baseline is scored with the TV match rates, and its top
+        ``k`` by final match rate is returned. ``role_name`` limits the
+        search to that position (None: the whole company). The employees
+        carry their vector ``distance``.
+        """
+        matching_engine = self.matching_engine
+        baselines = matching_engine.compute_baselines(benchmark_ids)
+        if baselines.empty:
+            return MatchResult.no_candidates(role_name, weights_config)
+        allowed = None
+        if role_name is not None:
+            allowed = np.zeros(len(self.vectors), dtype=bool)
+            allowed[matching_engine.eligible_rows(role_name)] = True
+        if exclude_benchmarks:
+            allowed = np.ones(len(self.vectors), dtype=bool) if allowed is None else allowed
+            benchmark_rows = matching_engine._employee_index.get_indexer([str(i) for i in benchmark_ids])
+            allowed[benchmark_rows[benchmark_rows >= 0]] = False
+
+        rows, distances = self.nearest(self.encoder.encode_baselines(baselines), rerank_factor * k, n_probe, allowed)
+        order = np.argsort(rows, kind="stable")
+        result = matching_engine.match_rows(role_name, rows[order], baselines, weights_config)
+        if result.empty:
+            return result
+        # match_rows drops employees without any TV rate, so align by employee_id
+        distance = pd.Series(distances[order], index=matching_engine._employee_ids[rows[order]])
+        result.employees["distance"] = distance.reindex(result.employees["employee_id"]).to_numpy()
+        return result.top(k)
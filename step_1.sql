@@ -1,76 +1,14 @@
+-- One row per (employee, performance year) with the employee's strengths,
+-- PAPI scores and competencies aggregated alongside. The aggregates are
+-- per-employee LATERAL subqueries, so a filter on employee_id (as used by the
+-- incremental refresh in employee_report_snapshot.sql) only aggregates the
+-- matching employees instead of every row of the source tables.
 CREATE OR REPLACE VIEW employee_report AS
-WITH strengths_agg AS (
-  SELECT
-    employee_id,
-    STRING_AGG(theme, ', ') AS employee_strengths
-  FROM 
-    strengths
-  GROUP BY 
-    employee_id
-),
-papi_agg AS (
-  SELECT
-    employee_id,
-    JSON_AGG(
-      JSON_BUILD_OBJECT(
-        'scale_code', scale_code,
-        'score', score
-      )
-    ) AS papi_data
-  FROM 
-    papi_scores
-  GROUP 
-    BY employee_id
-),
-education_cte AS (
-  SELECT
-    e.employee_id,
-    CONCAT_WS(' - ', de.name, dm.name) AS education
-  FROM 
-    employees e
-  LEFT JOIN 
-    dim_education de 
-  ON 
-    e.education_id = de.education_id
-  LEFT JOIN
-     dim_majors dm 
-  ON 
-    e.major_id = dm.major_id
-),
-competencies_cte AS (
-  SELECT
-    cy.employee_id,
-    JSON_AGG(
-  JSON_BUILD_OBJECT(
-    'scale_code', cp.pillar_code,
-    'score', cy.score
-  )
-  ) AS competencies
-  FROM 
-    competencies_yearly cy
-  LEFT JOIN 
-    dim_competency_pillars cp
-  ON 
-    cp.pillar_code = cy.pillar_code
-  GROUP BY 
-    cy.employee_id
-),
-profiles_cte AS (
-  SELECT
-    employee_id,
-    disc,
-    disc_word,
-    mbti,
-    iq,
-    gtq
-  FROM 
-    profiles_psych
-)
 SELECT
   e.employee_id,
   e.fullname AS full_name,
   e.years_of_service_months AS work_duration_months,
-  edu.education,
+  CONCAT_WS(' - ', de.name, dm.name) AS education,
   p.disc,
   p.disc_word,
   p.mbti,
@@ -81,32 +19,75 @@ SELECT
   cc.competencies,
   py.rating,
   py.year
-FROM 
+FROM
   employees e
-LEFT JOIN 
-  competencies_cte cc 
-ON 
-  cc.employee_id = e.employee_id
-LEFT JOIN 
-  papi_agg pa
-ON 
-  pa.employee_id = e.employee_id
+LEFT JOIN LATERAL (
+  SELECT
+    JSON_AGG(
+      JSON_BUILD_OBJECT(
+        'scale_code', cp.pillar_code,
+        'score', cy.score
+      )
+    ) AS competencies
+  FROM
+    competencies_yearly cy
+  LEFT JOIN
+    dim_competency_pillars cp
+  ON
+    cp.pillar_code = cy.pillar_code
+  WHERE
+    cy.employee_id = e.employee_id
+) cc
+ON
+  TRUE
+LEFT JOIN LATERAL (
+  SELECT
+    JSON_AGG(
+      JSON_BUILD_OBJECT(
+        'scale_code', ps.scale_code,
+        'score', ps.score
+      )
+    ) AS papi_data
+  FROM
+    papi_scores ps
+  WHERE
+    ps.employee_id = e.employee_id
+) pa
+ON
+  TRUE
+LEFT JOIN LATERAL (
+  SELECT
+    STRING_AGG(s.theme, ', ') AS employee_strengths
+  FROM
+    strengths s
+  WHERE
+    s.employee_id = e.employee_id
+) sa
+ON
+  TRUE
 LEFT JOIN
-  strengths_agg sa 
-ON 
-sa.employee_id = e.employee_id
-LEFT JOIN 
-  education_cte edu 
-ON 
-  edu.employee_id = e.employee_id
-LEFT JOIN 
-  profiles_cte p 
-ON 
+  dim_education de
+ON
+  e.education_id = de.education_id
+LEFT JOIN
+  dim_majors dm
+ON
+  e.major_id = dm.major_id
+LEFT JOIN
+  profiles_psych p
+ON
   p.employee_id = e.employee_id
-LEFT JOIN 
-  performance_yearly py 
-ON 
+LEFT JOIN
+  performance_yearly py
+ON
   py.employee_id = e.employee_id
-ORDER BY 
-  py.year ASC, 
-  py.rating DESC
\ No newline at end of file
+ORDER BY
+  py.year ASC,
+  py.rating DESC;
+
+-- Per-employee lookups of the LATERAL subqueries above
+CREATE INDEX IF NOT EXISTS competencies_yearly_employee_id_idx ON competencies_yearly (employee_id);
+CREATE INDEX IF NOT EXISTS papi_scores_employee_id_idx ON papi_scores (employee_id);
+CREATE INDEX IF NOT EXISTS strengths_employee_id_idx ON strengths (employee_id);
+CREATE INDEX IF NOT EXISTS profiles_psych_employee_id_idx ON profiles_psych (employee_id);
+CREATE INDEX IF NOT EXISTS performance_yearly_employee_id_idx ON performance_yearly (employee_id);
@@ -0,0 +1,420 @@
+"""Success Formula discovery pipeline, extracted from analysis.ipynb.
+
+Runs the notebook's top-vs-mid performer statistics on an
+``employee_report`` export, one performance year at a time:
+
+* Welch t-tests on tenure and the psychometric scores,
+* chi-square tests on degree level, major, DISC type and DISC dimensions,
+* top-vs-mid means and Welch t-tests per competency pillar,
+* point-biserial correlations of the PAPI scales,
+* a chi-square test on the strength themes,
+
+and turns the significant effects into the ``tgv_weights`` config the
+matching query takes.
+
+Every stage is memoized on a hash of exactly the columns it reads, so when a
+new year of data arrives only that year's statistics are computed (and when
+one year is re-exported, only the statistics whose inputs changed).
+Independent statistics run in parallel.
+
+    python success_formula.py employees_performance_2024.csv employees_performance_2025.csv \\
+        --cache-dir .success_formula_cache --out weights.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency, pointbiserialr, ttest_ind
+
+from matching_engine import TALENT_STRUCTURE
+from report_loader import REPORT_JSON_COLUMNS, clean_column_name, expand_papi, json_records, strength_themes
+
+# Bump when a stage's output changes, so older cache entries are not reused
+STAGE_VERSION = 1
+
+TOP_RATING = 5
+ALPHA = 0.05
+
+DISC_DIMENSIONS = {"D": "Dominance", "I": "Influence", "S": "Steadiness", "C": "Compliance"}
+
+# Psychometric scores of the report that get a Welch t-test, by column
+PSYCH_COLUMNS = ["iq", "gtq", "pauli", "tiki"]
+
+# Competency pillars as they appear in the report (step_1.sql codes or the
+# notebook's cleaned labels) -> talent_structure column_name
+PILLAR_COLUMNS = {
+    "QDD": "Quality_Delivery", "Quality_Delivery_Discipline": "Quality_Delivery",
+    "FTC": "Forward_Thinking", "Forward_Thinking_and_Clarity": "Forward_Thinking",
+    "STO": "Team_Orientation", "Synergy_and_Team_Orientation": "Team_Orientation",
+    "CSI": "Commercial_Savvy", "Commercial_Savvy_and_Impact": "Commercial_Savvy",
+    "VCU": "Value_Creation", "Value_Creation_for_Users": "Value_Creation",
+    "IDS": "Insight_Decision", "Insight_and_Decision_Sharpness": "Insight_Decision",
+    "GDR": "Growth_Drive", "Growth_Drive_and_Resilience": "Growth_Drive",
+    "CEX": "Curiosity", "Curiosity_and_Experimentation": "Curiosity",
+    "LIE": "Lead_Inspire", "Lead_Inspire_and_Empower": "Lead_Inspire",
+    "SEA": "Social_Empathy", "Social_Empathy_and_Awareness": "Social_Empathy",
+}
+
+# talent_structure column_name -> statistic holding its evidence (pillars and
+# PAPI scales are looked up by name in the 'pillars' / 'papi' statistics)
+TV_STATISTICS = {
+    "Pauli_Score": "pauli", "IQ_Score": "iq", "GTQ_Score": "gtq", "TIKI_Score": "tiki",
+    "education": "degree_level", "disc": "disc",
+}
+
+
+def frame_digest(frame: pd.DataFrame) -> str:
+    """Content hash of a frame's columns and values (not its index)."""
+    columns = {}
+    for name, column in frame.items():
+        # Decoded JSON (lists) and mixed objects hash by their text
+        columns[name] = column.astype(str) if column.dtype == object else column
+    hashed = pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+    header = json.dumps([[str(name), str(dtype)] for name, dtype in frame.dtypes.items()])
+    return hashlib.sha1(header.encode("utf-8") + hashed.tobytes()).hexdigest()
+
+
+class StageCache:
+    """Stage results keyed on (stage, input hash), in memory and optionally on disk."""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def key(self, stage: str, digest: str) -> str:
+        return hashlib.sha1(f"{STAGE_VERSION}:{stage}:{digest}".encode("utf-8")).hexdigest()
+
+    def _path(self, stage: str, key: str) -> str:
+        return os.path.join(self.directory, f"{stage}-{key}.pkl")
+
+    def get_or_compute(self, stage: str, digest: str, compute):
+        """(result, computed): the cached result, or ``compute()`` stored under the key."""
+        key = self.key(stage, digest)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key], False
+        if self.directory and os.path.exists(self._path(stage, key)):
+            with open(self._path(stage, key), "rb") as f:
+                result = pickle.load(f)
+            with self._lock:
+                self._entries[key] = result
+                self.hits += 1
+            return result, False
+
+        result = compute()
+        with self._lock:
+            self._entries[key] = result
+            self.misses += 1
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(stage, key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        return result, True
+
+
+def prepare_report(report: pd.DataFrame) -> dict:
+    """Notebook preprocessing of one year's report.
+
+    Returns ``frame`` (one row per rated employee: ``top`` flag, tenure,
+    education split, DISC type and dimensions, psychometrics, PAPI scales),
+    ``competencies`` (long: row, pillar, score, top) and ``strengths``
+    (long: row, theme, top). Rows without a rating are left out.
+    """
+    rating = pd.to_numeric(report["rating"], errors="coerce")
+    report = report[rating.notna()].reset_index(drop=True)
+    top = (rating[rating.notna()] == TOP_RATING).to_numpy()
+
+    education = report["education"].astype(object).where(report["education"].notna(), None)
+    education = pd.Series(education).str.split(" - ", n=1, expand=True).reindex(columns=[0, 1])
+    disc = report["disc"].astype(object).where(report["disc"].notna(), None)
+    disc_text = pd.Series(disc).fillna("").astype(str)
+
+    frame = pd.DataFrame({
+        "employee_id": report["employee_id"].astype(str).to_numpy(dtype=object),
+        "top": top,
+        "work_duration_months": pd.to_numeric(report["work_duration_months"], errors="coerce"),
+        "degree_level": education[0].to_numpy(dtype=object),
+        "major": education[1].to_numpy(dtype=object),
+        "disc": disc.to_numpy(dtype=object),
+    })
+    for letter, name in DISC_DIMENSIONS.items():
+        frame[name] = disc_text.str.contains(letter, regex=False).astype(int).to_numpy()
+    for column in PSYCH_COLUMNS:
+        if column in report:
+            frame[column] = pd.to_numeric(report[column], errors="coerce")
+    if "papi_data" in report:
+        papi = expand_papi(report["papi_data"])
+        frame = pd.concat([frame, papi[sorted(papi.columns)]], axis=1)
+
+    competencies = pd.DataFrame({"row": [], "pillar": [], "score": []})
+    if "competencies" in report:
+        records = json_records(report["competencies"])
+        key = next((key for key in REPORT_JSON_COLUMNS["competencies"] if key in records), None)
+        if key is not None and "score" in records:
+            pillar = records[key].where(records[key].notna(), "").astype(str)
+            competencies = pd.DataFrame({
+                "row": records["row"].to_numpy(),
+                "pillar": pillar.map(lambda name: PILLAR_COLUMNS.get(clean_column_name(name), name)).to_numpy(),
+                "score": pd.to_numeric(records["score"], errors="coerce").to_numpy(dtype=np.float64),
+            })
+            competencies = competencies[(competencies["pillar"] != "") & competencies["score"].notna()]
+    competencies = competencies.assign(top=top[competencies["row"].to_numpy(dtype=np.int64)])
+
+    strengths = pd.DataFrame({"row": [], "theme": []})
+    if "employee_strengths" in report:
+        strengths = strength_themes(report["employee_strengths"])[["row", "theme"]]
+    strengths = strengths.assign(top=top[strengths["row"].to_numpy(dtype=np.int64)])
+
+    return {
+        "frame": frame,
+        "competencies": competencies.reset_index(drop=True),
+        "strengths": strengths.reset_index(drop=True),
+    }
+
+
+def _welch(top: pd.Series, mid: pd.Series) -> dict:
+    top, mid = top.dropna(), mid.dropna()
+    result = {"top_mean": top.mean(), "mid_mean": mid.mean(), "difference": top.mean() - mid.mean(),
+              "statistic": np.nan, "p_value": np.nan, "effect": np.nan, "n": len(top) + len(mid)}
+    if len(top) > 1 and len(mid) > 1:
+        test = ttest_ind(top, mid, equal_var=False)
+        # Effect size as a correlation: r = t / sqrt(t^2 + df), positive when top is higher
+        result.update(statistic=test.statistic, p_value=test.pvalue,
+                      effect=test.statistic / np.sqrt(test.statistic ** 2 + test.df))
+    return result
+
+
+def welch_test(data: pd.DataFrame) -> dict:
+    """Welch t-test of the second column, top vs mid performers."""
+    values = data.iloc[:, 1]
+    return _welch(values[data["top"]], values[~data["top"]])
+
+
+def _chi_square(table: pd.DataFrame) -> dict:
+    result = {"statistic": np.nan, "p_value": np.nan, "dof": 0, "effect": np.nan, "n": int(table.to_numpy().sum())}
+    if table.shape[0] > 1 and table.shape[1] > 1:
+        chi2, p_value, dof, _ = chi2_contingency(table)
+        # Cramer's V
+        effect = np.sqrt(chi2 / (result["n"] * (min(table.shape) - 1)))
+        result.update(statistic=chi2, p_value=p_value, dof=int(dof), effect=effect)
+    return result
+
+
+def chi_square_test(data: pd.DataFrame) -> dict:
+    """Chi-square test of independence of the second column and top/mid."""
+    return _chi_square(pd.crosstab(data.iloc[:, 1], data["top"]))
+
+
+def disc_dimension_tests(data: pd.DataFrame) -> pd.DataFrame:
+    """Chi-square test per DISC dimension (letter present or not) vs top/mid."""
+    results = {name: _chi_square(pd.crosstab(data["top"], data[name])) for name in DISC_DIMENSIONS.values()}
+    return pd.DataFrame.from_dict(results, orient="index")
+
+
+def pillar_tests(competencies: pd.DataFrame) -> pd.DataFrame:
+    """Top-vs-mid means and Welch t-test per competency pillar, largest difference first."""
+    results = {
+        pillar: _welch(group.loc[group["top"], "score"], group.loc[~group["top"], "score"])
+        for pillar, group in competencies.groupby("pillar")
+    }
+    frame = pd.DataFrame.from_dict(results, orient="index").rename_axis("pillar")
+    if frame.empty:
+        return frame
+    frame = frame[frame["p_value"].notna()]
+    frame["significant"] = frame["p_value"] < ALPHA
+    return frame.sort_values(["difference", "p_value"], ascending=[False, True])
+
+
+def papi_correlations(data: pd.DataFrame) -> pd.DataFrame:
+    """Point-biserial correlation of each PAPI scale with top/mid, scales median-filled."""
+    scales = [column for column in data.columns if column != "top"]
+    data = data.dropna(subset=scales, how="all")
+    results = {}
+    for scale in scales:
+        values = data[scale].fillna(data[scale].median())
+        if len(values) > 2 and values.nunique() > 1 and data["top"].nunique() > 1:
+            r, p_value = pointbiserialr(data["top"].astype(int), values)
+        else:
+            r, p_value = np.nan, np.nan
+        results[scale] = {"statistic": r, "p_value": p_value, "effect": r, "n": len(values)}
+    frame = pd.DataFrame.from_dict(results, orient="index", columns=["statistic", "p_value", "effect", "n"])
+    return frame.rename_axis("scale").sort_values("effect", ascending=False)
+
+
+def strength_test(strengths: pd.DataFrame) -> dict:
+    """Chi-square test of the strength theme counts of top vs mid performers."""
+    counts = pd.crosstab(strengths["theme"], strengths["top"]) if len(strengths) else pd.DataFrame()
+    return _chi_square(counts)
+
+
+def statistic_tasks(prepared: dict) -> dict:
+    """{name: (function, input frame)} of every statistic of one prepared year."""
+    frame = prepared["frame"]
+    tasks = {"tenure": (welch_test, frame[["top", "work_duration_months"]])}
+    for column in PSYCH_COLUMNS:
+        if column in frame:
+            tasks[column] = (welch_test, frame[["top", column]])
+    for column in ["degree_level", "major", "disc"]:
+        tasks[column] = (chi_square_test, frame[["top", column]])
+    tasks["disc_dimensions"] = (disc_dimension_tests, frame[["top", *DISC_DIMENSIONS.values()]])
+    tasks["pillars"] = (pillar_tests, prepared["competencies"])
+    papi_columns = [column for column in frame.columns if column.startswith("Papi_")]
+    if papi_columns:
+        tasks["papi"] = (papi_correlations, frame[["top", *papi_columns]])
+    tasks["strengths"] = (strength_test, prepared["strengths"])
+    return tasks
+
+
+def _year_reports(report: pd.DataFrame) -> dict:
+    if "year" not in report:
+        return {None: report}
+    years = pd.to_numeric(report["year"], errors="coerce")
+    return {int(year): group for year, group in report.groupby(years, sort=True)}
+
+
+def run_statistics(report: pd.DataFrame, cache: StageCache = None, max_workers: int = None):
+    """({year: {statistic: result}}, [(year, stage) computed]) for a (multi-year) report.
+
+    A report without a ``year`` column is one group keyed None. Rows are
+    hashed in employee_id order, so a re-sorted export reuses the cache.
+    """
+    cache = cache or StageCache()
+    computed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        prepared = {}
+        for year, raw in _year_reports(report).items():
+            if "employee_id" in raw:
+                raw = raw.sort_values("employee_id", kind="stable")
+            raw = raw.reset_index(drop=True)
+            prepared[year] = pool.submit(cache.get_or_compute, "prepare", frame_digest(raw),
+                                         lambda raw=raw: prepare_report(raw))
+
+        futures = {}
+        for year, future in prepared.items():
+            result, was_computed = future.result()
+            if was_computed:
+                computed.append((year, "prepare"))
+            for name, (function, data) in statistic_tasks(result).items():
+                futures[year, name] = pool.submit(cache.get_or_compute, name, frame_digest(data),
+                                                  lambda function=function, data=data: function(data))
+
+        statistics = {year: {} for year in prepared}
+        for (year, name), future in futures.items():
+            statistics[year][name], was_computed = future.result()
+            if was_computed:
+                computed.append((year, name))
+    return statistics, computed
+
+
+def _evidence(statistics: dict, column_name: str):
+    """(effect, p_value) backing one TV, or (NaN, NaN) when there is none."""
+    for name in ["pillars", "papi"]:
+        table = statistics.get(name)
+        if isinstance(table, pd.DataFrame) and column_name in table.index:
+            row = table.loc[column_name]
+            return row["effect"], row["p_value"]
+    result = statistics.get(TV_STATISTICS.get(column_name))
+    if result is None:
+        return np.nan, np.nan
+    return result["effect"], result["p_value"]
+
+
+def recommend_weights(statistics: dict, structure=TALENT_STRUCTURE, alpha: float = ALPHA):
+    """(weights_config, evidence) for one year's statistics.
+
+    A TV's weight is its effect size on the correlation scale (r for t-tests
+    and PAPI, Cramer's V for categorical tests) when significant at ``alpha``,
+    else 0; numeric TVs scored higher_is_better only count when top
+    performers score higher. TGV weights are the TGV's share of the summed
+    TV weights, as the ``tgv_weights`` the matching query normalizes. With
+    no significant TV the config has no ``tgv_weights`` (plain TGV average).
+    """
+    rows = []
+    for tv_order, tgv_name, tv_name, column_name, data_type, scoring_direction in structure:
+        effect, p_value = _evidence(statistics, column_name)
+        significant = bool(p_value < alpha) if pd.notna(p_value) else False
+        usable = significant and (data_type == "categorical" or scoring_direction != "higher_is_better" or effect > 0)
+        rows.append({
+            "tv_order": tv_order, "tgv_name": tgv_name, "tv_name": tv_name, "effect": effect,
+            "p_value": p_value, "significant": significant, "tv_weight": abs(effect) if usable else 0.0,
+        })
+    evidence = pd.DataFrame(rows).set_index("tv_order")
+
+    tgv_totals = evidence.groupby("tgv_name", sort=False)["tv_weight"].sum()
+    if tgv_totals.sum() <= 0:
+        return {}, evidence
+    tgv_weights = (tgv_totals / tgv_totals.sum()).round(2)
+    return {"tgv_weights": {name: float(weight) for name, weight in tgv_weights.items()}}, evidence
+
+
+def run_pipeline(report: pd.DataFrame, cache: StageCache = None, year=None, max_workers: int = None,
+                 alpha: float = ALPHA) -> dict:
+    """Statistics of every year plus the weight recommendation of ``year`` (default: the latest)."""
+    statistics, computed = run_statistics(report, cache, max_workers)
+    if year is None:
+        year = max((key for key in statistics if key is not None), default=None)
+    if year not in statistics:
+        raise ValueError(f"No rated rows for year {year}")
+    weights_config, evidence = recommend_weights(statistics[year], alpha=alpha)
+    return {
+        "year": year,
+        "statistics": statistics,
+        "weights_config": weights_config,
+        "tv_weights": evidence["tv_weight"].set_axis(evidence["tv_name"]).round(4).to_dict(),
+        "evidence": evidence,
+        "computed": computed,
+    }
+
+
+def read_report(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute the Success Formula statistics and TGV weights.")
+    parser.add_argument("reports", nargs="+", help="employee_report exports (CSV or Parquet), one or more years")
+    parser.add_argument("--year", type=int, help="year to recommend weights for (default: the latest)")
+    parser.add_argument("--cache-dir", default=".success_formula_cache", help="stage cache directory ('' for none)")
+    parser.add_argument("--workers", type=int, help="parallel statistics (default: ThreadPoolExecutor's)")
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--out", help="write the weights_config JSON here")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    report = pd.concat([read_report(path) for path in args.reports], ignore_index=True)
+    cache = StageCache(args.cache_dir or None)
+    result = run_pipeline(report, cache, year=args.year, max_workers=args.workers, alpha=args.alpha)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result["weights_config"], f, indent=2)
+
+    summary = {
+        "year": result["year"],
+        "weights_config": result["weights_config"],
+        "tv_weights": result["tv_weights"],
+        "computed": [f"{year}:{stage}" for year, stage in result["computed"]],
+        "cache_hits": cache.hits,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    print(json.dumps(summary, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
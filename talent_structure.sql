@@ -0,0 +1,96 @@
+-- Talent Variable registry: the single definition of every TV, its TGV, the
+-- employee_features column it reads and how it is scored. The matching
+-- queries (step_2.sql / matching_engine.MATCHING_QUERY) and the in-process
+-- engine all read it. Run after employee_features.sql.
+--
+-- Adding a TV: insert a row here (and add its column to employee_features if
+-- it is new), then refresh employee_scores. No query needs editing.
+CREATE TABLE IF NOT EXISTS talent_structure (
+  tv_id SMALLINT PRIMARY KEY,
+  tgv_name TEXT NOT NULL,
+  tv_name TEXT NOT NULL UNIQUE,
+  column_name TEXT NOT NULL UNIQUE,
+  data_type TEXT NOT NULL CHECK (data_type IN ('numeric', 'categorical')),
+  -- higher_is_better / lower_is_better: capped ratio to the baseline
+  -- exact_match: 100 when equal to the baseline
+  -- at_least: 100 when ranked (talent_ordinal_ranks) at or above the baseline
+  scoring_direction TEXT NOT NULL CHECK (scoring_direction IN ('higher_is_better', 'lower_is_better', 'exact_match', 'at_least'))
+);
+
+-- Education Level is 'at_least' on purpose. The pre-registry queries listed it
+-- as exact_match but scored it in a dedicated D3 < S1 < S2 branch, so a degree
+-- above the baseline's was already a full match. Switching it to exact_match
+-- would score those candidates 0.
+INSERT INTO talent_structure (tv_id, tgv_name, tv_name, column_name, data_type, scoring_direction) VALUES
+  (1, 'Execution Excellence', 'Quality Delivery', 'Quality_Delivery', 'numeric', 'higher_is_better'),
+  (2, 'Execution Excellence', 'Forward Thinking', 'Forward_Thinking', 'numeric', 'higher_is_better'),
+  (3, 'Execution Excellence', 'Team Orientation', 'Team_Orientation', 'numeric', 'higher_is_better'),
+  (4, 'Strategic Impact', 'Commercial Savvy', 'Commercial_Savvy', 'numeric', 'higher_is_better'),
+  (5, 'Strategic Impact', 'Value Creation', 'Value_Creation', 'numeric', 'higher_is_better'),
+  (6, 'Growth & Innovation', 'Growth Drive', 'Growth_Drive', 'numeric', 'higher_is_better'),
+  (7, 'Growth & Innovation', 'Curiosity', 'Curiosity', 'numeric', 'higher_is_better'),
+  (8, 'People Leadership', 'Lead & Inspire', 'Lead_Inspire', 'numeric', 'higher_is_better'),
+  (9, 'People Leadership', 'Social Empathy', 'Social_Empathy', 'numeric', 'higher_is_better'),
+  (10, 'Motivation & Drive', 'Pauli Score', 'Pauli_Score', 'numeric', 'higher_is_better'),
+  (11, 'Cognitive Complexity', 'IQ Score', 'IQ_Score', 'numeric', 'higher_is_better'),
+  (12, 'Cognitive Complexity', 'GTQ Score', 'GTQ_Score', 'numeric', 'higher_is_better'),
+  (13, 'Cognitive Complexity', 'TIKI Score', 'TIKI_Score', 'numeric', 'higher_is_better'),
+  (14, 'Demographics', 'Education Level', 'education', 'categorical', 'at_least'),
+  (15, 'Demographics', 'DISC Profile', 'disc', 'categorical', 'exact_match'),
+  (16, 'PAPI Alignment', 'Papi_P', 'Papi_P', 'numeric', 'higher_is_better'),
+  (17, 'PAPI Alignment', 'Papi_W', 'Papi_W', 'numeric', 'higher_is_better')
+ON CONFLICT (tv_id) DO UPDATE SET
+  tgv_name = EXCLUDED.tgv_name,
+  tv_name = EXCLUDED.tv_name,
+  column_name = EXCLUDED.column_name,
+  data_type = EXCLUDED.data_type,
+  scoring_direction = EXCLUDED.scoring_direction;
+
+-- Ladder for 'at_least' TVs; values not listed rank 0 (D3 < S1 < S2)
+CREATE TABLE IF NOT EXISTS talent_ordinal_ranks (
+  tv_id SMALLINT NOT NULL REFERENCES talent_structure (tv_id),
+  value TEXT NOT NULL,
+  rank SMALLINT NOT NULL,
+  PRIMARY KEY (tv_id, value)
+);
+
+INSERT INTO talent_ordinal_ranks (tv_id, value, rank) VALUES
+  (14, 'D3', 3),
+  (14, 'S1', 4),
+  (14, 'S2', 5)
+ON CONFLICT (tv_id, value) DO UPDATE SET rank = EXCLUDED.rank;
+
+-- Long (employee, tv_id, value) layout of employee_features, driven by the
+-- registry: columns are matched by name, so there is no per-column CASE.
+-- Employees without a value for a TV have no row for it.
+CREATE MATERIALIZED VIEW IF NOT EXISTS employee_scores AS
+SELECT
+  ef.employee_id,
+  ts.tv_id,
+  kv.value AS score_text,
+  CASE WHEN ts.data_type = 'numeric' THEN kv.value::NUMERIC END AS score_numeric
+FROM
+  employee_features ef
+CROSS JOIN LATERAL
+  jsonb_each_text(to_jsonb(ef)) AS kv(key, value)
+INNER JOIN
+  talent_structure ts
+ON
+  kv.key = LOWER(ts.column_name)
+WHERE
+  kv.value IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS employee_scores_employee_tv_idx ON employee_scores (employee_id, tv_id);
+CREATE INDEX IF NOT EXISTS employee_scores_tv_idx ON employee_scores (tv_id);
+
+-- Registry edits bump the data version (data_version.sql)
+DROP TRIGGER IF EXISTS talent_structure_version ON talent_structure;
+CREATE TRIGGER talent_structure_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON talent_structure
+  FOR EACH STATEMENT EXECUTE FUNCTION log_data_change();
+DROP TRIGGER IF EXISTS talent_ordinal_ranks_version ON talent_ordinal_ranks;
+CREATE TRIGGER talent_ordinal_ranks_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON talent_ordinal_ranks
+  FOR EACH STATEMENT EXECUTE FUNCTION log_data_change();
+
+-- Run after every REFRESH of employee_features and after editing the registry
+REFRESH MATERIALIZED VIEW CONCURRENTLY employee_scores;
+INSERT INTO data_refreshes (source) VALUES ('employee_scores');
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import feature_statements, generate_hr_data, load_tables, pick_vacancy  # noqa: E402
+from matching_engine import MatchingEngine, load_feature_matrix  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def hr_tables():
+    return generate_hr_data(800, seed=3)
+
+
+@pytest.fixture(scope="session")
+def feature_db(hr_tables, tmp_path_factory):
+    """SQLite database with the HR tables and the employee_features table."""
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('db') / 'hr.sqlite3'}")
+    load_tables(engine, hr_tables)
+    build, _ = feature_statements("sqlite")
+    with engine.begin() as conn:
+        for statement in build:
+            conn.exec_driver_sql(statement)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def matching_engine(feature_db):
+    return MatchingEngine(load_feature_matrix(feature_db))
+
+
+@pytest.fixture(scope="session")
+def vacancy(hr_tables):
+    """(role_name, job_level, benchmark_ids) of the largest position."""
+    return pick_vacancy(hr_tables, 5, seed=3)
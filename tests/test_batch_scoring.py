@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_scoring import load_vacancy_specs, score_vacancies
+from benchmark import REWEIGHTED_CONFIG, WEIGHTS_CONFIG, pick_vacancy
+
+
+@pytest.fixture(scope="module")
+def specs(hr_tables, vacancy):
+    role_name, job_level, benchmark_ids = vacancy
+    other_role = next(name for name in hr_tables["dim_positions"]["name"] if name != role_name)
+    _, _, other_ids = pick_vacancy(hr_tables, 4, seed=7)
+    return [
+        {"job_vacancy_id": "a", "role_name": role_name, "job_level": job_level, "benchmark_ids": benchmark_ids,
+         "weights_config": WEIGHTS_CONFIG},
+        # Same role and benchmarks in another order, other weights: re-weighted, not re-scored
+        {"job_vacancy_id": "b", "role_name": role_name.upper(), "job_level": job_level,
+         "benchmark_ids": benchmark_ids[::-1], "weights_config": REWEIGHTED_CONFIG},
+        {"job_vacancy_id": "c", "role_name": role_name, "job_level": job_level, "benchmark_ids": benchmark_ids[:3],
+         "weights_config": None},
+        {"job_vacancy_id": "d", "role_name": other_role, "job_level": job_level, "benchmark_ids": other_ids,
+         "weights_config": WEIGHTS_CONFIG},
+    ]
+
+
+def test_batch_equals_separate_runs(matching_engine, specs):
+    results = score_vacancies(matching_engine, specs)
+    assert list(results) == ["a", "b", "c", "d"]
+    assert not any(result.empty for result in results.values())
+    for spec in specs:
+        expected = matching_engine.match(spec["role_name"], spec["benchmark_ids"], spec["weights_config"]).ranking()
+        actual = results[spec["job_vacancy_id"]].ranking()
+        assert actual["employee_id"].tolist() == expected["employee_id"].tolist()
+        np.testing.assert_array_equal(actual["final_match_rate"], expected["final_match_rate"])
+    assert results["a"].weights_config == WEIGHTS_CONFIG and results["b"].weights_config == REWEIGHTED_CONFIG
+    assert results["a"].employees["final_match_rate"].tolist() != results["b"].employees["final_match_rate"].tolist()
+
+
+def test_spec_files(tmp_path):
+    records = [
+        {"job_vacancy_id": "v1", "role_name": " Data Analyst ", "job_level": "III",
+         "benchmark_ids": ["EMP1", "EMP2", "EMP1"], "weights_config": {"tgv_weights": {"Strategic Impact": 1}}},
+        {"role_name": "HR Officer", "job_level": None, "benchmark_ids": "EMP3, emp4 EMP5"},
+    ]
+    expected = [
+        {"job_vacancy_id": "v1", "role_name": "Data Analyst", "job_level": "III", "benchmark_ids": ["EMP1", "EMP2"],
+         "weights_config": {"tgv_weights": {"Strategic Impact": 1}}},
+        {"job_vacancy_id": "vacancy_002", "role_name": "HR Officer", "job_level": "",
+         "benchmark_ids": ["EMP3", "emp4", "EMP5"], "weights_config": None},
+    ]
+
+    json_path = tmp_path / "specs.json"
+    json_path.write_text(json.dumps(records))
+    jsonl_path = tmp_path / "specs.jsonl"
+    jsonl_path.write_text("\n".join(json.dumps(record) for record in records) + "\n\n")
+    csv_path = tmp_path / "specs.csv"
+    pd.DataFrame([
+        dict(record, benchmark_ids=",".join(record["benchmark_ids"]) if isinstance(record["benchmark_ids"], list)
+             else record["benchmark_ids"], weights_config=json.dumps(record["weights_config"])
+             if "weights_config" in record else "")
+        for record in records
+    ]).to_csv(csv_path, index=False)
+
+    for path in (json_path, jsonl_path, csv_path):
+        assert load_vacancy_specs(str(path)) == expected
+
+    json_path.write_text(json.dumps([records[0], records[0]]))
+    with pytest.raises(ValueError, match="Duplicate job_vacancy_id"):
+        load_vacancy_specs(str(json_path))
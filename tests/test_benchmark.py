@@ -0,0 +1,38 @@
+import pytest
+
+from benchmark import VERSION_SQL, feature_statements, split_statements
+
+
+def test_dollar_quoted_bodies_stay_whole():
+    script = """
+    -- header; not a statement
+    CREATE TABLE t (note TEXT DEFAULT 'a;b -- c');
+    CREATE FUNCTION f() RETURNS TRIGGER AS $$
+    BEGIN
+      INSERT INTO t VALUES ('x;'); -- inside the body
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    DO $body$ BEGIN PERFORM 1; END $body$
+    """
+    statements = split_statements(script)
+    assert len(statements) == 3
+    assert statements[0] == "CREATE TABLE t (note TEXT DEFAULT 'a;b -- c')"
+    assert statements[1].startswith("CREATE FUNCTION f()") and statements[1].endswith("$$ LANGUAGE plpgsql")
+    # Bodies are opaque: their semicolons and comments are kept
+    assert "RETURN NULL;" in statements[1] and "-- inside the body" in statements[1]
+    assert statements[2] == "DO $body$ BEGIN PERFORM 1; END $body$"
+
+    with pytest.raises(ValueError, match="Unterminated"):
+        split_statements("CREATE FUNCTION f() AS $$ BEGIN")
+
+
+def test_postgres_build_runs_the_version_log_first():
+    build, refresh = feature_statements("postgresql")
+    with open(VERSION_SQL, encoding="utf-8") as f:
+        version_statements = split_statements(f.read())
+    assert build[:len(version_statements)] == version_statements
+    function = next(statement for statement in build if "FUNCTION log_data_change" in statement)
+    assert function.endswith("$$ LANGUAGE plpgsql") and "END;" in function
+    assert refresh and all(statement.upper().startswith(("REFRESH", "INSERT INTO DATA_REFRESHES"))
+                           for statement in refresh)
@@ -0,0 +1,60 @@
+import os
+import re
+
+import pytest
+from sqlalchemy import create_engine
+
+from benchmark_cohorts import REFRESH_STATEMENTS, cohorts_stale
+
+COHORTS_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark_cohorts.sql")
+
+
+@pytest.fixture
+def version_db(tmp_path):
+    """SQLite stand-in for the refresh log and the cohort version tables."""
+    with open(COHORTS_SQL, encoding="utf-8") as f:
+        sources_view = re.search(r"CREATE OR REPLACE VIEW benchmark_cohort_sources AS.*?;", f.read(), re.DOTALL).group(0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'versions.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE data_refreshes (version INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL)")
+        conn.exec_driver_sql(sources_view.replace("CREATE OR REPLACE VIEW", "CREATE VIEW"))
+        conn.exec_driver_sql(
+            "CREATE TABLE benchmark_cohort_refreshes "
+            "(refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, source_version BIGINT NOT NULL)"
+        )
+    yield engine
+    engine.dispose()
+
+
+def log_refresh(engine, source):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"INSERT INTO data_refreshes (source) VALUES ('{source}')")
+
+
+def record_cohort_refresh(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(REFRESH_STATEMENTS[-1])
+
+
+def test_cohorts_are_stale_until_refreshed(version_db):
+    assert cohorts_stale(version_db)
+    log_refresh(version_db, "employee_features")
+    record_cohort_refresh(version_db)
+    assert not cohorts_stale(version_db)
+
+
+@pytest.mark.parametrize("source", ["employee_scores", "talent_structure", "performance_yearly", "benchmark_cohorts"])
+def test_source_change_makes_cohorts_stale(version_db, source):
+    log_refresh(version_db, "employee_features")
+    record_cohort_refresh(version_db)
+    log_refresh(version_db, source)
+    assert cohorts_stale(version_db)
+    record_cohort_refresh(version_db)
+    assert not cohorts_stale(version_db)
+
+
+def test_unrelated_source_keeps_cohorts_fresh(version_db):
+    log_refresh(version_db, "employee_features")
+    record_cohort_refresh(version_db)
+    log_refresh(version_db, "employee_report_snapshot")
+    assert not cohorts_stale(version_db)
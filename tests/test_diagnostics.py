@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from diagnostics import QueryPlan, RunTrace, explain_analyze, frame_bytes, logger
+from matching_engine import FEATURE_QUERY, MatchingEngine
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+PLAN = """Sort  (cost=10.5..10.8 rows=120 width=64) (actual time=0.210..0.230 rows=118 loops=1)
+  Buffers: shared hit=42 read=7, temp read=3
+  ->  Seq Scan on employee_features  (actual time=0.010..0.090 rows=118 loops=1)
+        Buffers: shared hit=40 read=7
+Planning Time: 0.125 ms
+Execution Time: 0.412 ms"""
+
+
+def test_phases_nest_and_time_their_blocks(feature_db):
+    trace = RunTrace(session_id="s1", role_name="Data Analyst")
+    with trace.phase("load", source="sqlite") as outer:
+        with trace.phase("sql_read") as phase:
+            features = pd.read_sql(FEATURE_QUERY, feature_db)
+            phase.update(rows=len(features), bytes=frame_bytes(features))
+        with trace.phase("engine_init"):
+            MatchingEngine(features)
+            time.sleep(0.01)
+        outer["rows"] = len(features)
+
+    # Inner phases finish (and are recorded) first; the outer one covers both
+    assert [record["phase"] for record in trace.phases] == ["sql_read", "engine_init", "load"]
+    sql_read, engine_init, load = trace.phases
+    assert sql_read["rows"] == len(features) and sql_read["bytes"] == frame_bytes(features) > 0
+    assert engine_init["rows"] is None and engine_init["seconds"] >= 0.01
+    assert load["source"] == "sqlite" and load["rows"] == len(features)
+    # Each record is rounded to the microsecond
+    assert load["seconds"] >= sql_read["seconds"] + engine_init["seconds"] - 2e-6
+
+    frame = trace.to_frame()
+    assert frame["phase"].tolist() == ["sql_read", "engine_init", "load"]
+    assert str(frame["rows"].dtype) == "Int64" and frame["rows"].isna().tolist() == [False, True, False]
+    assert frame["share"].between(0, 1).all()
+
+
+def test_phase_is_recorded_when_the_block_fails():
+    trace = RunTrace()
+    with pytest.raises(RuntimeError):
+        with trace.phase("sql_read") as phase:
+            phase["rows"] = 3
+            raise RuntimeError("connection lost")
+    assert trace.phases == [{"phase": "sql_read", "seconds": trace.phases[0]["seconds"], "rows": 3, "bytes": None}]
+
+
+def test_laps_count_from_the_previous_phase_or_lap():
+    trace = RunTrace()
+    with trace.phase("score"):
+        time.sleep(0.05)
+    time.sleep(0.01)
+    trace.lap("ranking_table", rows=10)
+    trace.lap("charts", nbytes=2048, section="radar")
+
+    score, ranking_table, charts = trace.phases
+    assert 0.01 <= ranking_table["seconds"] < score["seconds"]
+    assert ranking_table["rows"] == 10
+    assert charts["seconds"] < ranking_table["seconds"]
+    assert charts["bytes"] == 2048 and charts["section"] == "radar"
+
+
+def test_log_writes_one_json_line(monkeypatch):
+    lines = []
+    monkeypatch.setattr(logger, "info", lines.append)
+    trace = RunTrace(session_id="s1", source="engine")
+    with trace.phase("engine_match") as phase:
+        phase["rows"] = 5
+    trace.query_plan = QueryPlan(PLAN.splitlines())
+    trace.log()
+
+    record = json.loads(lines[0])
+    assert record["event"] == "dashboard_run" and record["session_id"] == "s1" and record["source"] == "engine"
+    assert record["run_id"] == trace.run_id and record["phases"][0]["rows"] == 5
+    assert record["query_plan"] == {"planning_ms": 0.125, "execution_ms": 0.412, "shared_hit_blocks": 42,
+                                    "shared_read_blocks": 7}
+    assert logger.level == logging.INFO and not logger.propagate
+
+
+@pytest.mark.skipif(not (DATABASE_URL or "").startswith("postgresql"),
+                    reason="EXPLAIN (ANALYZE, BUFFERS) needs Postgres; set TEST_DATABASE_URL")
+def test_explain_analyze_on_postgres():
+    engine = create_engine(DATABASE_URL)
+    try:
+        plan = explain_analyze(engine, "SELECT g FROM generate_series(1, %(n)s) AS g ORDER BY g DESC;", {"n": 1000})
+    finally:
+        engine.dispose()
+    summary = plan.summary()
+    assert plan.lines and summary["execution_ms"] is not None and summary["planning_ms"] is not None
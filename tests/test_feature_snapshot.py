@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from feature_snapshot import load_matching_engine, read_feature_snapshot, write_feature_snapshot
+from matching_engine import ORDINAL_RANKS, TALENT_STRUCTURE, MatchingEngine, load_feature_matrix
+
+
+def test_snapshot_engine_scores_on_the_mapped_matrix(feature_db, matching_engine, vacancy, tmp_path):
+    write_feature_snapshot(load_feature_matrix(feature_db), TALENT_STRUCTURE, ORDINAL_RANKS, "v1", str(tmp_path))
+    snapshot_engine, source = load_matching_engine(None, str(tmp_path), "v1")
+    assert source == "snapshot"
+
+    # A read-only view on the file, not a copy
+    numeric_values = snapshot_engine._numeric_values
+    assert not numeric_values.flags.owndata and not numeric_values.flags.writeable
+    np.testing.assert_array_equal(numeric_values, matching_engine._numeric_values)
+
+    role_name, _, benchmark_ids = vacancy
+    pd.testing.assert_frame_equal(snapshot_engine.match(role_name, benchmark_ids).to_frame(),
+                                  matching_engine.match(role_name, benchmark_ids).to_frame())
+
+
+def test_snapshot_frame_round_trip(feature_db, matching_engine, vacancy, tmp_path):
+    path = write_feature_snapshot(load_feature_matrix(feature_db), TALENT_STRUCTURE, ORDINAL_RANKS, "v1",
+                                  str(tmp_path))
+    features, structure, ordinal_ranks, metadata = read_feature_snapshot(path)
+    assert metadata["data_version"] == "v1"
+    role_name, _, benchmark_ids = vacancy
+    pd.testing.assert_frame_equal(MatchingEngine(features, structure, ordinal_ranks).match(role_name, benchmark_ids)
+                                  .to_frame(), matching_engine.match(role_name, benchmark_ids).to_frame())
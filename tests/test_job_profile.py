@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import job_profile
+from job_profile import MODELS, ProfileCache, race_job_profile, submit_job_profile
+
+FAST, SLOW = MODELS[1][0], MODELS[0][0]
+PROFILE = "Job Requirements:\n- {model}"
+
+
+@pytest.fixture
+def openrouter():
+    """Mock OpenRouter; ``replies[model]`` is (delay seconds, status), ``gate`` holds every reply."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    server.daemon_threads = True
+    server.hits = []
+    server.replies = {}
+    server.gate = threading.Event()
+    server.gate.set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            model = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["model"]
+            server.hits.append(model)
+            delay, status = server.replies.get(model, (0, 200))
+            server.gate.wait(10)
+            time.sleep(delay)
+            if status == 200:
+                body = {"choices": [{"message": {"content": PROFILE.format(model=model)}}]}
+            else:
+                body = {"error": {"message": "rate limited"}}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server.RequestHandlerClass = Handler
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+    yield server
+    server.gate.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ProfileCache(str(tmp_path / "profiles.sqlite3"))
+
+
+def test_race_returns_the_faster_valid_profile(openrouter, cache):
+    openrouter.replies = {SLOW: (1.0, 200), FAST: (0, 200)}
+    started = time.monotonic()
+    profile = race_job_profile("Data Analyst", "III", "Reporting", ["k1", "k2"], cache=cache, url=openrouter.url)
+    assert profile == PROFILE.format(model=FAST)
+    assert time.monotonic() - started < 1.0
+    assert cache.get(ProfileCache.make_key("Data Analyst", "III", "Reporting", FAST)) == profile
+    assert cache.get(ProfileCache.make_key("Data Analyst", "III", "Reporting", SLOW)) is None
+
+    # A fast error does not win the race over a slower valid answer
+    openrouter.replies = {SLOW: (0.2, 200), FAST: (0, 429)}
+    profile = race_job_profile("Data Analyst", "IV", "Reporting", ["k1", "k2"], cache=cache, url=openrouter.url)
+    assert profile == PROFILE.format(model=SLOW)
+
+
+def test_errors_are_never_cached(openrouter, cache):
+    openrouter.replies = {SLOW: (0, 500), FAST: (0, 429)}
+    profile = race_job_profile("Data Analyst", "III", "Reporting", ["k1", "k2"], cache=cache, url=openrouter.url)
+    assert profile.startswith("AI error:") and "429" in profile and "500" in profile
+    assert len(cache) == 0
+
+
+def test_identical_submissions_share_one_call(openrouter, cache):
+    openrouter.gate.clear()
+    first = submit_job_profile("HR Officer", "II", "Payroll", ["k1", "k2"], cache=cache, url=openrouter.url)
+    second = submit_job_profile(" hr  officer ", "ii", "Payroll", ["k1", "k2"], cache=cache, url=openrouter.url)
+    assert second is first and not first.done()
+    openrouter.gate.set()
+    assert first.result(10) == PROFILE.format(model=SLOW)
+    assert openrouter.hits == [SLOW]
+
+    # Finished profiles come back from the cache as completed Futures, without a request
+    cached = submit_job_profile("HR Officer", "II", "Payroll", ["k1", "k2"], cache=cache, url=openrouter.url)
+    assert cached is not first and cached.done()
+    assert cached.result() == first.result()
+    assert openrouter.hits == [SLOW]
+
+
+def test_cache_expiry_and_lru_eviction(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(job_profile, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = ProfileCache(str(tmp_path / "profiles.sqlite3"), max_entries=2, ttl_seconds=10)
+
+    cache.set("a", "profile a")
+    cache.set("b", "profile b")
+    assert cache.get("a") == "profile a"
+    cache.set("c", "profile c")
+    # "b" was used least recently
+    assert len(cache) == 2 and cache.get("b") is None
+    assert cache.get("a") == "profile a" and cache.get("c") == "profile c"
+
+    clock = iter(range(1011, 2000))
+    assert cache.get("a") is None
+    assert cache.get("c") == "profile c"
+    cache.set("d", "profile d")
+    assert len(cache) == 2
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from matching_engine import MatchResult, load_grades
+
+
+def test_education_scores_at_least_the_baseline_degree(matching_engine, vacancy):
+    # Same D3 < S1 < S2 ladder as the pre-registry 'Education Level' branch:
+    # a higher degree than the baseline is a full match
+    role_name, _, _ = vacancy
+    baselines = matching_engine.stored_baselines(pd.DataFrame({
+        "tv_name": ["Education Level", "IQ Score"],
+        "baseline_score": ["S1", "100"],
+    }))
+    result = matching_engine.match(role_name, [], baselines=baselines)
+    education = result.employees["education"].astype(object).to_numpy()
+    rates = result.tv_rates[:, list(result.tvs["tv_name"]).index("Education Level")]
+
+    expected = {"D3": 0.0, "S1": 100.0, "S2": 100.0}
+    for degree, rate in expected.items():
+        assert degree in education
+        assert np.all(rates[education == degree] == rate)
+
+
+def test_unscored_employees_rank_last(matching_engine, vacancy):
+    # Same order as the SQL queries' final_match_rate DESC NULLS LAST
+    role_name, _, benchmark_ids = vacancy
+    result = matching_engine.match(role_name, benchmark_ids)
+    tgv_rates = result.tgv_rates.copy()
+    tgv_rates[0] = np.nan
+    result = MatchResult(
+        result.role_name, result.employees.drop(columns="final_match_rate"), result.tvs, result.tv_rates,
+        result.user_scores, result.tgv_names, tgv_rates, result.weights_config,
+    )
+    unscored = result.employees["employee_id"].iloc[0]
+
+    ranking = result.ranking()
+    assert ranking["employee_id"].iloc[-1] == unscored
+    assert ranking["final_match_rate"].iloc[:-1].notna().all()
+    assert unscored not in set(result.top(10).employees["employee_id"])
+
+    frame = result.to_frame()
+    rates = frame["final_match_rate"]
+    assert rates.isna().any()
+    assert rates.isna().to_numpy().argmax() == rates.notna().sum()
+
+
+def test_grade_filter_options_select_candidates(matching_engine, feature_db, vacancy):
+    # The dashboard offers the grades stored in employee_features, not the job levels
+    role_name, _, benchmark_ids = vacancy
+    grades = load_grades(feature_db)
+    assert grades == matching_engine.grades()
+    assert not {"Entry", "Middle", "Senior"} & set(grades)
+
+    pool = matching_engine.eligible_rows(role_name)
+    for grade in grades:
+        result = matching_engine.match(role_name, benchmark_ids, grades=[grade])
+        assert len(result.employees) > 0
+        assert set(result.employees["grade"].astype(str)) == {grade}
+    assert sum(len(matching_engine.eligible_rows(role_name, grades=[grade])) for grade in grades) == len(pool)
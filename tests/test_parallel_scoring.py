@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from benchmark import WEIGHTS_CONFIG
+from parallel_scoring import ShardedScorer
+
+
+@pytest.fixture(scope="module")
+def scorer(matching_engine):
+    with ShardedScorer(matching_engine, workers=2, shard_size=64) as scorer:
+        yield scorer
+
+
+def assert_same_result(actual, expected):
+    ranked, expected_ranked = actual.ranking(), expected.ranking()
+    assert ranked["employee_id"].tolist() == expected_ranked["employee_id"].tolist()
+    np.testing.assert_array_equal(ranked["final_match_rate"], expected_ranked["final_match_rate"])
+    np.testing.assert_array_equal(actual.tv_rates[ranked.index], expected.tv_rates[expected_ranked.index])
+    assert actual.tvs.equals(expected.tvs)
+
+
+@pytest.mark.parametrize("top_k", [10, None])
+def test_shards_match_a_single_process(matching_engine, scorer, vacancy, top_k):
+    role_name, _, benchmark_ids = vacancy
+    assert len(scorer.shards) > 2
+    for weights in (None, WEIGHTS_CONFIG):
+        expected = matching_engine.match(role_name, benchmark_ids, weights).top(top_k)
+        actual = scorer.match(role_name, benchmark_ids, weights, top_k=top_k)
+        assert_same_result(actual, expected)
+
+
+@pytest.mark.parametrize("top_k", [5, None])
+def test_shards_apply_the_pool_filters(matching_engine, scorer, vacancy, top_k):
+    role_name, _, benchmark_ids = vacancy
+    pool = matching_engine.match(role_name, benchmark_ids).employees
+    directorates = [pool["directorate"].value_counts().index[0]]
+    grades = sorted(pool["grade"].dropna().unique())[:2]
+
+    expected = matching_engine.match(role_name, benchmark_ids, directorates=directorates, grades=grades).top(top_k)
+    actual = scorer.match(role_name, benchmark_ids, top_k=top_k, directorates=directorates, grades=grades)
+    assert 0 < len(expected.employees) < len(pool)
+    assert set(actual.employees["directorate"]) == set(directorates)
+    assert set(actual.employees["grade"]) <= set(grades)
+    assert_same_result(actual, expected)
@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from report_loader import (
+    decode_json_column, expand_competencies, expand_report, expand_report_chunks, strength_themes,
+    write_report_parquet,
+)
+
+
+def competencies(scores: dict) -> str:
+    return json.dumps([{"pillar": pillar, "score": score} for pillar, score in scores.items()])
+
+
+@pytest.fixture
+def report():
+    return pd.DataFrame({
+        "employee_id": ["E1", "E2", "E3", "E4", "E5", "E6"],
+        "competencies": [
+            competencies({"Curiosity": 4, "Growth & Drive": 3}),
+            "[{'pillar': 'Curiosity', 'score': 2}]",
+            None,
+            "[{'pillar': 'Curiosity', 'score': 5}",
+            competencies({"Growth & Drive": 5}),
+            "",
+        ],
+        "papi_data": [
+            json.dumps([{"scale_code": "Papi_P", "score": 7}]),
+            json.dumps([{"scale_code": "Papi_W", "score": 3}]),
+            json.dumps([{"scale_code": "Papi_P", "score": 6}, {"scale_code": "Papi_W", "score": 4}]),
+            None,
+            "12",
+            json.dumps([{"scale_code": "Papi_P", "score": 1}]),
+        ],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+
+def test_decode_reports_malformed_rows(report):
+    decoded, malformed = decode_json_column(report["competencies"])
+    assert decoded[11] == [{"pillar": "Curiosity", "score": 2}]
+    assert decoded[12] is None and decoded[15] is None
+    assert list(malformed[malformed].index) == [13]
+
+    _, malformed = decode_json_column(report["papi_data"])
+    assert list(malformed[malformed].index) == [14]
+
+    with pytest.raises(ValueError, match="first at index 13"):
+        decode_json_column(report["competencies"], errors="raise")
+
+
+def test_rows_cannot_borrow_text_from_their_neighbours():
+    # Joined, these three malformed rows would parse as three valid values
+    values = pd.Series(['[{"a": 2}', '{"a": 3}]', '{"a": 5}, {"a": 6}', '[{"a": 7}]'])
+    decoded, malformed = decode_json_column(values)
+    assert malformed.tolist() == [True, True, True, False]
+    assert decoded.tolist() == [None, None, None, [{"a": 7}]]
+    with pytest.raises(ValueError, match="3 malformed row"):
+        decode_json_column(values, errors="raise")
+
+
+def test_expand_competencies(report):
+    wide = expand_competencies(report["competencies"], clean_names=True)
+    assert list(wide.columns) == ["Curiosity", "Growth_and_Drive"]
+    assert list(wide.index) == list(report.index)
+    np.testing.assert_array_equal(wide["Curiosity"].to_numpy(), [4, 2, np.nan, np.nan, np.nan, np.nan])
+    np.testing.assert_array_equal(wide["Growth_and_Drive"].to_numpy(), [3, np.nan, np.nan, np.nan, 5, np.nan])
+    assert wide.attrs["malformed"] == [13]
+
+
+def test_first_score_of_a_key_wins():
+    wide = expand_competencies([json.dumps([{"pillar": "Curiosity", "score": None},
+                                            {"pillar": "Curiosity", "score": 3},
+                                            {"pillar": "Curiosity", "score": 5}])])
+    assert wide.loc[0, "Curiosity"] == 3
+
+
+def test_chunked_parquet_round_trip(report, tmp_path):
+    path = str(tmp_path / "report.parquet")
+    chunks = [report.iloc[:3], report.iloc[3:]]
+    summary = write_report_parquet(chunks, path)
+
+    expected = expand_report(report).reset_index(drop=True)
+    actual = pd.read_parquet(path)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    assert summary == {"rows": len(report), "malformed": {"competencies": [13], "papi_data": [14]}}
+
+
+def test_chunks_reject_keys_outside_the_first_columns(report):
+    chunks = expand_report_chunks([report.iloc[1:2], report.iloc[:1]])
+    next(chunks)
+    with pytest.raises(ValueError, match="Growth_and_Drive"):
+        next(chunks)
+
+    frames = list(expand_report_chunks([report.iloc[1:2], report.iloc[:1]],
+                                       competency_columns=["Curiosity", "Growth_and_Drive"],
+                                       papi_columns=["Papi_P", "Papi_W"]))
+    assert frames[1].loc[10, "Growth_and_Drive"] == 3
+
+
+def test_strength_themes_from_text_and_json():
+    themes = strength_themes(pd.Series([
+        "Achiever, Learner",
+        json.dumps([{"strengh": "Focus", "rank": 2}, {"strengh": " ", "rank": 3}]),
+        "[not json",
+        None,
+    ]))
+    assert themes[["row", "theme", "rank"]].values.tolist() == [[0, "Achiever", 1.0], [0, "Learner", 2.0],
+                                                                [1, "Focus", 2.0]]
+    assert themes.attrs["malformed"] == [2]
@@ -0,0 +1,42 @@
+import json
+
+from result_cache import make_result_key
+
+WEIGHTS = {"tgv_weights": {"Cognitive Complexity": 0.4, "Strategic Impact": 0.6}}
+
+
+def key(**overrides):
+    args = dict(role_name="Data Analyst", job_level="III", benchmark_ids=["EMP2", "EMP1"], weights_config=WEIGHTS,
+                data_version="7", directorates=["Finance", "Sales"], grades=["IV", "III"])
+    args.update(overrides)
+    return make_result_key(**args)
+
+
+def test_equivalent_runs_share_a_key():
+    reordered_weights = {"tgv_weights": {"Strategic Impact": 0.6, "Cognitive Complexity": 0.4}}
+    assert key(weights_config=reordered_weights) == key()
+    assert key(weights_config=json.dumps(reordered_weights)) == key()
+    assert key(benchmark_ids=["EMP1", " EMP2", "EMP1"]) == key()
+    assert key(directorates=["Sales", "Finance", "Sales"], grades=("III", "IV")) == key()
+    assert key(role_name=" Data Analyst ", job_level="III ") == key()
+
+
+def test_different_runs_get_different_keys():
+    keys = {
+        key(),
+        key(weights_config={"tgv_weights": {"Cognitive Complexity": 0.6, "Strategic Impact": 0.4}}),
+        key(weights_config=None),
+        key(benchmark_ids=["EMP1"]),
+        key(data_version="8"),
+        key(directorates=None),
+        key(directorates=["Finance"]),
+        key(grades=None),
+        key(cohort="a1b2c3"),
+    }
+    assert len(keys) == 9
+
+
+def test_unset_filters_leave_older_keys_unchanged():
+    assert key(directorates=None, grades=None, cohort=None) == make_result_key(
+        "Data Analyst", "III", ["EMP1", "EMP2"], WEIGHTS, "7"
+    )
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matching_engine import RESULT_COLUMNS, MatchResult
+from result_export import export_file, iter_export, result_chunks, result_row_count
+
+
+@pytest.fixture(scope="module")
+def result(matching_engine, vacancy):
+    """A run whose first two employees have no final rate."""
+    role_name, _, benchmark_ids = vacancy
+    result = matching_engine.match(role_name, benchmark_ids)
+    tgv_rates = result.tgv_rates.copy()
+    tgv_rates[:2] = np.nan
+    return MatchResult(
+        result.role_name, result.employees.drop(columns="final_match_rate"), result.tvs, result.tv_rates,
+        result.user_scores, result.tgv_names, tgv_rates, result.weights_config,
+    )
+
+
+def frame_order(frame: pd.DataFrame) -> pd.DataFrame:
+    """``to_frame`` order of concatenated blocks; ties then keep their block order."""
+    return frame.sort_values(["final_match_rate", "tgv_name", "tv_name"], ascending=[False, True, True],
+                             na_position="last", kind="mergesort").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 37, 500, 10**6])
+def test_chunks_equal_the_one_shot_frame(result, chunk_size):
+    # Tied employees interleave in to_frame, so ties must not straddle blocks
+    assert result.employees["final_match_rate"].dropna().duplicated().any()
+    expected = result.to_frame()
+    chunks = list(result_chunks(result, chunk_size=chunk_size))
+    actual = pd.concat(chunks, ignore_index=True)
+
+    assert len(actual) == len(expected) == result_row_count(result)
+    pd.testing.assert_frame_equal(frame_order(actual), expected)
+    if chunk_size >= 500:
+        # Every tie group fits in a block
+        pd.testing.assert_frame_equal(actual, expected)
+    if chunk_size >= len(expected):
+        assert len(chunks) == 1
+
+
+def test_unrated_employees_split_across_blocks(result):
+    # No weighted TGV in the run: nobody gets a final rate
+    unrated = result.reweight({"tgv_weights": {"Unknown TGV": 1.0}})
+    assert unrated.employees["final_match_rate"].isna().all()
+    chunk_size = 200
+    chunks = list(result_chunks(unrated, chunk_size=chunk_size))
+    assert len(chunks) > 1 and max(len(chunk) for chunk in chunks) <= chunk_size
+    chunk_employees = [set(chunk["employee_id"]) for chunk in chunks]
+    assert sum(map(len, chunk_employees)) == len(set().union(*chunk_employees))
+
+    key = ["employee_id", "tgv_name", "tv_name"]
+    actual = pd.concat(chunks, ignore_index=True).sort_values(key).reset_index(drop=True)
+    expected = unrated.to_frame().sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_export_file_round_trip(result, tmp_path, file_format):
+    path = str(tmp_path / f"ranking.{file_format}")
+    progress = []
+    rows = export_file(result_chunks(result, chunk_size=200), path, progress=progress.append)
+
+    expected = result.to_frame()
+    assert rows == len(expected) and progress[-1] == rows and progress == sorted(progress)
+    actual = pd.read_parquet(path) if file_format == "parquet" else pd.read_csv(path, dtype={"employee_id": str})
+    assert list(actual.columns) == RESULT_COLUMNS
+    np.testing.assert_array_equal(actual["final_match_rate"], expected["final_match_rate"])
+    assert actual["employee_id"].tolist() == expected["employee_id"].astype(str).tolist()
+    assert actual["tv_name"].tolist() == expected["tv_name"].tolist()
+    np.testing.assert_allclose(actual["tv_match_rate"], expected["tv_match_rate"])
+
+
+def test_empty_csv_export_has_a_header():
+    assert b"".join(iter_export(iter([]), "csv")).decode() == ",".join(RESULT_COLUMNS) + "\n"
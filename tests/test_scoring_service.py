@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import scoring_service
+from benchmark_cohorts import BenchmarkCohort
+from scoring_service import ScoringService, create_app
+
+
+@pytest.fixture
+def service(feature_db, matching_engine):
+    """Service on the test engine; scoring blocks until ``release`` is set."""
+    service = ScoringService(feature_db, max_workers=2, max_pending=2, version_ttl=3600)
+    service._version = ("test", time.monotonic())
+    service.release = threading.Event()
+    service.matches = 0
+
+    class GatedEngine:
+        def match(self, *args, **kwargs):
+            service.matches += 1
+            assert service.release.wait(10)
+            return matching_engine.match(*args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(matching_engine, name)
+
+    service.matching_engine = lambda data_version: GatedEngine()
+    yield service
+    service.release.set()
+    service.close()
+
+
+async def call(app, method: str, path: str, payload=None):
+    """(status, JSON body) of one request to the ASGI app."""
+    messages = [{"type": "http.request", "body": json.dumps(payload or {}).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": method, "path": path}, receive, send)
+    body = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return sent[0]["status"], json.loads(body)
+
+
+async def when(condition, then):
+    while not condition():
+        await asyncio.sleep(0.01)
+    then()
+
+
+def test_identical_requests_share_one_run(service, vacancy):
+    role_name, job_level, benchmark_ids = vacancy
+    app = create_app(service)
+    payload = {"role_name": role_name, "job_level": job_level, "benchmark_ids": benchmark_ids}
+    reweighted = dict(payload, weights_config={"tgv_weights": {"Cognitive Complexity": 1.0}})
+
+    async def scenario():
+        requests = [call(app, "POST", "/score_vacancy", body) for body in [payload, payload, reweighted, payload]]
+        release = when(lambda: service.coalesced == 3, service.release.set)
+        return await asyncio.gather(*requests, release)
+
+    *responses, _ = asyncio.run(scenario())
+    assert [status for status, _ in responses] == [200] * 4
+    assert service.matches == 1
+    assert responses[0][1] == responses[1][1] == responses[3][1]
+    # Weights only re-rank the shared run
+    assert responses[2][1]["employees"]["final_match_rate"] != responses[0][1]["employees"]["final_match_rate"]
+    assert sorted(responses[2][1]["employees"]["employee_id"]) == sorted(responses[0][1]["employees"]["employee_id"])
+
+    # Finished runs are served from the cache, not coalesced or scored again
+    status, _ = asyncio.run(call(app, "POST", "/score_vacancy", payload))
+    status_health, health = asyncio.run(call(app, "GET", "/health"))
+    assert (status, status_health) == (200, 200)
+    assert service.matches == 1
+    assert health["coalesced"] == 3 and health["cache_hits"] == 1 and health["in_flight"] == 0
+
+
+def test_busy_service_answers_503(service, vacancy):
+    role_name, job_level, benchmark_ids = vacancy
+    app = create_app(service)
+    payloads = [
+        {"role_name": role_name, "job_level": job_level, "benchmark_ids": benchmark_ids[:n]} for n in (1, 2, 3)
+    ]
+
+    async def scenario():
+        first = [asyncio.ensure_future(call(app, "POST", "/score_vacancy", body)) for body in payloads[:2]]
+        while service.status()["in_flight"] < 2:
+            await asyncio.sleep(0.01)
+        rejected = await call(app, "POST", "/score_vacancy", payloads[2])
+        service.release.set()
+        return rejected, await asyncio.gather(*first)
+
+    (status, body), accepted = asyncio.run(scenario())
+    assert status == 503 and "in flight" in body["error"]
+    assert [status for status, _ in accepted] == [200, 200]
+
+
+def test_cohort_runs_use_the_stored_baselines(service, matching_engine, vacancy, monkeypatch):
+    role_name, job_level, benchmark_ids = vacancy
+    # Stored baselines that differ from what the members would give today
+    stored = matching_engine.compute_baselines(benchmark_ids)[["tv_name", "baseline_score"]]
+    stored.loc[stored["tv_name"] == "IQ Score", "baseline_score"] = "150"
+    cohort = BenchmarkCohort("top_rated", list(benchmark_ids), stored)
+    monkeypatch.setattr(scoring_service, "load_cohort",
+                        lambda engine, name: cohort if name == "top_rated" else None)
+    service.release.set()
+    app = create_app(service)
+
+    status, body = asyncio.run(call(app, "POST", "/score_vacancy",
+                                    {"role_name": role_name, "job_level": job_level, "cohort_name": "top_rated"}))
+    assert status == 200
+    expected = matching_engine.match(role_name, [], baselines=matching_engine.stored_baselines(stored))
+    ranked = expected.ranking()
+    assert body["employees"]["employee_id"] == ranked["employee_id"].tolist()
+    assert body["employees"]["final_match_rate"] == ranked["final_match_rate"].tolist()
+    computed = matching_engine.match(role_name, benchmark_ids).ranking()
+    assert body["employees"]["final_match_rate"] != computed["final_match_rate"].tolist()
+
+    status, body = asyncio.run(call(app, "POST", "/score_vacancy",
+                                    {"role_name": role_name, "job_level": job_level, "cohort_name": "missing"}))
+    assert status == 404 and "no members" in body["error"]
@@ -0,0 +1,95 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pool_views import PoolViews
+from session_store import SessionStore, read_result_file, write_result_file
+
+
+@pytest.fixture(scope="module")
+def results(matching_engine, vacancy):
+    role_name, _, benchmark_ids = vacancy
+    first = matching_engine.match(role_name, benchmark_ids)
+    second = matching_engine.match(role_name, benchmark_ids[:2])
+    return first, second
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(spill_dir=str(tmp_path))
+    yield store
+    store.close()
+
+
+def assert_same_result(actual, expected):
+    pd.testing.assert_frame_equal(actual.to_frame(), expected.to_frame())
+    pd.testing.assert_frame_equal(actual.employees, expected.employees)
+    np.testing.assert_array_equal(actual.tv_rates, expected.tv_rates)
+    np.testing.assert_array_equal(actual.tgv_rates, expected.tgv_rates)
+    np.testing.assert_array_equal(actual.detail, expected.detail)
+    assert actual.weights_config == expected.weights_config
+
+
+def test_result_file_round_trip(results, tmp_path):
+    result = results[0]
+    result = result.reweight({"tgv_weights": {name: 1.0 for name in result.tgv_names}})
+    path = str(tmp_path / "result.arrow")
+    write_result_file(result, path)
+    assert_same_result(read_result_file(path), result)
+
+
+def test_spill_and_reload_within_budget(store, results):
+    first, second = results
+    store.memory_budget = max(first.nbytes, second.nbytes)
+
+    store.put("first", first)
+    store.put("second", second)
+    usage = store.usage()
+    assert (usage["in_memory"], usage["spilled"], usage["spills"]) == (1, 1, 1)
+    assert usage["memory_bytes"] == second.nbytes
+    assert usage["result_bytes"] == {"second": second.nbytes}
+
+    reloaded = store.get("first")
+    assert reloaded is not first
+    assert_same_result(reloaded, first)
+    usage = store.usage()
+    assert usage["reloads"] == 1
+    # The reloaded copy is accounted at its own size, and the other result made room
+    assert usage["memory_bytes"] == reloaded.nbytes <= store.memory_budget
+    assert usage["result_bytes"] == {"first": reloaded.nbytes}
+    assert usage["spilled"] == 1
+    assert store.get("first") is reloaded
+
+
+def test_put_replaces_the_entry(store, results):
+    first, _ = results
+    store.put("run", first)
+    store.put("run", first.reweight(None))
+    assert store.usage()["memory_bytes"] == first.nbytes
+    assert store.get("run").weights_config is None
+
+    store.discard("run")
+    assert store.get("run") is None
+    assert store.usage()["memory_bytes"] == 0
+
+
+def test_idle_results_expire(store, results):
+    store.max_idle_seconds = 0
+    store.put("run", results[0])
+    assert store.get("run") is None
+    assert store.usage()["memory_bytes"] == 0
+
+
+def test_pool_views_do_not_keep_the_result(results, vacancy):
+    # The store stays the only owner: dropping its entry frees the result
+    _, _, benchmark_ids = vacancy
+    result = results[0].reweight(None)
+    reference = weakref.ref(result)
+    views = PoolViews(result, benchmark_ids)
+    del result
+    gc.collect()
+    assert reference() is None
+    assert views.total_candidates == len(results[0].employees)
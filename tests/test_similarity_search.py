@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from similarity_search import SimilarityIndex
+
+
+@pytest.fixture(scope="module")
+def index(matching_engine):
+    return SimilarityIndex(matching_engine)
+
+
+@pytest.fixture(scope="module")
+def queries(matching_engine, index):
+    """TV vectors of ten random 5-employee benchmark sets."""
+    rng = np.random.default_rng(0)
+    return [
+        index.encoder.encode_baselines(matching_engine.compute_baselines(
+            rng.choice(matching_engine._employee_ids, 5, replace=False)
+        ))
+        for _ in range(10)
+    ]
+
+
+def brute_force(index, query, k):
+    distances = np.sqrt(((index.vectors - query) ** 2).sum(axis=1))
+    rows = np.argsort(distances, kind="stable")[:k]
+    return rows, distances[rows]
+
+
+def recall(index, queries, k, n_probe):
+    found = [len(set(index.nearest(query, k, n_probe)[0]) & set(brute_force(index, query, k)[0])) for query in queries]
+    return np.mean(found) / k
+
+
+def test_probing_every_list_is_exact(index, queries):
+    for query in queries:
+        rows, distances = index.nearest(query, 20, n_probe=index.n_lists)
+        expected_rows, expected_distances = brute_force(index, query, 20)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+        assert set(rows) == set(expected_rows)
+
+
+def test_recall_against_brute_force(index, queries):
+    assert index.n_lists == int(np.sqrt(len(index.vectors)))
+    recalls = [recall(index, queries, 20, n_probe) for n_probe in (2, 4, index.n_lists // 2, index.n_lists)]
+    assert recalls == sorted(recalls)
+    assert recalls[2] >= 0.85
+    assert recalls[-1] == 1.0
+
+
+def test_search_reranks_the_shortlist(matching_engine, index, vacancy):
+    role_name, _, benchmark_ids = vacancy
+    result = index.search(benchmark_ids, k=10, role_name=role_name, n_probe=index.n_lists)
+    assert len(result.employees) == 10
+    assert not set(result.employees["employee_id"]) & set(benchmark_ids)
+
+    # Same as scoring the role's exact nearest neighbours and keeping the best 10
+    pool = matching_engine.match(role_name, benchmark_ids)
+    pool_ids = set(pool.employees["employee_id"]) - set(benchmark_ids)
+    baselines = matching_engine.compute_baselines(benchmark_ids)
+    query = index.encoder.encode_baselines(baselines)
+    rows = [row for row in brute_force(index, query, len(index.vectors))[0]
+            if matching_engine._employee_ids[row] in pool_ids][:40]
+    expected = matching_engine.match_rows(role_name, np.sort(rows), baselines).top(10)
+    assert set(result.employees["employee_id"]) == set(expected.employees["employee_id"])
@@ -0,0 +1,99 @@
+"""MATCHING_QUERY against MatchingEngine on the same synthetic data.
+
+The query needs Postgres (MODE/PERCENTILE_CONT, arrays, JSONB), so this only
+runs with TEST_DATABASE_URL set to a scratch Postgres database; its HR tables
+are replaced.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from benchmark import WEIGHTS_CONFIG, feature_statements, load_tables
+from matching_engine import MATCHING_QUERY, MatchingEngine, MatchResult, load_feature_matrix
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not (DATABASE_URL or "").startswith("postgresql"), reason="set TEST_DATABASE_URL to a scratch Postgres database"
+)
+
+
+@pytest.fixture(scope="module")
+def postgres_db(hr_tables):
+    engine = create_engine(DATABASE_URL)
+    load_tables(engine, hr_tables)
+    build, refresh = feature_statements("postgresql")
+    with engine.begin() as conn:
+        for statement in build + refresh:
+            conn.exec_driver_sql(statement)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def postgres_engine(postgres_db):
+    return MatchingEngine(load_feature_matrix(postgres_db))
+
+
+def sql_frame(postgres_db, role_name, job_level, benchmark_ids, weights_config=None, directorates=None, grades=None):
+    params = {
+        "job_vacancy_id": "parity",
+        "role_name": role_name,
+        "job_level": job_level,
+        "benchmark_ids": list(benchmark_ids),
+        "weights_config": json.dumps(weights_config or {}),
+        "directorates": directorates,
+        "grades": grades,
+    }
+    return pd.read_sql(MATCHING_QUERY, postgres_db, params=params)
+
+
+def long_frame(result: MatchResult) -> pd.DataFrame:
+    frame = result.to_frame().astype({"employee_id": str})
+    return frame.sort_values(["employee_id", "tv_name"], kind="mergesort").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("weights_config", [None, WEIGHTS_CONFIG])
+def test_query_matches_the_engine(postgres_db, postgres_engine, vacancy, weights_config):
+    role_name, job_level, benchmark_ids = vacancy
+    frame = sql_frame(postgres_db, role_name, job_level, benchmark_ids, weights_config)
+    expected = postgres_engine.match(role_name, benchmark_ids, weights_config)
+    actual = MatchResult.from_frame(frame, weights_config)
+
+    # The synthetic data has missing scores, so some TVs drop out per employee
+    assert np.isnan(expected.tv_rates).any()
+    assert set(expected.tvs["tv_name"]) >= {"Education Level", "IQ Score"}
+
+    # Baselines: medians of numeric TVs and modes of categorical ones, as text
+    sql_baselines = frame.drop_duplicates("tv_name").set_index("tv_name")["baseline_score"]
+    engine_baselines = expected.tvs.set_index("tv_name")["baseline_score"]
+    assert sql_baselines.sort_index().to_dict() == engine_baselines.sort_index().to_dict()
+
+    # final_match_rate is ROUND(..., 2) in SQL and round_half_up in the engine
+    sql_rates = frame.drop_duplicates("employee_id").set_index("employee_id")["final_match_rate"]
+    engine_rates = expected.employees.set_index("employee_id")["final_match_rate"]
+    pd.testing.assert_series_equal(
+        pd.to_numeric(sql_rates).astype(float).sort_index(), engine_rates.astype(float).sort_index(),
+        check_names=False, check_index_type=False,
+    )
+
+    pd.testing.assert_frame_equal(long_frame(actual), long_frame(expected), check_dtype=False,
+                                  check_categorical=False)
+    assert actual.ranking()["final_match_rate"].tolist() == expected.ranking()["final_match_rate"].tolist()
+
+
+def test_query_applies_the_pool_filters(postgres_db, postgres_engine, vacancy):
+    role_name, job_level, benchmark_ids = vacancy
+    pool = postgres_engine.match(role_name, benchmark_ids).employees
+    directorates = [pool["directorate"].value_counts().index[0]]
+    grades = sorted(pool["grade"].dropna().unique())[:2]
+
+    frame = sql_frame(postgres_db, role_name, job_level, benchmark_ids, directorates=directorates, grades=grades)
+    expected = postgres_engine.match(role_name, benchmark_ids, directorates=directorates, grades=grades)
+    assert 0 < len(expected.employees) < len(pool)
+    pd.testing.assert_frame_equal(long_frame(MatchResult.from_frame(frame)), long_frame(expected), check_dtype=False,
+                                  check_categorical=False)
@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from success_formula import StageCache, run_pipeline, run_statistics
+
+
+def make_report(year: int, n: int = 240, seed: int = 0) -> pd.DataFrame:
+    """A year of employee_report rows where top performers have higher IQ and Curiosity only."""
+    rng = np.random.default_rng(seed)
+    rating = rng.choice([3, 4, 5], n, p=[0.3, 0.4, 0.3])
+    top = rating == 5
+    return pd.DataFrame({
+        "employee_id": [f"EMP{year}{i:04d}" for i in range(n)],
+        "year": year,
+        "rating": rating,
+        "work_duration_months": rng.integers(6, 120, n),
+        "education": rng.choice(["D3 - Accounting", "S1 - Economics", "S2 - Statistics"], n),
+        "disc": rng.choice(["DI", "SC", "CS", "ID"], n),
+        "iq": rng.normal(100, 8, n) + np.where(top, 12, 0),
+        "gtq": rng.normal(25, 4, n),
+        "pauli": rng.normal(50, 10, n),
+        "tiki": rng.normal(6, 1.5, n),
+        "competencies": [
+            json.dumps([{"pillar": "CEX", "score": int(c)}, {"pillar": "QDD", "score": int(q)}])
+            for c, q in zip(np.clip(rng.integers(1, 4, n) + top * 2, 1, 5), rng.integers(1, 6, n))
+        ],
+        "papi_data": [json.dumps([{"scale_code": "Papi_P", "score": int(p)}]) for p in rng.integers(1, 10, n)],
+        "employee_strengths": rng.choice(["Achiever, Learner", "Focus, Arranger", "Learner, Focus"], n),
+    })
+
+
+@pytest.fixture(scope="module")
+def reports():
+    return make_report(2024, seed=1), make_report(2025, seed=2)
+
+
+def test_weights_follow_the_significant_effects(reports):
+    result = run_pipeline(pd.concat(reports, ignore_index=True))
+    assert result["year"] == 2025
+    assert set(result["statistics"]) == {2024, 2025}
+
+    evidence = result["evidence"].set_index("tv_name")
+    assert evidence.loc["IQ Score", "significant"] and evidence.loc["IQ Score", "effect"] > 0
+    assert evidence.loc["Curiosity", "significant"]
+    assert result["tv_weights"]["Quality Delivery"] == 0
+
+    tgv_weights = result["weights_config"]["tgv_weights"]
+    assert tgv_weights["Cognitive Complexity"] > 0 and tgv_weights["Growth & Innovation"] > 0
+    assert tgv_weights["Execution Excellence"] == 0
+    assert sum(tgv_weights.values()) == pytest.approx(1, abs=0.05)
+
+
+def test_no_significant_effect_means_plain_average(reports):
+    result = run_pipeline(reports[0], alpha=1e-300)
+    assert result["weights_config"] == {}
+    assert (result["evidence"]["tv_weight"] == 0).all()
+
+
+def test_new_year_only_computes_that_year(reports, tmp_path):
+    cache = StageCache(str(tmp_path))
+    _, computed = run_statistics(reports[0], cache)
+    assert {year for year, _ in computed} == {2024}
+
+    # A fresh process over the same disk cache, with a re-sorted older year
+    cache = StageCache(str(tmp_path))
+    combined = pd.concat([reports[0].sample(frac=1, random_state=0), reports[1]], ignore_index=True)
+    statistics, computed = run_statistics(combined, cache)
+    assert computed and {year for year, _ in computed} == {2025}
+    assert cache.hits == len(statistics[2024]) + 1
+
+    # Re-exporting one column of 2025 only recomputes the statistics reading it
+    changed = reports[1].assign(gtq=reports[1]["gtq"] + 1)
+    _, computed = run_statistics(changed, cache)
+    assert set(computed) == {(2025, "prepare"), (2025, "gtq")}